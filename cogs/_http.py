@@ -0,0 +1,137 @@
+# cogs/_http.py
+# Bot-wide aiohttp session shared by all cogs. Created in main.py and attached as
+# bot.http_service; cogs borrow the session and must not close it.
+import asyncio
+import time
+
+import aiohttp
+
+CONNECTOR_LIMIT = 100 # Total open connections across all hosts
+CONNECTOR_LIMIT_PER_HOST = 20
+KEEPALIVE_TIMEOUT = 30 # Seconds an idle connection is kept for reuse
+DNS_CACHE_TTL = 300
+
+# Per-service request timeouts. Streaming AI replies are bounded between chunks rather than in total.
+SERVICE_TIMEOUTS = {
+    "default": aiohttp.ClientTimeout(total=30),
+    "ai": aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=30),
+    "weather": aiohttp.ClientTimeout(total=15, sock_connect=5),
+    "emoji": aiohttp.ClientTimeout(total=10, sock_connect=5),
+    "attachment": aiohttp.ClientTimeout(total=60, sock_connect=10, sock_read=20),
+}
+
+class SendRace:
+    """
+    Lets hedged copies of a non-idempotent request race to connect. Pass one instance as
+    trace_request_ctx to every copy: the first copy to get a connection claims the race
+    and cancels the others while they are still connecting, so only one copy is ever sent.
+    Also times how long the winner took to open a new connection (None if it reused one).
+    """
+    def __init__(self):
+        self.tasks: dict[asyncio.Task, float] = {} # {task: time it started}
+        self.winner: asyncio.Task | None = None
+        self.connect_time: float | None = None
+
+    def add(self, task: asyncio.Task):
+        self.tasks[task] = time.monotonic()
+
+    @property
+    def claimed(self) -> bool:
+        return self.winner is not None
+
+    def claim(self, new_connection: bool):
+        if self.winner is not None:
+            return
+        self.winner = asyncio.current_task()
+        if new_connection and self.winner in self.tasks:
+            self.connect_time = time.monotonic() - self.tasks[self.winner]
+        for task in self.tasks:
+            if task is not self.winner:
+                task.cancel()
+
+class HTTPService:
+    """
+    Owns the shared aiohttp session and its tuned connector, and counts requests
+    and connection reuse through aiohttp trace hooks.
+    """
+    def __init__(self):
+        self._session: aiohttp.ClientSession | None = None
+        self._connector: aiohttp.TCPConnector | None = None
+        self.requests = 0
+        self.request_errors = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    async def _on_request_start(self, session, context, params):
+        self.requests += 1
+
+    async def _on_request_exception(self, session, context, params):
+        self.request_errors += 1
+
+    async def _on_connection_create_end(self, session, context, params):
+        self.connections_created += 1
+        self._claim_race(context, new_connection=True)
+
+    async def _on_connection_reuseconn(self, session, context, params):
+        self.connections_reused += 1
+        self._claim_race(context, new_connection=False)
+
+    @staticmethod
+    def _claim_race(context, new_connection: bool):
+        # Runs once a connection is ready and before anything is written to it.
+        if isinstance(context.trace_request_ctx, SendRace):
+            context.trace_request_ctx.claim(new_connection)
+
+    async def start(self):
+        """Creates the session. Must be called from inside the running event loop."""
+        if self._session is not None and not self._session.closed:
+            return
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_exception.append(self._on_request_exception)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        self._connector = aiohttp.TCPConnector(
+            limit=CONNECTOR_LIMIT,
+            limit_per_host=CONNECTOR_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            enable_cleanup_closed=True,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=self._connector,
+            timeout=SERVICE_TIMEOUTS["default"],
+            trace_configs=[trace_config],
+        )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._connector = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTPService.start() has not been called or the service was closed.")
+        return self._session
+
+    @staticmethod
+    def timeout(service: str) -> aiohttp.ClientTimeout:
+        return SERVICE_TIMEOUTS.get(service, SERVICE_TIMEOUTS["default"])
+
+    def stats(self) -> dict[str, int]:
+        connector = self._connector
+        # aiohttp has no public API for pool occupancy, so read the connector's bookkeeping defensively.
+        in_use = len(getattr(connector, "_acquired", ())) if connector else 0
+        idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values()) if connector else 0
+        return {
+            "limit": CONNECTOR_LIMIT,
+            "limit_per_host": CONNECTOR_LIMIT_PER_HOST,
+            "in_use": in_use,
+            "idle": idle,
+            "requests": self.requests,
+            "request_errors": self.request_errors,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+        }
@@ -0,0 +1,388 @@
+# cogs/_imaging.py
+# Bot-wide image processing service attached as bot.image_service by main.py.
+# Pillow work runs in worker processes so decoding/resizing never blocks the event loop.
+# Spawned workers re-import main.py for its imports only (the bot is built under its
+# __main__ guard) and find the job functions below by name in this module.
+import asyncio
+import bisect
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from PIL import Image, ImageSequence, UnidentifiedImageError
+
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1))))
+IMAGE_MAX_QUEUED = int(os.environ.get("IMAGE_MAX_QUEUED", 16)) # Jobs waiting for a worker before new ones are refused
+IMAGE_JOB_TIMEOUT = float(os.environ.get("IMAGE_JOB_TIMEOUT", 20))
+MAX_INPUT_BYTES = 25 * 1024 * 1024
+MAX_PIXELS = 4096 * 4096 # Per decoded image; checked from the header before pixels are loaded
+DEFAULT_UPLOAD_LIMIT = 10 * 1024 * 1024 # Discord's upload limit without server boosts
+MAX_INPUT_FRAMES = 300
+MAX_OUTPUT_FRAMES = 200
+MAX_ANIMATION_MS = 15000 # Longest loop produced when combining animations
+MIN_FRAME_MS = 20 # Browsers and Discord show shorter GIF delays as 100 ms
+DEFAULT_FRAME_MS = 100
+CONVERT_FORMATS = ("png", "jpeg", "webp", "gif")
+MAX_CONVERT_SIDE = 2048 # Longest side of converted images; JPEGs are decoded at a reduced scale toward this
+CONVERT_DOWNSCALE_STEPS = 8 # Each step shrinks the image to 75%
+GIF_TRANSPARENT_INDEX = 255 # Palette entry kept free for pixels that are mostly transparent
+# Encoder settings tried in order before downscaling; None means lossless/default.
+CONVERT_QUALITY_STEPS = {
+    "png": (None, 256),
+    "jpeg": (90, 75, 60),
+    "webp": (90, 75, 55),
+    "gif": (None,),
+}
+
+class ImageJobError(Exception):
+    """A job was refused or failed in a way that can be shown to the user."""
+
+class ImageTooLarge(ImageJobError):
+    pass
+
+class ImageBusy(ImageJobError):
+    pass
+
+def _open_checked(source: bytes | str, draft_size: tuple[int, int] | None = None) -> Image.Image:
+    """
+    Opens image bytes or a file path after checking its size. With `draft_size`, formats
+    that support it (JPEG) are decoded at a reduced scale no smaller than that size, and
+    the pixel limit applies to the reduced image.
+    """
+    size = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+    if size > MAX_INPUT_BYTES:
+        raise ImageTooLarge(f"Image is larger than {MAX_INPUT_BYTES // (1024 * 1024)} MB.")
+    try:
+        img = Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+    except UnidentifiedImageError:
+        raise ImageJobError("Could not identify the image format.")
+    except Image.DecompressionBombError:
+        raise ImageTooLarge("Image dimensions are too large.")
+    if draft_size is not None:
+        img.draft(None, draft_size)
+    if img.width * img.height > MAX_PIXELS:
+        img.close()
+        raise ImageTooLarge(f"Image is {img.width}x{img.height}; the limit is {MAX_PIXELS:,} pixels.")
+    return img
+
+def _gif_frame(frame: Image.Image) -> Image.Image:
+    """
+    Quantizes an RGBA frame for GIF. GIF has one-bit transparency, so the colours are fitted
+    into 255 entries and pixels under half opacity use the reserved transparent entry.
+    """
+    paletted = frame.convert("RGB").quantize(GIF_TRANSPARENT_INDEX, method=Image.Quantize.FASTOCTREE,
+                                             dither=Image.Dither.FLOYDSTEINBERG)
+    clear = frame.getchannel("A").point(lambda alpha: 255 if alpha < 128 else 0, mode="1")
+    if clear.getbbox() is not None:
+        paletted.paste(GIF_TRANSPARENT_INDEX, mask=clear)
+    paletted.info["transparency"] = GIF_TRANSPARENT_INDEX
+    return paletted
+
+def _encode_frames(frames: list[Image.Image], durations: list[int], target_format: str, quality: int | None) -> bytes:
+    output = BytesIO()
+    animation = {"save_all": True, "append_images": frames[1:], "duration": durations, "loop": 0} if len(frames) > 1 else {}
+    if target_format == "gif":
+        paletted = [_gif_frame(frame) for frame in frames]
+        if animation:
+            animation["append_images"] = paletted[1:]
+        paletted[0].save(output, format="GIF", optimize=True, disposal=2,
+                         transparency=GIF_TRANSPARENT_INDEX, **animation)
+    elif target_format == "png":
+        frame = frames[0]
+        if quality is not None: # For PNG the "quality" step is a palette size.
+            frame = frame.quantize(quality, method=Image.Quantize.FASTOCTREE)
+        frame.save(output, format="PNG")
+    elif target_format == "jpeg":
+        # JPEG has no alpha channel, so flatten onto white.
+        flattened = Image.new("RGB", frames[0].size, (255, 255, 255))
+        flattened.paste(frames[0], mask=frames[0].getchannel("A"))
+        flattened.save(output, format="JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        frames[0].save(output, format="WEBP", quality=quality, method=4, **animation)
+    return output.getvalue()
+
+def convert_image(path: str, target_format: str, max_bytes: int = DEFAULT_UPLOAD_LIMIT) -> bytes:
+    """
+    Converts the image at `path` to `target_format` (png, jpeg, webp or gif). Animated
+    inputs stay animated when the target supports it. If the result is over `max_bytes`,
+    it is re-encoded at lower quality and then progressively downscaled until it fits.
+    """
+    frames: list[Image.Image] = []
+    durations: list[int] = []
+    with _open_checked(path, draft_size=(MAX_CONVERT_SIDE, MAX_CONVERT_SIDE)) as img:
+        keep_animation = getattr(img, "is_animated", False) and target_format in ("gif", "webp")
+        for frame in (ImageSequence.Iterator(img) if keep_animation else [img]):
+            if len(frames) >= MAX_INPUT_FRAMES:
+                break
+            frame = frame.convert("RGBA")
+            # thumbnail() only shrinks, and uses reduce() for the bulk of large downscales.
+            frame.thumbnail((MAX_CONVERT_SIDE, MAX_CONVERT_SIDE), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            frames.append(frame)
+            durations.append(max(MIN_FRAME_MS, int(frame.info.get("duration") or DEFAULT_FRAME_MS)))
+
+    scaled = frames
+    for _ in range(CONVERT_DOWNSCALE_STEPS):
+        for quality in CONVERT_QUALITY_STEPS[target_format]:
+            data = _encode_frames(scaled, durations, target_format, quality)
+            if len(data) <= max_bytes:
+                return data
+        width, height = scaled[0].size
+        if width <= 16 or height <= 16:
+            break
+        new_size = (max(1, int(width * 0.75)), max(1, int(height * 0.75)))
+        scaled = [frame.resize(new_size, Image.Resampling.LANCZOS) for frame in frames]
+    raise ImageTooLarge("The converted image is too large to upload.")
+
+# A resized image as (width, height, frames, durations): raw RGBA bytes for each frame and
+# how long it shows in ms. Static images have one frame. Cheap to cache and to send between processes.
+Tile = tuple[int, int, list[bytes], list[int]]
+
+def tile_size(tile: Tile) -> int:
+    return sum(len(frame) for frame in tile[2])
+
+def make_tile(data: bytes, target_height: int = 64) -> Tile:
+    """
+    Decodes an image and scales every frame to `target_height`, keeping the aspect ratio.
+    Frames are resized as they are decoded, so only one full-size frame exists at a time.
+    """
+    frames: list[bytes] = []
+    durations: list[int] = []
+    with _open_checked(data) as img:
+        new_width = max(1, int(target_height * img.width / img.height))
+        for frame in ImageSequence.Iterator(img):
+            if len(frames) >= MAX_INPUT_FRAMES:
+                break
+            resized = frame.convert("RGBA").resize((new_width, target_height), Image.Resampling.LANCZOS)
+            frames.append(resized.tobytes())
+            durations.append(max(MIN_FRAME_MS, int(frame.info.get("duration") or DEFAULT_FRAME_MS)))
+    if len(frames) == 1:
+        durations = [0]
+    return new_width, target_height, frames, durations
+
+def _frame_timeline(tiles: list[Tile]) -> list[tuple[tuple[int, ...], int]]:
+    """
+    Works out which frame of each tile is showing at every point where any tile changes
+    frame, over one loop of the longest animation. Returns (frame indices, duration ms)
+    per output frame, with identical consecutive frames merged.
+    """
+    animated = [(index, durations) for index, (_, _, _, durations) in enumerate(tiles) if len(durations) > 1]
+    total_ms = min(max(sum(durations) for _, durations in animated), MAX_ANIMATION_MS)
+    starts_by_tile: dict[int, list[int]] = {}
+    boundaries = {0}
+    for index, durations in animated:
+        starts = [0]
+        for duration in durations[:-1]:
+            starts.append(starts[-1] + duration)
+        starts_by_tile[index] = starts
+        loop_ms = sum(durations)
+        for offset in range(0, total_ms, loop_ms):
+            boundaries.update(offset + start for start in starts if offset + start < total_ms)
+    boundaries = sorted(boundaries)
+    if len(boundaries) > MAX_OUTPUT_FRAMES:
+        # Too many distinct change points; sample on an even grid instead (GIF delays are in 10 ms units).
+        step = -(-total_ms // MAX_OUTPUT_FRAMES // 10) * 10
+        boundaries = list(range(0, total_ms, step))
+
+    timeline: list[tuple[tuple[int, ...], int]] = []
+    for position, start in enumerate(boundaries):
+        end = boundaries[position + 1] if position + 1 < len(boundaries) else total_ms
+        indices = []
+        for index, tile in enumerate(tiles):
+            starts = starts_by_tile.get(index)
+            if starts is None:
+                indices.append(0)
+            else:
+                indices.append(bisect.bisect_right(starts, start % sum(tile[3])) - 1)
+        indices = tuple(indices)
+        if timeline and timeline[-1][0] == indices:
+            timeline[-1] = (indices, timeline[-1][1] + end - start)
+        else:
+            timeline.append((indices, end - start))
+    return timeline
+
+def _composite(tiles: list[Tile], indices: tuple[int, ...], target_height: int, padding: int) -> Image.Image:
+    total_width = sum(width for width, _, _, _ in tiles) + padding * (len(tiles) - 1)
+    combined_image = Image.new("RGBA", (max(total_width, target_height), target_height), (0, 0, 0, 0))
+    current_x = 0
+    for (width, height, frames, _), frame_index in zip(tiles, indices):
+        img = Image.frombytes("RGBA", (width, height), frames[frame_index])
+        combined_image.paste(img, (current_x, 0), img)
+        current_x += width + padding
+    return combined_image
+
+def _encode_animation(tiles: list[Tile], timeline, target_height: int, padding: int, max_bytes: int) -> tuple[bytes, str]:
+    durations = [duration for _, duration in timeline]
+    # Pillow's GIF writer keeps a paletted copy of every frame until the file is written, so the
+    # whole animation is in memory either way. Handing it a generator means each RGBA composite
+    # is dropped once it has been quantized, rather than all of them being held as well.
+    frames = (_composite(tiles, indices, target_height, padding) for indices, _ in timeline)
+    output = BytesIO()
+    next(frames).save(output, format="GIF", save_all=True, append_images=frames, duration=durations,
+                      loop=0, disposal=2, optimize=True)
+    if output.tell() <= max_bytes:
+        return output.getvalue(), "gif"
+
+    # Pillow's WebP writer takes the frames as a list, so every RGBA composite is held at once
+    # (4 bytes per pixel per frame, at most MAX_OUTPUT_FRAMES); only reached for oversized GIFs.
+    frame_list = [_composite(tiles, indices, target_height, padding) for indices, _ in timeline]
+    for quality, keep_every in ((80, 1), (50, 1), (50, 2), (30, 4)):
+        kept = list(range(0, len(frame_list), keep_every))
+        kept_durations = [sum(durations[i:i + keep_every]) for i in kept]
+        output = BytesIO()
+        frame_list[0].save(output, format="WEBP", save_all=True, append_images=[frame_list[i] for i in kept[1:]],
+                           duration=kept_durations, loop=0, quality=quality, method=4)
+        if output.tell() <= max_bytes:
+            return output.getvalue(), "webp"
+    raise ImageTooLarge("The combined animation is too large to upload.")
+
+def combine_tiles(items: list[Tile | bytes], target_height: int = 64, padding: int = 5,
+                  max_bytes: int = DEFAULT_UPLOAD_LIMIT) -> tuple[bytes, str, list[Tile | None]]:
+    """
+    Lays images out left to right. Each item is either an already-made tile or encoded
+    image bytes, which are turned into tiles first. If any input is animated the result
+    is an animation with every input's frame timing preserved; otherwise it is a PNG.
+    Returns the encoded image, its file extension and, for each item, the tile that was
+    made for it (None for items that were already tiles).
+    """
+    new_tiles: list[Tile | None] = []
+    tiles: list[Tile] = []
+    for item in items:
+        if isinstance(item, bytes):
+            tile = make_tile(item, target_height)
+            new_tiles.append(tile)
+        else:
+            tile = item
+            new_tiles.append(None)
+        tiles.append(tile)
+
+    if all(len(tile[2]) == 1 for tile in tiles):
+        output = BytesIO()
+        _composite(tiles, (0,) * len(tiles), target_height, padding).save(output, format="PNG")
+        return output.getvalue(), "png", new_tiles
+    data, extension = _encode_animation(tiles, _frame_timeline(tiles), target_height, padding, max_bytes)
+    return data, extension, new_tiles
+
+def _warm_up():
+    return os.getpid()
+
+class ImageService:
+    """
+    Runs image jobs on a process pool, falling back to threads if processes can't be
+    started. At most IMAGE_WORKERS jobs run at once and IMAGE_MAX_QUEUED more may wait;
+    beyond that jobs are refused immediately rather than piling up behind a burst.
+    """
+    def __init__(self, workers: int = IMAGE_WORKERS, max_queued: int = IMAGE_MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._executor: Executor | None = None
+        self.mode = "stopped"
+        self._slots = asyncio.Semaphore(workers)
+        self._waiting = 0
+        self.jobs = 0
+        self.failures = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.abandoned = 0 # Timed-out or cancelled jobs still running in a worker
+        self.busy_seconds = 0.0
+
+    async def start(self):
+        """Starts the worker pool. Must be called from inside the running event loop."""
+        if self._executor is not None:
+            return
+        try:
+            executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            await asyncio.get_running_loop().run_in_executor(executor, _warm_up)
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(f"[ImageService] Process pool unavailable ({e}); using threads.")
+            self._use_threads()
+            return
+        self._executor = executor
+        self.mode = "processes"
+
+    def _use_threads(self):
+        # Every job running when the process pool breaks lands here. Only the first one swaps
+        # pools; shutting down a thread pool another job was just resubmitted to would cancel it.
+        # This runs on the event loop without awaiting, so the check and the swap can't interleave.
+        if isinstance(self._executor, ThreadPoolExecutor):
+            return
+        old_executor = self._executor
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-worker")
+        self.mode = "threads"
+        if old_executor is not None:
+            old_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self.mode = "stopped"
+
+    async def run(self, func, *args, timeout: float = IMAGE_JOB_TIMEOUT):
+        """
+        Runs `func(*args)` in a worker and returns its result. Raises ImageBusy when the
+        queue is full and asyncio.TimeoutError when the job overruns `timeout`.
+        """
+        if self._executor is None:
+            raise RuntimeError("ImageService.start() has not been called or the service was closed.")
+        if self._slots.locked() and self._waiting >= self.max_queued:
+            self.rejected += 1
+            raise ImageBusy("The image worker is busy right now. Please try again in a moment.")
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        started = time.monotonic()
+        job = asyncio.ensure_future(self._submit(func, *args))
+        try:
+            return await asyncio.wait_for(asyncio.shield(job), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.jobs += 1
+            self.busy_seconds += time.monotonic() - started
+            if job.done():
+                self._slots.release()
+            else:
+                # A running job can't be interrupted, so it keeps its worker slot until it really
+                # finishes; otherwise timed-out jobs would pile up past the worker limit.
+                self.abandoned += 1
+                job.add_done_callback(self._release_abandoned)
+
+    def _release_abandoned(self, job: asyncio.Future):
+        if not job.cancelled():
+            job.exception() # Nobody awaits it any more; mark the error as retrieved
+        self.abandoned -= 1
+        self._slots.release()
+
+    async def _submit(self, func, *args):
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, func, *args)
+        except BrokenProcessPool:
+            if self._executor is None:
+                raise # Closed while the job ran
+            if not isinstance(self._executor, ThreadPoolExecutor):
+                print("[ImageService] Worker process died; switching to threads.")
+            self._use_threads()
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    def stats(self) -> dict[str, float | int | str]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "waiting": self._waiting,
+            "jobs": self.jobs,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "abandoned": self.abandoned,
+            "avg_ms": (self.busy_seconds / self.jobs * 1000) if self.jobs else 0.0,
+        }
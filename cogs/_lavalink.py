@@ -0,0 +1,242 @@
+# cogs/_lavalink.py
+# Multi-node Lavalink pool attached to the bot as bot.pomice by main.py.
+import discord
+from discord.ext import commands
+import pomice
+import asyncio
+import functools
+import json
+import os
+import random
+import time
+
+# Default node, used when LAVALINK_NODES isn't set.
+DEFAULT_NODES = [
+    {"identifier": "MAIN", "host": "lavalinkv3.devxcode.in", "port": 443, "password": "DevamOP", "secure": True},
+]
+HEALTH_CHECK_INTERVAL = 1.0 # Also how stale a player's saved position can be when its node drops
+CONNECT_RETRY_MAX_DELAY = 60.0
+
+def load_node_configs() -> list[dict]:
+    """
+    Reads node definitions from the LAVALINK_NODES environment variable, a JSON list
+    of objects with identifier, host, port, password and secure keys.
+    """
+    raw = os.environ.get("LAVALINK_NODES")
+    if not raw:
+        return DEFAULT_NODES
+    try:
+        nodes = json.loads(raw)
+    except ValueError as e:
+        print(f"[LavalinkPool] Invalid LAVALINK_NODES ({e}); using the default node.")
+        return DEFAULT_NODES
+    return [node for node in nodes if {"identifier", "host", "port", "password"} <= node.keys()]
+
+def node_penalty(node: pomice.Node) -> float:
+    """
+    Load score in the style of Lavalink's own balancing: playing players, plus an
+    exponential CPU term, plus penalties for dropped/nulled audio frames.
+    """
+    stats = getattr(node, "stats", None)
+    if stats is None:
+        return float(len(node.players))
+    penalty = float(getattr(stats, "players_active", len(node.players)))
+    cpu_load = getattr(stats, "cpu_system_load", 0.0) or 0.0
+    penalty += 1.05 ** (100 * cpu_load) * 10 - 10
+    deficit = getattr(stats, "frames_deficit", None)
+    nulled = getattr(stats, "frames_nulled", None)
+    if deficit is not None and nulled is not None:
+        penalty += 1.03 ** (500 * (deficit / 3000)) * 600 - 600
+        penalty += (1.03 ** (500 * (nulled / 3000)) * 300 - 300) * 2
+    return penalty
+
+class PlayerSnapshot:
+    """
+    What it takes to recreate a player on another node. pomice destroys a node's players
+    (leaving voice and forgetting the channel and position) as soon as its websocket
+    closes, so the pool saves this for every player while its node is still healthy.
+    """
+    __slots__ = ("node", "channel_id", "track", "position", "volume", "paused")
+
+    def __init__(self, node: pomice.Node, player: pomice.Player):
+        self.node = node
+        self.channel_id = player.channel.id
+        self.track = player.current
+        self.position = int(player.position) if player.current else 0
+        self.volume = player.volume
+        self.paused = player.is_paused
+
+class LavalinkPool:
+    """
+    Owns every configured Lavalink node. Nodes connect in the background with
+    retries, and commands can await readiness instead of failing. New players go to
+    the least-loaded connected node, and a single health-check task moves players
+    off nodes that disconnect, resuming their track at the position it had reached.
+    """
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.pool = pomice.NodePool()
+        self.nodes: list[pomice.Node] = []
+        self.node_names: dict[pomice.Node, str] = {} # pomice.Node has no public identifier
+        self._snapshots: dict[int, PlayerSnapshot] = {} # {guild_id: last known state of its player}
+        self.migrations = 0
+        self.started_at = time.monotonic()
+        self.gateway_ready_at: float | None = None
+        self.ready_after: float | None = None # Seconds from the gateway being ready until the first node connected
+        self._ready = asyncio.Event()
+        self._connect_tasks: list[asyncio.Task] = []
+        self._monitor_task: asyncio.Task | None = None
+
+    def start(self, configs: list[dict]):
+        """
+        Starts connecting every node in the background. Requires bot.user, i.e. after login.
+        The connections themselves begin once the gateway is ready.
+        """
+        for config in configs:
+            self._connect_tasks.append(asyncio.create_task(self._connect_with_retry(config)))
+        if self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def _connect_with_retry(self, config: dict):
+        # pomice's Node.connect() waits for the gateway to be ready before it opens the websocket,
+        # so wait here too and time only the Lavalink handshake from that point.
+        await self.bot.wait_until_ready()
+        if self.gateway_ready_at is None:
+            self.gateway_ready_at = time.monotonic()
+        # Build the node once and retry only its connection: every pomice.Node registers a gateway
+        # listener and keeps its own HTTP session, so a new one per attempt would leak both.
+        node = self._build_node(config)
+        delay = 1.0
+        try:
+            while True:
+                try:
+                    await node.connect()
+                    break
+                except Exception as e:
+                    print(f"[LavalinkPool] Node {config['identifier']} failed to connect: {e}. Retrying in {delay:.0f}s.")
+                    await asyncio.sleep(delay + random.uniform(0, delay / 2))
+                    delay = min(delay * 2, CONNECT_RETRY_MAX_DELAY)
+        except asyncio.CancelledError:
+            await self._discard_node(node)
+            raise
+        self.pool._nodes[config["identifier"]] = node # What NodePool.create_node does once connected
+        self.nodes.append(node)
+        self.node_names[node] = config["identifier"]
+        print(f"[LavalinkPool] Node {config['identifier']} connected.")
+        if not self._ready.is_set():
+            now = time.monotonic()
+            self.ready_after = now - self.gateway_ready_at
+            print(f"[LavalinkPool] Music ready {self.ready_after:.2f}s after the gateway "
+                  f"({now - self.started_at:.2f}s after startup).")
+            self._ready.set()
+
+    async def wait_ready(self, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for a node to be usable."""
+        if self.is_ready:
+            return True
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.is_ready
+
+    def _build_node(self, config: dict) -> pomice.Node:
+        return pomice.Node(
+            pool=self.pool,
+            bot=self.bot,
+            host=config["host"],
+            port=int(config["port"]),
+            password=config["password"],
+            identifier=config["identifier"],
+            secure=bool(config.get("secure", False)),
+        )
+
+    async def _discard_node(self, node: pomice.Node):
+        """Releases what a node that never connected holds: its gateway listener and HTTP session."""
+        self.bot.remove_listener(node._update_handler, "on_socket_response")
+        if node._session is not None and not node._session.closed:
+            await node._session.close()
+
+    @property
+    def is_ready(self) -> bool:
+        return any(node.is_connected for node in self.nodes)
+
+    def best_node(self, exclude: pomice.Node | None = None) -> pomice.Node | None:
+        candidates = [node for node in self.nodes if node.is_connected and node is not exclude]
+        if not candidates:
+            return None
+        return min(candidates, key=node_penalty)
+
+    def get_player(self, guild_id: int) -> pomice.Player | None:
+        for node in self.nodes:
+            player = node.get_player(guild_id)
+            if player is not None:
+                return player
+        return None
+
+    async def connect(self, channel: discord.VoiceChannel) -> pomice.Player:
+        node = self.best_node()
+        if node is None:
+            raise pomice.exceptions.NoNodesAvailable
+        return await channel.connect(cls=functools.partial(pomice.Player, node=node))
+
+    def _snapshot_players(self):
+        for node in self.nodes:
+            if not node.is_connected:
+                continue
+            for guild_id, player in node.players.items():
+                if player.is_connected and player.channel is not None:
+                    self._snapshots[guild_id] = PlayerSnapshot(node, player)
+
+    async def _migrate(self, guild_id: int, snapshot: PlayerSnapshot, target: pomice.Node):
+        guild = self.bot.get_guild(guild_id)
+        channel = guild.get_channel(snapshot.channel_id) if guild is not None else None
+        if channel is None:
+            return # Left the guild, or the channel was deleted
+        old_player = snapshot.node.get_player(guild_id)
+        if old_player is not None: # pomice hasn't torn it down yet
+            try:
+                await old_player.destroy()
+            except Exception as e: # The old node is gone, so its side of the teardown may fail.
+                print(f"[LavalinkPool] Error tearing down player for guild {guild_id}: {e}")
+        if guild.voice_client is not None:
+            await guild.voice_client.disconnect(force=True)
+
+        new_player = await channel.connect(cls=functools.partial(pomice.Player, node=target))
+        await new_player.set_volume(snapshot.volume)
+        if snapshot.track is not None:
+            await new_player.play(track=snapshot.track, start=snapshot.position)
+            if snapshot.paused:
+                await new_player.set_pause(True)
+        self.migrations += 1
+        print(f"[LavalinkPool] Moved guild {guild_id} to node {self.node_names[target]} at {snapshot.position}ms.")
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            self._snapshot_players()
+            for guild_id, snapshot in list(self._snapshots.items()):
+                if snapshot.node.is_connected:
+                    if guild_id not in snapshot.node.players:
+                        del self._snapshots[guild_id] # The player was stopped on purpose
+                    continue
+                target = self.best_node(exclude=snapshot.node)
+                if target is None:
+                    continue # Keep the snapshot until some node is back
+                del self._snapshots[guild_id]
+                try:
+                    await self._migrate(guild_id, snapshot, target)
+                except Exception as e:
+                    print(f"[LavalinkPool] Failed to move guild {guild_id} off node {self.node_names[snapshot.node]}: {e}")
+
+    def stats(self) -> list[tuple[str, bool, int, float]]:
+        """Returns (identifier, connected, players, penalty) for each node."""
+        return [(self.node_names[node], node.is_connected, len(node.players), node_penalty(node)) for node in self.nodes]
+
+    async def close(self):
+        for task in self._connect_tasks:
+            task.cancel()
+        self._connect_tasks.clear()
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            self._monitor_task = None
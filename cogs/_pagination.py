@@ -0,0 +1,163 @@
+# cogs/_pagination.py
+# Shared helpers for posting text longer than Discord's 2000 character limit.
+# The leading underscore keeps the cog loader from treating this as an extension.
+import discord
+import re
+from io import BytesIO
+
+MESSAGE_LIMIT = 2000
+MAX_PAGES = 10 # Beyond this, the text is sent as an attachment instead.
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})(.*)$")
+
+def _split_long_line(line: str, size: int) -> list[str]:
+    """Splits a single line into pieces of at most `size` characters, preferring spaces."""
+    pieces = []
+    while len(line) > size:
+        cut = line.rfind(" ", 0, size)
+        if cut < size // 2:
+            cut = size
+        else:
+            cut += 1
+        pieces.append(line[:cut])
+        line = line[cut:]
+    if line:
+        pieces.append(line)
+    return pieces
+
+def paginate(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """
+    Splits text into pages of at most `limit` characters. Pages break at blank lines
+    where possible, and a code block that has to be split is closed at the end of one
+    page and reopened (with the same language) at the start of the next.
+    """
+    pages: list[str] = []
+    current = ""
+    open_fence: tuple[str, str] | None = None # (marker, opening line) of the code block open at the end of `current`
+    soft_break = 0 # Offset in `current` just after the last blank line outside a code block
+
+    def flush():
+        nonlocal current, soft_break
+        if soft_break > len(current) // 2:
+            page, rest = current[:soft_break], current[soft_break:]
+        else:
+            page, rest = current, ""
+            if open_fence:
+                page = page.rstrip("\n") + "\n" + open_fence[0]
+                rest = open_fence[1] + "\n"
+        page = page.rstrip()
+        if page:
+            pages.append(page)
+        current = rest
+        soft_break = 0
+
+    for line in text.splitlines(keepends=True):
+        pieces = _split_long_line(line, limit // 2)
+        for piece in pieces:
+            reserve = len(open_fence[0]) + 1 if open_fence else 0
+            if len(current) + len(piece) + reserve > limit:
+                flush()
+                if len(current) + len(piece) + reserve > limit:
+                    flush()
+            current += piece
+
+            match = FENCE_RE.match(piece.rstrip("\n"))
+            if match and len(pieces) == 1:
+                marker, info = match.groups()
+                if open_fence is None:
+                    open_fence = (marker, piece.rstrip("\n"))
+                elif marker.startswith(open_fence[0][0]) and len(marker) >= len(open_fence[0]) and not info.strip():
+                    open_fence = None
+            if open_fence is None and not piece.strip():
+                soft_break = len(current)
+
+    if current.strip():
+        # Dropping the soft break forces the remainder out as a single final page.
+        soft_break = 0
+        flush()
+    return pages
+
+class PaginatorView(discord.ui.View):
+    """Page navigation buttons that re-render from the in-memory pages."""
+    def __init__(self, pages: list[str], author_id: int | None = None, timeout: float = 300.0):
+        super().__init__(timeout=timeout)
+        self.pages = pages
+        self.author_id = author_id
+        self.index = 0
+        self.message: discord.Message | None = None
+        self._sync_buttons()
+
+    def _sync_buttons(self):
+        self.previous_page.disabled = self.index == 0
+        self.next_page.disabled = self.index >= len(self.pages) - 1
+        self.page_indicator.label = f"{self.index + 1}/{len(self.pages)}"
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if self.author_id is not None and interaction.user.id != self.author_id:
+            await interaction.response.send_message("Only the person who ran the command can turn these pages.", ephemeral=True)
+            return False
+        return True
+
+    async def _show_page(self, interaction: discord.Interaction):
+        self._sync_buttons()
+        await interaction.response.edit_message(content=self.pages[self.index], view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.index = max(self.index - 1, 0)
+        await self._show_page(interaction)
+
+    @discord.ui.button(label="1/1", style=discord.ButtonStyle.secondary, disabled=True)
+    async def page_indicator(self, interaction: discord.Interaction, button: discord.ui.Button):
+        pass
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.index = min(self.index + 1, len(self.pages) - 1)
+        await self._show_page(interaction)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+async def send_long_text(interaction: discord.Interaction,
+                         text: str,
+                         *,
+                         message: discord.WebhookMessage | None = None,
+                         ephemeral: bool = False,
+                         filename: str = "response.txt") -> discord.WebhookMessage | None:
+    """
+    Posts `text` as an interaction followup, or edits `message` in place if given.
+    Short text is sent as-is, longer text as pages with navigation buttons, and
+    anything beyond MAX_PAGES as a text file attachment.
+    """
+    pages = paginate(text) or ["[No content]"]
+    kwargs = {}
+    view = None
+    if len(pages) == 1:
+        kwargs["content"] = pages[0]
+    elif len(pages) <= MAX_PAGES:
+        view = PaginatorView(pages, author_id=interaction.user.id)
+        kwargs["content"] = pages[0]
+        kwargs["view"] = view
+    else:
+        file = discord.File(BytesIO(text.encode("utf-8")), filename=filename)
+        kwargs["content"] = f"📄 The full text ({len(text):,} characters) is attached."
+        if message is not None:
+            kwargs["attachments"] = [file]
+        else:
+            kwargs["file"] = file
+
+    if message is not None:
+        if view is None:
+            kwargs["view"] = None
+        sent = await message.edit(**kwargs)
+    else:
+        sent = await interaction.followup.send(ephemeral=ephemeral, wait=True, **kwargs)
+    if view is not None:
+        view.message = sent
+    return sent
@@ -1,66 +1,822 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+from cogs._pagination import send_long_text
+from cogs._http import SendRace
 import aiohttp
 import asyncio
+import codecs
+import contextlib
+import os
+import random
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, deque
 
 API_URL = "https://groq.dogwaffle.world/"
+# Comma-separated list of interchangeable endpoints; requests are spread across them by latency.
+API_URLS = [url.strip() for url in os.environ.get("AI_API_URLS", API_URL).split(",") if url.strip()]
+AI_EMOJI = "<:Ai:1376557302127001600>"
+# Discord allows roughly 5 message edits per 5 seconds per channel, so keep
+# progressive edits comfortably below that.
+STREAM_EDIT_INTERVAL = 1.2
+AI_CACHE_TTL = float(os.environ.get("AI_CACHE_TTL", 600))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", 512))
+AI_MAX_INFLIGHT = int(os.environ.get("AI_MAX_INFLIGHT", 4))
+AI_MAX_PER_USER = int(os.environ.get("AI_MAX_PER_USER", 1))
+AI_MAX_QUEUED = int(os.environ.get("AI_MAX_QUEUED", 50))
+AI_QUEUE_TIMEOUT = float(os.environ.get("AI_QUEUE_TIMEOUT", 120))
+QUEUE_UPDATE_INTERVAL = 3.0
+AI_HISTORY_DB = os.environ.get("AI_HISTORY_DB", "data/ai_history.db")
+AI_HISTORY_MAX_MESSAGES = int(os.environ.get("AI_HISTORY_MAX_MESSAGES", 20)) # Per session, user and assistant messages combined
+AI_HISTORY_MAX_CHARS = int(os.environ.get("AI_HISTORY_MAX_CHARS", 24000)) # Per session; older messages are dropped beyond this
+AI_HISTORY_BUDGET_CHARS = int(os.environ.get("AI_HISTORY_BUDGET_CHARS", 6000)) # Roughly 4 characters per token
+AI_HISTORY_MAX_SESSIONS = int(os.environ.get("AI_HISTORY_MAX_SESSIONS", 2000)) # Sessions kept in memory; the rest stay on disk
+AI_HISTORY_IDLE_SECONDS = float(os.environ.get("AI_HISTORY_IDLE_SECONDS", 1800))
+AI_MAX_ATTEMPTS = max(1, int(os.environ.get("AI_MAX_ATTEMPTS", 3)))
+AI_RETRY_BASE_DELAY = float(os.environ.get("AI_RETRY_BASE_DELAY", 0.5))
+AI_BREAKER_THRESHOLD = int(os.environ.get("AI_BREAKER_THRESHOLD", 5)) # Consecutive failures before an endpoint is skipped
+AI_BREAKER_COOLDOWN = float(os.environ.get("AI_BREAKER_COOLDOWN", 30))
+AI_HEDGE_DELAY = float(os.environ.get("AI_HEDGE_DELAY", 1)) # Seconds to connect before hedging, until an endpoint has a connect p95
+# Each POST is a full generation, so it is only repeated when the upstream can't have processed it:
+# it never got a connection, or the endpoint refused it with 429. Other errors count against the breaker only.
+RETRYABLE_STATUSES = {429}
+UNHEALTHY_STATUSES = {429, 502, 503, 504}
+
+class ResponseCache:
+    """
+    Bounded LRU cache of AI replies keyed on a normalized prompt, with per-entry TTL.
+    Also keeps the counters shown by /aistats.
+    """
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict() # {key: (expires_at, text)}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(prompt: str) -> str:
+        # Case and whitespace differences shouldn't cost another upstream request.
+        return " ".join(prompt.casefold().split())
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, text = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class AdmissionRejected(Exception):
+    pass
+
+class AdmissionController:
+    """
+    Bounds concurrent upstream requests. Requests beyond the global limit wait in
+    per-group queues (one per guild, or per user in DMs) that are served round-robin,
+    so one busy guild can't starve the rest.
+    """
+    def __init__(self, max_inflight: int, max_per_user: int, max_queued: int):
+        self.max_inflight = max_inflight
+        self.max_per_user = max_per_user
+        self.max_queued = max_queued
+        self.inflight = 0
+        self._user_pending: dict[int, int] = {} # {user_id: in-flight + queued requests}
+        self._waiting: OrderedDict[int, deque[asyncio.Future]] = OrderedDict() # {group_id: waiters}, in service order
+        self.queued_count = 0
+        self.admitted = 0
+        self.queued_total = 0
+        self.rejected = 0
+
+    def enqueue(self, user_id: int, group_id: int) -> asyncio.Future | None:
+        """
+        Claims a slot for the user. Returns None if admitted immediately, otherwise a
+        future that resolves once a slot is handed over. Raises AdmissionRejected.
+        """
+        if self._user_pending.get(user_id, 0) >= self.max_per_user:
+            self.rejected += 1
+            raise AdmissionRejected(f"You already have {self.max_per_user} AI request(s) in progress. Please wait for them to finish.")
+        if self.inflight < self.max_inflight and not self._waiting:
+            self._user_pending[user_id] = self._user_pending.get(user_id, 0) + 1
+            self.inflight += 1
+            self.admitted += 1
+            return None
+        if self.queued_count >= self.max_queued:
+            self.rejected += 1
+            raise AdmissionRejected("The AI is very busy right now. Please try again in a minute.")
+
+        self._user_pending[user_id] = self._user_pending.get(user_id, 0) + 1
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(group_id, deque()).append(future)
+        self.queued_count += 1
+        self.queued_total += 1
+        return future
+
+    def position(self, group_id: int, future: asyncio.Future) -> int:
+        """1-based position in the round-robin service order."""
+        queue = self._waiting.get(group_id)
+        if not queue or future not in queue:
+            return 0
+        index = queue.index(future)
+        ahead = 0
+        seen_group = False
+        for other_id, other_queue in self._waiting.items():
+            if other_id == group_id:
+                seen_group = True
+                ahead += index
+            else:
+                # Groups earlier in the rotation get one more turn in our round.
+                ahead += min(len(other_queue), index if seen_group else index + 1)
+        return ahead + 1
+
+    def cancel(self, user_id: int, group_id: int, future: asyncio.Future):
+        """Withdraws a waiter that gave up. If it was already admitted, releases its slot."""
+        queue = self._waiting.get(group_id)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._waiting[group_id]
+            self.queued_count -= 1
+            self._decrement_user(user_id)
+            future.cancel()
+        elif future.done() and not future.cancelled():
+            self.release(user_id)
+
+    def release(self, user_id: int):
+        self._decrement_user(user_id)
+        self.inflight -= 1
+        self._dispatch()
+
+    def _decrement_user(self, user_id: int):
+        remaining = self._user_pending.get(user_id, 0) - 1
+        if remaining > 0:
+            self._user_pending[user_id] = remaining
+        else:
+            self._user_pending.pop(user_id, None)
+
+    def _dispatch(self):
+        while self.inflight < self.max_inflight and self._waiting:
+            group_id, queue = next(iter(self._waiting.items()))
+            future = queue.popleft()
+            self.queued_count -= 1
+            if queue:
+                self._waiting.move_to_end(group_id)
+            else:
+                del self._waiting[group_id]
+            self.inflight += 1
+            self.admitted += 1
+            future.set_result(True)
+
+class UpstreamUnavailable(Exception):
+    pass
+
+# Failures that happen before a request is sent, so retrying can't repeat it.
+RETRYABLE_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ConnectionTimeoutError, UpstreamUnavailable)
+
+class Endpoint:
+    """Latency statistics and circuit breaker state for one upstream URL."""
+    __slots__ = ("url", "ewma", "latencies", "connect_times", "consecutive_failures", "opened_at", "probing",
+                 "successes", "failures")
+
+    MIN_SAMPLES_FOR_P95 = 20
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ewma = 1.0 # Seconds to response headers, smoothed
+        self.latencies: deque[float] = deque(maxlen=200)
+        self.connect_times: deque[float] = deque(maxlen=200) # Seconds to open a new connection
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None # Set while the breaker is open
+        self.probing = False
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= AI_BREAKER_COOLDOWN:
+            return "half-open"
+        return "open"
+
+    def available(self) -> bool:
+        state = self.state
+        # A half-open breaker lets exactly one probe request through.
+        return state == "closed" or (state == "half-open" and not self.probing)
+
+    @classmethod
+    def _p95(cls, samples: deque[float]) -> float | None:
+        if len(samples) < cls.MIN_SAMPLES_FOR_P95:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def p95(self) -> float | None:
+        """Seconds to response headers."""
+        return self._p95(self.latencies)
+
+    def connect_p95(self) -> float | None:
+        """Seconds to open a new connection, the only phase a hedge races."""
+        return self._p95(self.connect_times)
+
+    def record_success(self, latency: float):
+        self.latencies.append(latency)
+        self.ewma = 0.8 * self.ewma + 0.2 * latency
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.successes += 1
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.failures += 1
+        if self.probing or self.consecutive_failures >= AI_BREAKER_THRESHOLD:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+class UpstreamClient:
+    """
+    Posts to one of several equivalent AI endpoints. Endpoints are picked at random
+    weighted by inverse latency, skipped while their circuit breaker is open, retried
+    with jittered backoff when a request never connected or was refused with 429, and
+    hedged with a second endpoint when the first is still connecting after its usual connect p95.
+    Requests are not idempotent, so a request that may have been sent is never repeated.
+    """
+    def __init__(self, session: aiohttp.ClientSession, urls: list[str]):
+        self.session = session
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _pick(self, exclude: set[Endpoint]) -> Endpoint | None:
+        candidates = [ep for ep in self.endpoints if ep not in exclude and ep.available()]
+        if not candidates:
+            return None
+        endpoint = random.choices(candidates, weights=[1 / max(ep.ewma, 0.01) for ep in candidates])[0]
+        if endpoint.state == "half-open":
+            endpoint.probing = True
+        return endpoint
+
+    async def _send(self, endpoint: Endpoint, **kwargs) -> aiohttp.ClientResponse:
+        start = time.monotonic()
+        try:
+            response = await self.session.post(endpoint.url, **kwargs)
+        except asyncio.CancelledError:
+            endpoint.probing = False
+            raise
+        except Exception:
+            endpoint.record_failure()
+            raise
+        if response.status in UNHEALTHY_STATUSES:
+            endpoint.record_failure()
+        else:
+            endpoint.record_success(time.monotonic() - start)
+        return response
+
+    async def _hedged_attempt(self, exclude: set[Endpoint], **kwargs) -> aiohttp.ClientResponse:
+        primary = self._pick(exclude)
+        if primary is None:
+            raise UpstreamUnavailable("All AI endpoints are currently unavailable.")
+        exclude.add(primary)
+        # Whichever copy connects first is the only one sent; see SendRace.
+        race = SendRace()
+        kwargs["trace_request_ctx"] = race
+        tasks = {asyncio.create_task(self._send(primary, **kwargs)): primary}
+        race.add(next(iter(tasks)))
+        winner = None
+        try:
+            # Hedges only race the connect phase, so wait as long as connecting usually takes,
+            # not as long as a whole reply does.
+            hedge_delay = primary.connect_p95() or AI_HEDGE_DELAY
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done and not race.claimed:
+                backup = self._pick(exclude)
+                if backup is not None:
+                    exclude.add(backup)
+                    self.hedges += 1
+                    task = asyncio.create_task(self._send(backup, **kwargs))
+                    tasks[task] = backup
+                    race.add(task)
+
+            pending = set(tasks)
+            last_error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue # Lost the race to connect
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                    elif winner is None and (task.result().status not in RETRYABLE_STATUSES or not pending):
+                        winner = task
+                if winner is not None:
+                    if tasks[winner] is not primary:
+                        self.hedge_wins += 1
+                    return winner.result()
+            raise last_error
+        finally:
+            if race.connect_time is not None and race.winner in tasks:
+                tasks[race.winner].connect_times.append(race.connect_time)
+            for task in tasks:
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None:
+                    task.result().release()
+
+    @contextlib.asynccontextmanager
+    async def post(self, **kwargs):
+        """
+        Yields the response from the first endpoint that answers. A response with a
+        retryable status is yielded only if every attempt failed that way.
+        """
+        exclude: set[Endpoint] = set()
+        response = None
+        for attempt in range(AI_MAX_ATTEMPTS):
+            if attempt:
+                self.retries += 1
+                await asyncio.sleep(random.uniform(0, AI_RETRY_BASE_DELAY * 2 ** attempt))
+                if all(ep in exclude for ep in self.endpoints):
+                    # Every endpoint has been tried once; allow them again.
+                    exclude.clear()
+            try:
+                response = await self._hedged_attempt(exclude, **kwargs)
+            except RETRYABLE_ERRORS:
+                if attempt == AI_MAX_ATTEMPTS - 1:
+                    raise
+                continue
+            if response.status not in RETRYABLE_STATUSES or attempt == AI_MAX_ATTEMPTS - 1:
+                break
+            response.release()
+        try:
+            yield response
+        finally:
+            response.release()
+
+class ConversationStore:
+    """
+    Per-session chat history. Each session is a deque of (role, content) tuples bounded
+    by message count and total characters, held in memory in least-recently-used order,
+    backed by SQLite so history survives restarts and idle sessions can be dropped from
+    memory and reloaded later. All database work runs on a single worker thread.
+    History is trimmed a whole prompt/reply exchange at a time, so it always starts with a prompt.
+    """
+    def __init__(self, db_path: str, max_messages: int, max_chars: int, max_sessions: int, idle_seconds: float):
+        self.db_path = db_path
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: OrderedDict[str, tuple[float, deque[tuple[str, str]]]] = OrderedDict() # {session_id: (last_used, messages)}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-history")
+        self._conn: sqlite3.Connection | None = None
+        self.loads = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+            self._conn.commit()
+        return self._conn
+
+    def _load_sync(self, session_id: str) -> list[tuple[str, str]]:
+        rows = self._connect().execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, self.max_messages)
+        ).fetchall()
+        rows.reverse()
+        return rows[self._excess([(role, len(content)) for role, content in rows]):]
+
+    def _append_sync(self, session_id: str, rows: list[tuple[str, str]]):
+        conn = self._connect()
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            [(session_id, role, content, now) for role, content in rows]
+        )
+        # Keep the table bounded per session the same way as the in-memory history.
+        stored = conn.execute(
+            "SELECT id, role, LENGTH(content) FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+        excess = self._excess([(role, length) for _, role, length in stored])
+        if excess:
+            conn.execute("DELETE FROM messages WHERE session_id = ? AND id <= ?", (session_id, stored[excess - 1][0]))
+        conn.commit()
+
+    def _clear_sync(self, session_id: str):
+        conn = self._connect()
+        conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        conn.commit()
+
+    def _excess(self, rows: list[tuple[str, int]]) -> int:
+        """
+        Given (role, length) for a session's messages, oldest first, returns how many of the
+        oldest to drop: whole prompt/reply exchanges until the session fits in max_messages
+        and max_chars, then any reply left at the front without its prompt.
+        """
+        remaining = len(rows)
+        total = sum(length for _, length in rows)
+        drop = 0
+        while drop < len(rows) and (remaining > self.max_messages or total > self.max_chars):
+            step = 2 if rows[drop][0] == "user" and drop + 1 < len(rows) and rows[drop + 1][0] == "assistant" else 1
+            total -= sum(length for _, length in rows[drop:drop + step])
+            remaining -= step
+            drop += step
+        while drop < len(rows) and rows[drop][0] != "user":
+            drop += 1
+        return drop
+
+    def _trim(self, messages: deque[tuple[str, str]]):
+        """Drops the oldest exchanges until the session fits in max_messages and max_chars."""
+        for _ in range(self._excess([(role, len(content)) for role, content in messages])):
+            messages.popleft()
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        while self._sessions:
+            session_id, (last_used, _) = next(iter(self._sessions.items()))
+            if last_used > cutoff and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    async def _get_session(self, session_id: str) -> deque[tuple[str, str]]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            rows = await self._run(self._load_sync, session_id)
+            self.loads += 1
+            # Another request may have loaded the session while we waited on the database.
+            entry = self._sessions.get(session_id) or (0.0, deque(rows))
+        self._sessions[session_id] = (time.monotonic(), entry[1])
+        self._sessions.move_to_end(session_id)
+        self._evict()
+        return entry[1]
+
+    async def get_context(self, session_id: str, prompt: str, budget_chars: int) -> list[dict[str, str]]:
+        """Returns the most recent messages that fit in the budget alongside `prompt`, oldest first."""
+        messages = await self._get_session(session_id)
+        remaining = budget_chars - len(prompt)
+        context = []
+        for role, content in reversed(messages):
+            remaining -= len(content)
+            if remaining < 0:
+                break
+            context.append({"role": role, "content": content})
+        # Don't open with a reply whose prompt didn't fit.
+        while context and context[-1]["role"] != "user":
+            context.pop()
+        context.reverse()
+        return context
+
+    async def append(self, session_id: str, prompt: str, reply: str):
+        rows = [("user", prompt), ("assistant", reply)]
+        messages = await self._get_session(session_id)
+        messages.extend(rows)
+        self._trim(messages)
+        await self._run(self._append_sync, session_id, rows)
+
+    async def clear(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        await self._run(self._clear_sync, session_id)
+
+    def memory_stats(self) -> tuple[int, int, int]:
+        """Returns (sessions, messages, approximate bytes) currently held in memory."""
+        message_count = 0
+        size = sys.getsizeof(self._sessions)
+        for _, messages in self._sessions.values():
+            message_count += len(messages)
+            size += sys.getsizeof(messages)
+            for row in messages:
+                size += sys.getsizeof(row) + sys.getsizeof(row[1])
+        return len(self._sessions), message_count, size
+
+    def _close_sync(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        # Queued behind any pending writes, so none of them can reopen the connection after it.
+        self._executor.submit(self._close_sync)
+        self._executor.shutdown(wait=True)
 
 class AICog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.session = aiohttp.ClientSession()
+        # The session is owned by the bot (see main.py); the cog only borrows it.
+        self.upstream = UpstreamClient(bot.http_service.session, API_URLS)
+        self.cache = ResponseCache(AI_CACHE_MAX_ENTRIES, AI_CACHE_TTL)
+        self._inflight: dict[str, asyncio.Future] = {} # {cache_key: future resolving to the reply text or None}
+        self.admission = AdmissionController(AI_MAX_INFLIGHT, AI_MAX_PER_USER, AI_MAX_QUEUED)
+        self.history = ConversationStore(AI_HISTORY_DB, AI_HISTORY_MAX_MESSAGES, AI_HISTORY_MAX_CHARS, AI_HISTORY_MAX_SESSIONS, AI_HISTORY_IDLE_SECONDS)
 
     async def cog_unload(self):
-        await self.session.close()
+        await asyncio.to_thread(self.history.close)
 
-    @app_commands.command(name="ask", description="Sends a prompt to a custom AI endpoint.")
-    @app_commands.describe(prompt="The text you want to send to the AI.")
-    async def ask_ai_command(self, interaction: discord.Interaction, prompt: str):
-        await interaction.response.defer(thinking=True)
+    @staticmethod
+    def _format_partial_message(text: str) -> str:
+        # While streaming, only the first page is shown; the full reply is paginated at the end.
+        return (AI_EMOJI + text)[:1990] + " ▌"
+
+    @staticmethod
+    def _parse_sse_event(event: str) -> str | None:
+        """Returns the joined data lines of one server-sent event, or None if it has none."""
+        data_lines = [
+            line[5:].removeprefix(" ")
+            for line in event.split("\n")
+            if line.startswith("data:")
+        ]
+        return "\n".join(data_lines) if data_lines else None
+
+    @staticmethod
+    async def _iter_response_text(response: aiohttp.ClientResponse):
+        """Yields decoded text pieces from a chunked or server-sent-events body."""
+        is_sse = response.content_type == "text/event-stream"
+        # Incremental decoding keeps multi-byte characters intact across chunk boundaries.
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        buffer = ""
+        async for chunk in response.content.iter_any():
+            text = decoder.decode(chunk)
+            if not is_sse:
+                if text:
+                    yield text
+                continue
+
+            buffer += text.replace("\r\n", "\n")
+            while "\n\n" in buffer:
+                event, buffer = buffer.split("\n\n", 1)
+                data = AICog._parse_sse_event(event)
+                if data is None:
+                    continue
+                if data == "[DONE]":
+                    return
+                yield data
+        buffer += decoder.decode(b"", final=True)
+        if not is_sse:
+            if buffer:
+                yield buffer
+            return
+        # Some servers close the stream without the blank line that ends the final event.
+        data = AICog._parse_sse_event(buffer.replace("\r\n", "\n").strip("\n"))
+        if data is not None and data != "[DONE]":
+            yield data
+
+    async def _stream_response(self, interaction: discord.Interaction, response: aiohttp.ClientResponse) -> str | None:
+        """
+        Relays the response body to Discord as it arrives. The first piece is sent as
+        the followup right away; later pieces are batched into edits no more often than
+        STREAM_EDIT_INTERVAL.
+        """
+        text = ""
+        message: discord.WebhookMessage | None = None
+        last_edit = 0.0
+
+        async for piece in self._iter_response_text(response):
+            text += piece
+            if not text.strip():
+                continue
+            if message is None:
+                message = await interaction.followup.send(self._format_partial_message(text), wait=True)
+                last_edit = time.monotonic()
+                continue
+            if time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+                await message.edit(content=self._format_partial_message(text))
+                last_edit = time.monotonic()
+
+        if not text.strip():
+            await interaction.followup.send("AI returned an empty response.", ephemeral=True)
+            return None
+        # When streaming, always finish with an edit to drop the typing cursor, even if nothing changed.
+        await send_long_text(interaction, AI_EMOJI + text, message=message, filename="ai_response.txt")
+        return text
 
+    async def _wait_for_admission(self, interaction: discord.Interaction) -> bool:
+        """Waits for an upstream slot, showing the queue position in the deferred message."""
+        user_id = interaction.user.id
+        group_id = interaction.guild_id or user_id
+        try:
+            future = self.admission.enqueue(user_id, group_id)
+        except AdmissionRejected as e:
+            await interaction.followup.send(str(e), ephemeral=True)
+            return False
+        if future is None:
+            return True
+
+        deadline = time.monotonic() + AI_QUEUE_TIMEOUT
+        shown_position = None
+        try:
+            while not future.done():
+                position = self.admission.position(group_id, future)
+                if position != shown_position:
+                    shown_position = position
+                    try:
+                        await interaction.edit_original_response(content=f"⏳ The AI is busy. You are #{position} in the queue...")
+                    except discord.HTTPException:
+                        pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), timeout=min(QUEUE_UPDATE_INTERVAL, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.TimeoutError:
+            self.admission.cancel(user_id, group_id, future)
+            self.admission.rejected += 1
+            await interaction.followup.send("Your AI request waited too long in the queue. Please try again later.", ephemeral=True)
+            return False
+        except BaseException:
+            self.admission.cancel(user_id, group_id, future)
+            raise
+
+        # Clear the queue notice so the reply is posted as a normal followup.
+        try:
+            await interaction.delete_original_response()
+        except discord.HTTPException:
+            pass
+        return True
+
+    async def _request_ai(self, interaction: discord.Interaction, prompt: str, context: list[dict[str, str]] | None = None) -> str | None:
+        """Sends the prompt upstream and relays the reply. Returns the reply text, or None on failure."""
+        if not await self._wait_for_admission(interaction):
+            return None
+        try:
+            return await self._send_upstream(interaction, prompt, context or [])
+        finally:
+            self.admission.release(interaction.user.id)
+
+    async def _send_upstream(self, interaction: discord.Interaction, prompt: str, context: list[dict[str, str]]) -> str | None:
         payload = {
-            "messages": [
+            "messages": context + [
                 {
                     "role": "user",
                     "content": prompt
                 }
-            ],
-            "session_id": str(interaction.user.name)
+            ]
         }
+        # No upstream session: private asks send their history in `messages`, and shared asks must be
+        # stateless so one user's remote context can't end up in a reply cached for everyone.
 
         headers = {
-            "Content-Type": "application/json" # Assuming the request still needs to be JSON
+            "Content-Type": "application/json", # Assuming the request still needs to be JSON
+            "Accept": "text/event-stream, text/plain;q=0.9",
         }
 
         try:
-            timeout = aiohttp.ClientTimeout(total=30)
-            async with self.session.post(API_URL, json=payload, headers=headers, timeout=timeout) as response:
+            # The 30s budget applies between chunks; a steadily streaming reply may run longer overall.
+            timeout = self.bot.http_service.timeout("ai")
+            async with self.upstream.post(json=payload, headers=headers, timeout=timeout) as response:
                 if response.status == 200:
-                    ai_message_content = "<:Ai:1376557302127001600>" + await response.text()
-
-                    if ai_message_content:
-                        # Discord messages have a 2000 character limit.
-                        if len(ai_message_content) <= 2000:
-                            await interaction.followup.send(ai_message_content)
-                        else:
-                            # If the message is too long, send the beginning and indicate truncation.
-                            # Alternatively, you could send it as a file or split it into multiple messages.
-                            await interaction.followup.send(ai_message_content[:1980] + "\n\n[Response truncated due to length]")
-                    else:
-                        await interaction.followup.send("AI returned an empty response.", ephemeral=True)
+                    return await self._stream_response(interaction, response)
                 else:
                     response_text = await response.text() # Get error response as text
                     error_message = f"Error calling AI endpoint: {response.status} - {response.reason}\n```\n{response_text[:1000]}\n```"
                     await interaction.followup.send(error_message, ephemeral=True)
 
+        except UpstreamUnavailable as e:
+            await interaction.followup.send(f"Error: {e} Please try again in a little while.", ephemeral=True)
         except aiohttp.ClientConnectorError:
-            await interaction.followup.send(f"Error: Could not connect to the AI endpoint at `{API_URL}`. It might be down or inaccessible.", ephemeral=True)
+            await interaction.followup.send("Error: Could not connect to the AI endpoint. It might be down or inaccessible.", ephemeral=True)
         except asyncio.TimeoutError:
-            await interaction.followup.send(f"Error: The request to the AI endpoint timed out after 30 seconds.", ephemeral=True)
+            await interaction.followup.send(f"Error: The request to the AI endpoint stalled for more than 30 seconds.", ephemeral=True)
         except Exception as e:
             print(f"An unexpected error occurred in ask_ai_command: {e}")
             await interaction.followup.send(f"An unexpected error occurred: {e}", ephemeral=True)
+        return None
+
+    @app_commands.command(name="ask", description="Sends a prompt to a custom AI endpoint.")
+    @app_commands.describe(
+        prompt="The text you want to send to the AI.",
+        private="Continue your own conversation: includes your recent chat history and skips the shared answer cache."
+    )
+    async def ask_ai_command(self, interaction: discord.Interaction, prompt: str, private: bool = False):
+        await interaction.response.defer(thinking=True)
+        session_id = str(interaction.user.id)
+
+        if private:
+            # Only private asks carry history; shared asks must stay context-free to be cacheable.
+            context = await self.history.get_context(session_id, prompt, AI_HISTORY_BUDGET_CHARS)
+            text = await self._request_ai(interaction, prompt, context)
+            if text is not None:
+                await self.history.append(session_id, prompt, text)
+            return
+
+        key = self.cache.make_key(prompt)
+        cached_text = self.cache.get(key)
+        if cached_text is not None:
+            await send_long_text(interaction, AI_EMOJI + cached_text, filename="ai_response.txt")
+            await self.history.append(session_id, prompt, cached_text)
+            return
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            # Someone is already asking this exact prompt; share their upstream request.
+            self.cache.coalesced += 1
+            text = await asyncio.shield(inflight)
+            if text is None:
+                await interaction.followup.send("The AI request for this prompt failed. Please try again.", ephemeral=True)
+            else:
+                await send_long_text(interaction, AI_EMOJI + text, filename="ai_response.txt")
+                await self.history.append(session_id, prompt, text)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        text = None
+        try:
+            text = await self._request_ai(interaction, prompt)
+            if text is not None:
+                self.cache.put(key, text)
+        finally:
+            self._inflight.pop(key, None)
+            future.set_result(text)
+        if text is not None:
+            await self.history.append(session_id, prompt, text)
+
+    @app_commands.command(name="aireset", description="Clears your AI conversation history.")
+    async def ai_reset_command(self, interaction: discord.Interaction):
+        await self.history.clear(str(interaction.user.id))
+        await interaction.response.send_message("Your AI conversation history has been cleared.", ephemeral=True)
+
+    @app_commands.command(name="aistats", description="Shows AI cache and queue statistics.")
+    async def ai_stats_command(self, interaction: discord.Interaction):
+        cache = self.cache
+        lookups = cache.hits + cache.misses
+        hit_rate = (cache.hits / lookups * 100) if lookups else 0.0
+        embed = discord.Embed(title="AI Statistics", color=0xd37bff)
+        embed.add_field(name="Entries", value=f"{len(cache)} / {cache.max_entries}", inline=True)
+        embed.add_field(name="TTL", value=f"{cache.ttl:.0f}s", inline=True)
+        embed.add_field(name="Hit Rate", value=f"{hit_rate:.1f}%", inline=True)
+        embed.add_field(name="Hits", value=str(cache.hits), inline=True)
+        embed.add_field(name="Misses", value=str(cache.misses), inline=True)
+        embed.add_field(name="Coalesced", value=str(cache.coalesced), inline=True)
+        embed.add_field(name="Evictions", value=str(cache.evictions), inline=True)
+        embed.add_field(name="Upstream Requests Saved", value=str(cache.hits + cache.coalesced), inline=True)
+        admission = self.admission
+        embed.add_field(name="In Flight", value=f"{admission.inflight} / {admission.max_inflight}", inline=True)
+        embed.add_field(name="Waiting", value=f"{admission.queued_count} / {admission.max_queued}", inline=True)
+        embed.add_field(name="Per-User Limit", value=str(admission.max_per_user), inline=True)
+        embed.add_field(name="Admitted", value=str(admission.admitted), inline=True)
+        embed.add_field(name="Queued", value=str(admission.queued_total), inline=True)
+        embed.add_field(name="Rejected", value=str(admission.rejected), inline=True)
+        upstream = self.upstream
+        endpoint_lines = []
+        for endpoint in upstream.endpoints:
+            p95, connect_p95 = endpoint.p95(), endpoint.connect_p95()
+            p95_text = f"{p95:.2f}s" if p95 is not None else "n/a"
+            connect_text = f"{connect_p95:.2f}s" if connect_p95 is not None else "n/a"
+            endpoint_lines.append(
+                f"`{endpoint.url}` {endpoint.state}, avg {endpoint.ewma:.2f}s, p95 {p95_text}, connect p95 {connect_text}, "
+                f"{endpoint.successes} ok / {endpoint.failures} failed"
+            )
+        embed.add_field(name="Endpoints", value="\n".join(endpoint_lines)[:1024], inline=False)
+        embed.add_field(name="Retries", value=str(upstream.retries), inline=True)
+        embed.add_field(name="Hedged", value=str(upstream.hedges), inline=True)
+        embed.add_field(name="Hedge Wins", value=str(upstream.hedge_wins), inline=True)
+        sessions, messages, size = self.history.memory_stats()
+        embed.add_field(name="History Sessions", value=f"{sessions} / {self.history.max_sessions}", inline=True)
+        embed.add_field(name="History Messages", value=str(messages), inline=True)
+        embed.add_field(name="History Memory", value=f"{size / 1024:.1f} KiB", inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         if isinstance(error, app_commands.CommandOnCooldown):
@@ -5,6 +5,7 @@ from discord import app_commands
 import os
 import sys
 import traceback # For detailed error messages
+from cogs._pagination import send_long_text
 
 # Directory where your cogs are stored, relative to the main bot file.
 # Ensure this matches the COGS_DIR in your main.py if you're referencing it.
@@ -206,9 +207,37 @@ class ManageCog(commands.Cog):
             for cog, error in failed_cogs.items():
                 response_message += f"- `{cog}`: {error}\n"
 
-        await interaction.followup.send(response_message[:2000], ephemeral=True)
+        await send_long_text(interaction, response_message, ephemeral=True, filename="reload_report.txt")
 
 
+    @manage_commands_group.command(name="httpstats", description="Shows shared HTTP connection pool statistics.")
+    @app_commands.check(is_bot_owner_check) # Apply check here
+    async def http_stats_command(self, interaction: discord.Interaction):
+        stats = self.bot.http_service.stats()
+        embed = discord.Embed(title="HTTP Pool Statistics", color=0xd37bff)
+        embed.add_field(name="Connections In Use", value=f"{stats['in_use']} / {stats['limit']}", inline=True)
+        embed.add_field(name="Idle Connections", value=str(stats["idle"]), inline=True)
+        embed.add_field(name="Per-Host Limit", value=str(stats["limit_per_host"]), inline=True)
+        embed.add_field(name="Requests", value=str(stats["requests"]), inline=True)
+        embed.add_field(name="Request Errors", value=str(stats["request_errors"]), inline=True)
+        embed.add_field(name="Connections Opened", value=str(stats["connections_created"]), inline=True)
+        embed.add_field(name="Connections Reused", value=str(stats["connections_reused"]), inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @manage_commands_group.command(name="imagestats", description="Shows image worker pool statistics.")
+    @app_commands.check(is_bot_owner_check) # Apply check here
+    async def image_stats_command(self, interaction: discord.Interaction):
+        stats = self.bot.image_service.stats()
+        embed = discord.Embed(title="Image Worker Statistics", color=0xd37bff)
+        embed.add_field(name="Mode", value=f"{stats['mode']} ({stats['workers']} workers)", inline=True)
+        embed.add_field(name="Waiting", value=str(stats["waiting"]), inline=True)
+        embed.add_field(name="Jobs Run", value=str(stats["jobs"]), inline=True)
+        embed.add_field(name="Average Job Time", value=f"{stats['avg_ms']:.0f} ms", inline=True)
+        embed.add_field(name="Failures", value=str(stats["failures"]), inline=True)
+        embed.add_field(name="Timeouts", value=f"{stats['timeouts']} ({stats['abandoned']} still running)", inline=True)
+        embed.add_field(name="Rejected (Busy)", value=str(stats["rejected"]), inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     @manage_commands_group.command(name="shutdown", description="Shuts down the bot gracefully.")
     @app_commands.check(is_bot_owner_check) # Apply check here
     async def shutdown_command(self, interaction: discord.Interaction):
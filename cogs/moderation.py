@@ -2,8 +2,708 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+import asyncio
 import datetime
+import fnmatch
+import heapq
+import os
+import re
+import sqlite3
+import time
 import typing # For Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+PURGE_MAX_AMOUNT = 10000
+PURGE_MAX_SCAN = 50000 # Messages looked at per run, so a filter that rarely matches can't walk the whole history
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5) # Discord refuses bulk deletes at 14 days
+BULK_DELETE_SIZE = 100
+OLD_DELETE_INTERVAL = 1.0 # Seconds between individual deletes of messages too old to bulk delete
+PURGE_PROGRESS_INTERVAL = 3.0
+INTERACTION_EDIT_WINDOW = datetime.timedelta(minutes=14) # Interaction tokens (and followup edits) expire after 15 minutes
+LINK_RE = re.compile(r"https?://\S+|discord(?:\.gg|(?:app)?\.com/invite)/\S+", re.IGNORECASE)
+MESSAGE_LINK_RE = re.compile(r"/channels/(?:\d+|@me)/\d+/(\d+)")
+MASSBAN_MAX_TARGETS = 1000
+MASSBAN_CONCURRENCY = 4 # Ban requests in flight at once; discord.py waits out the rate-limit bucket beyond this
+MASSBAN_PREVIEW_COUNT = 15
+MASSBAN_PATTERN_MAX_LENGTH = 100
+USER_ID_RE = re.compile(r"\d{15,21}")
+MODERATION_DB = os.environ.get("MODERATION_DB", "data/moderation.db")
+INFRACTION_FLUSH_INTERVAL = 0.5 # Seconds between batched infraction writes
+INFRACTION_BATCH_SIZE = 200 # Pending rows that trigger an early flush
+INFRACTION_MAX_PENDING = 50000 # Rows kept for retry while the database can't be written; the oldest go first
+HISTORY_PAGE_SIZE = 10
+ESCALATION_TRIGGERS = ("warn", "mute", "kick")
+ESCALATION_ACTIONS = ("timeout", "kick", "ban")
+ESCALATION_RECORDED_AS = {"timeout": "mute", "kick": "kick", "ban": "ban"} # Infraction type an automatic action is logged as
+MAX_ESCALATION_RULES = 10 # Per guild
+MAX_TIMEOUT = datetime.timedelta(days=28)
+ESCALATION_PRUNE_EVERY = 1000 # Observations between sweeps of idle sliding windows
+MAX_MUTE = datetime.timedelta(days=365) # Longer than Discord's 28-day timeout; renewed by the scheduler
+MAX_TEMP_DURATION = datetime.timedelta(days=365)
+TIMEOUT_RENEW_MARGIN = 60 # Seconds before a timeout chunk ends that the next one is applied
+SCHEDULER_MAX_SLEEP = 3600 # Re-check the clock at least this often, in case wall time jumps
+SCHEDULER_RETRY_DELAY = 300
+SCHEDULER_MAX_ATTEMPTS = 5
+SCHEDULER_ERROR_BACKOFF = 5 # Pause after an unexpected error in the scheduler loop
+DURATION_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+
+def parse_duration(duration_str: str) -> datetime.timedelta:
+    """Parses durations like 30s, 10m, 1h or 2d. Raises ValueError with a message fit for the user."""
+    duration_str = duration_str.strip()
+    unit = duration_str[-1:].lower()
+    if unit not in DURATION_UNITS:
+        raise ValueError("Invalid duration unit. Use 's', 'm', 'h', or 'd'.")
+    try:
+        time_value = int(duration_str[:-1])
+    except ValueError:
+        raise ValueError("Invalid duration format. Example: `10m`, `1h`, `2d`.")
+    return datetime.timedelta(**{DURATION_UNITS[unit]: time_value})
+
+def parse_name_pattern(pattern: str) -> re.Pattern:
+    """Compiles a glob (* and ? wildcards) into a case-insensitive name filter; plain text matches anywhere.
+    Globs translate to regexes without nested repeats, so matching every member can't stall the event loop."""
+    pattern = pattern.strip()
+    if not pattern:
+        raise ValueError("The name pattern is empty.")
+    if len(pattern) > MASSBAN_PATTERN_MAX_LENGTH:
+        raise ValueError(f"The name pattern can be at most {MASSBAN_PATTERN_MAX_LENGTH} characters.")
+    if not any(char in pattern for char in "*?["):
+        pattern = f"*{pattern}*"
+    return re.compile(fnmatch.translate(pattern), re.IGNORECASE)
+
+def parse_history_point(value: str) -> typing.Union[datetime.datetime, discord.Object]:
+    """Reads a message ID, a message link, or a duration ago (e.g. 2h) as a point in channel history."""
+    value = value.strip()
+    if value.isdigit():
+        return discord.Object(id=int(value))
+    match = MESSAGE_LINK_RE.search(value)
+    if match:
+        return discord.Object(id=int(match.group(1)))
+    return discord.utils.utcnow() - parse_duration(value)
+
+class InfractionStore:
+    """
+    Moderation log in SQLite (WAL). record() only appends to an in-memory batch; a
+    writer task flushes batches in one transaction on a single worker thread, so
+    commands never wait on disk. History pages use keyset pagination over the
+    (guild_id, user_id, created_at) index, so deep pages cost the same as the first.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="infractions")
+        self._conn: sqlite3.Connection | None = None
+        self._pending: list[tuple] = []
+        self._wake = asyncio.Event()
+        self._writer_task: asyncio.Task | None = None
+        self.written = 0
+        self.dropped = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS infractions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+                "moderator_id INTEGER, action TEXT NOT NULL, reason TEXT, duration REAL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_infractions_member ON infractions (guild_id, user_id, created_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_infractions_guild_time ON infractions (guild_id, created_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS scheduled_actions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+                "action TEXT NOT NULL, run_at REAL NOT NULL, role_id INTEGER, until REAL, reason TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scheduled_run_at ON scheduled_actions (run_at)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS escalation_rules ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, trigger TEXT NOT NULL, "
+                "threshold INTEGER NOT NULL, window REAL NOT NULL, action TEXT NOT NULL, duration REAL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _insert_sync(self, rows: list[tuple]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO infractions (guild_id, user_id, moderator_id, action, reason, duration, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def _page_sync(self, guild_id: int, user_id: int, cursor: tuple[float, int] | None, limit: int) -> list[tuple]:
+        query = "SELECT id, action, reason, moderator_id, duration, created_at FROM infractions WHERE guild_id = ? AND user_id = ?"
+        params: list = [guild_id, user_id]
+        if cursor is not None:
+            query += " AND (created_at, id) < (?, ?)"
+            params.extend(cursor)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return self._connect().execute(query, params).fetchall()
+
+    def _count_sync(self, guild_id: int, user_id: int) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM infractions WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        ).fetchone()[0]
+
+    def _recent_sync(self, since: float, guild_id: int | None) -> list[tuple]:
+        query = "SELECT guild_id, user_id, action, created_at FROM infractions WHERE created_at >= ?"
+        params: list = [since]
+        if guild_id is not None:
+            query = "SELECT guild_id, user_id, action, created_at FROM infractions WHERE guild_id = ? AND created_at >= ?"
+            params.insert(0, guild_id)
+        return self._connect().execute(query + " ORDER BY created_at", params).fetchall()
+
+    def _load_rules_sync(self) -> list[tuple]:
+        return self._connect().execute(
+            "SELECT id, guild_id, trigger, threshold, window, action, duration FROM escalation_rules ORDER BY id"
+        ).fetchall()
+
+    def _add_rule_sync(self, guild_id: int, trigger: str, threshold: int, window: float, action: str, duration: float | None) -> int:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO escalation_rules (guild_id, trigger, threshold, window, action, duration) VALUES (?, ?, ?, ?, ?, ?)",
+                (guild_id, trigger, threshold, window, action, duration)
+            )
+        return cursor.lastrowid
+
+    def _remove_rule_sync(self, guild_id: int, rule_id: int) -> bool:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("DELETE FROM escalation_rules WHERE guild_id = ? AND id = ?", (guild_id, rule_id))
+        return cursor.rowcount > 0
+
+    def _load_scheduled_sync(self) -> list[tuple]:
+        return self._connect().execute(
+            "SELECT id, guild_id, user_id, action, run_at, role_id, until, reason FROM scheduled_actions"
+        ).fetchall()
+
+    def _add_scheduled_sync(self, guild_id: int, user_id: int, action: str, run_at: float,
+                            role_id: int | None, until: float | None, reason: str | None) -> int:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO scheduled_actions (guild_id, user_id, action, run_at, role_id, until, reason) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (guild_id, user_id, action, run_at, role_id, until, reason)
+            )
+        return cursor.lastrowid
+
+    def _remove_scheduled_sync(self, action_ids: list[int]):
+        conn = self._connect()
+        with conn:
+            conn.executemany("DELETE FROM scheduled_actions WHERE id = ?", [(action_id,) for action_id in action_ids])
+
+    def _reschedule_sync(self, action_id: int, run_at: float):
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE scheduled_actions SET run_at = ? WHERE id = ?", (run_at, action_id))
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def load_scheduled(self) -> list["ScheduledAction"]:
+        return [ScheduledAction(*row) for row in await self._run(self._load_scheduled_sync)]
+
+    async def add_scheduled(self, guild_id: int, user_id: int, action: str, run_at: float, role_id: int | None = None,
+                            until: float | None = None, reason: str | None = None) -> "ScheduledAction":
+        action_id = await self._run(self._add_scheduled_sync, guild_id, user_id, action, run_at, role_id, until, reason)
+        return ScheduledAction(action_id, guild_id, user_id, action, run_at, role_id, until, reason)
+
+    async def remove_scheduled(self, action_ids: list[int]):
+        await self._run(self._remove_scheduled_sync, action_ids)
+
+    async def reschedule(self, action_id: int, run_at: float):
+        await self._run(self._reschedule_sync, action_id, run_at)
+
+    async def recent(self, since: float, guild_id: int | None = None) -> list[tuple]:
+        """Returns (guild_id, user_id, action, created_at) for infractions since `since`, oldest first."""
+        await self.flush()
+        return await self._run(self._recent_sync, since, guild_id)
+
+    async def load_rules(self) -> list["EscalationRule"]:
+        return [EscalationRule(*row) for row in await self._run(self._load_rules_sync)]
+
+    async def add_rule(self, guild_id: int, trigger: str, threshold: int, window: float, action: str,
+                       duration: float | None) -> "EscalationRule":
+        rule_id = await self._run(self._add_rule_sync, guild_id, trigger, threshold, window, action, duration)
+        return EscalationRule(rule_id, guild_id, trigger, threshold, window, action, duration)
+
+    async def remove_rule(self, guild_id: int, rule_id: int) -> bool:
+        return await self._run(self._remove_rule_sync, guild_id, rule_id)
+
+    def start(self):
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._run_writer())
+
+    def record(self, guild_id: int, user_id: int, moderator_id: int | None, action: str,
+               reason: str | None = None, duration: datetime.timedelta | None = None):
+        self._pending.append((guild_id, user_id, moderator_id, action, reason,
+                              duration.total_seconds() if duration else None, time.time()))
+        if len(self._pending) >= INFRACTION_BATCH_SIZE:
+            self._wake.set()
+
+    async def _run_writer(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=INFRACTION_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            # Shielded so stopping the writer task in close() can't drop a batch still queued on the worker.
+            await asyncio.shield(self._run(self._insert_sync, batch))
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            # The insert ran in one transaction, so none of the batch was written; retry it on the next flush.
+            self._pending[:0] = batch
+            dropped = len(self._pending) - INFRACTION_MAX_PENDING
+            if dropped > 0:
+                del self._pending[:dropped]
+                self.dropped += dropped
+            print(f"[InfractionStore] Failed to write {len(batch)} infraction(s), will retry: {e}")
+
+    async def page(self, guild_id: int, user_id: int, cursor: tuple[float, int] | None = None,
+                   limit: int = HISTORY_PAGE_SIZE) -> list[tuple]:
+        """Returns up to `limit` rows (id, action, reason, moderator_id, duration, created_at), newest first, older than `cursor`."""
+        await self.flush() # So a just-issued action shows up
+        return await self._run(self._page_sync, guild_id, user_id, cursor, limit)
+
+    async def count(self, guild_id: int, user_id: int) -> int:
+        await self.flush()
+        return await self._run(self._count_sync, guild_id, user_id)
+
+    def _close_sync(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self):
+        if self._writer_task:
+            self._writer_task.cancel()
+            self._writer_task = None
+        await self.flush()
+        # Queued behind any pending writes and reads, so none of them can reopen the connection after it.
+        await self._run(self._close_sync)
+        self._executor.shutdown(wait=False)
+
+class EscalationRule:
+    """`threshold` `trigger` infractions within `window` seconds → `action` (for `duration` seconds, if a timeout)."""
+    __slots__ = ("rule_id", "guild_id", "trigger", "threshold", "window", "action", "duration")
+
+    def __init__(self, rule_id: int, guild_id: int, trigger: str, threshold: int, window: float, action: str, duration: float | None):
+        self.rule_id = rule_id
+        self.guild_id = guild_id
+        self.trigger = trigger
+        self.threshold = threshold
+        self.window = window
+        self.action = action
+        self.duration = duration
+
+    def describe(self) -> str:
+        text = f"{self.threshold} {self.trigger}s in {datetime.timedelta(seconds=int(self.window))} → {self.action}"
+        if self.duration:
+            text += f" for {datetime.timedelta(seconds=int(self.duration))}"
+        return text
+
+class EscalationEngine:
+    """
+    Evaluates escalation rules as infractions happen. For each (guild, user, trigger)
+    it keeps only the timestamps of the last N infractions, where N is one more than
+    the largest threshold of any rule on that trigger; "k infractions within W" is
+    then just "the k-th newest timestamp is within W", so each infraction costs O(1)
+    per rule and nothing is re-read from the database.
+    """
+    def __init__(self):
+        self.rules: dict[int, list[EscalationRule]] = {} # {guild_id: rules}
+        self._depth: dict[tuple[int, str], int] = {} # {(guild_id, trigger): timestamps to keep}
+        self._max_window: dict[int, float] = {} # {guild_id: longest rule window}
+        self._windows: dict[tuple[int, int, str], deque[float]] = {} # {(guild_id, user_id, trigger): recent times}
+        self._observations = 0
+
+    def set_rules(self, guild_id: int, rules: list[EscalationRule]):
+        self.rules[guild_id] = rules
+        for trigger in ESCALATION_TRIGGERS:
+            thresholds = [rule.threshold for rule in rules if rule.trigger == trigger]
+            if thresholds:
+                self._depth[(guild_id, trigger)] = max(thresholds) + 1
+            else:
+                self._depth.pop((guild_id, trigger), None)
+        self._max_window[guild_id] = max((rule.window for rule in rules), default=0.0)
+        # Windows are rebuilt by replaying recent infractions, since depths may have changed.
+        for key in [key for key in self._windows if key[0] == guild_id]:
+            del self._windows[key]
+
+    def max_window(self) -> float:
+        return max(self._max_window.values(), default=0.0)
+
+    def observe(self, guild_id: int, user_id: int, trigger: str, at: float) -> EscalationRule | None:
+        """Counts one infraction and returns the most severe rule whose threshold it just reached, if any."""
+        depth = self._depth.get((guild_id, trigger))
+        if depth is None:
+            return None
+        key = (guild_id, user_id, trigger)
+        times = self._windows.get(key)
+        if times is None:
+            times = self._windows[key] = deque(maxlen=depth)
+        times.append(at)
+
+        self._observations += 1
+        if self._observations % ESCALATION_PRUNE_EVERY == 0:
+            self._prune(at)
+
+        fired = None
+        for rule in self.rules.get(guild_id, ()):
+            if rule.trigger != trigger or len(times) < rule.threshold:
+                continue
+            reached = at - times[-rule.threshold] <= rule.window
+            # Only fire on the infraction that crosses the threshold, not on every one after it.
+            already = len(times) > rule.threshold and at - times[-rule.threshold - 1] <= rule.window
+            if reached and not already:
+                if fired is None or (ESCALATION_ACTIONS.index(rule.action), rule.threshold) > (ESCALATION_ACTIONS.index(fired.action), fired.threshold):
+                    fired = rule
+        return fired
+
+    def _prune(self, now: float):
+        for key in [key for key, times in self._windows.items() if now - times[-1] > self._max_window.get(key[0], 0.0)]:
+            del self._windows[key]
+
+class ScheduledAction:
+    """A deferred unban, timeout renewal or role removal. `until` is when a long mute finally ends."""
+    __slots__ = ("action_id", "guild_id", "user_id", "action", "run_at", "role_id", "until", "reason", "attempts")
+
+    def __init__(self, action_id: int, guild_id: int, user_id: int, action: str, run_at: float,
+                 role_id: int | None, until: float | None, reason: str | None):
+        self.action_id = action_id
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.action = action
+        self.run_at = run_at
+        self.role_id = role_id
+        self.until = until
+        self.reason = reason
+        self.attempts = 0
+
+class ActionScheduler:
+    """
+    Durable deferred moderation actions. Pending actions are rows in the moderation
+    database mirrored in an in-memory min-heap by due time, and a single sleeper task
+    waits for the earliest one, so tens of thousands of timers still cost one task.
+    Actions that came due while the bot was offline run as soon as it is ready again.
+    Cancelled actions are dropped from the index and skipped lazily when they reach
+    the top of the heap.
+    """
+    def __init__(self, bot: commands.Bot, store: InfractionStore,
+                 execute: typing.Callable[[ScheduledAction], typing.Awaitable[None]]):
+        self.bot = bot
+        self.store = store
+        self.execute = execute
+        self._heap: list[tuple[float, int]] = [] # (run_at, action_id)
+        self._actions: dict[int, ScheduledAction] = {}
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.executed = 0
+
+    async def start(self):
+        for action in await self.store.load_scheduled():
+            self._actions[action.action_id] = action
+            self._heap.append((action.run_at, action.action_id))
+        heapq.heapify(self._heap)
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    def _push(self, action: ScheduledAction):
+        self._actions[action.action_id] = action
+        heapq.heappush(self._heap, (action.run_at, action.action_id))
+        if self._heap[0][1] == action.action_id:
+            self._wake.set() # New earliest deadline; the sleeper should re-arm
+
+    async def schedule(self, guild_id: int, user_id: int, action: str, run_at: float, role_id: int | None = None,
+                       until: float | None = None, reason: str | None = None) -> ScheduledAction:
+        scheduled = await self.store.add_scheduled(guild_id, user_id, action, run_at, role_id, until, reason)
+        self._push(scheduled)
+        return scheduled
+
+    async def cancel(self, guild_id: int, user_id: int, action: str, role_id: int | None = None) -> int:
+        """Cancels pending actions of one kind for a user. Returns how many were cancelled."""
+        return await self.cancel_many(guild_id, {user_id}, action, role_id)
+
+    async def cancel_many(self, guild_id: int, user_ids: set[int], action: str, role_id: int | None = None) -> int:
+        """Like cancel(), for several users in one pass over the pending actions."""
+        matches = [
+            action_id for action_id, scheduled in self._actions.items()
+            if scheduled.guild_id == guild_id and scheduled.user_id in user_ids and scheduled.action == action
+            and (role_id is None or scheduled.role_id == role_id)
+        ]
+        for action_id in matches:
+            del self._actions[action_id]
+        if matches:
+            await self.store.remove_scheduled(matches)
+        return len(matches)
+
+    async def _run(self):
+        await self.bot.wait_until_ready() # Guilds must be cached before anything can run
+        while True:
+            try:
+                await self._step()
+            except Exception as e:
+                # A failed database write must not kill the only task that runs timers.
+                print(f"[ActionScheduler] Error in scheduler loop: {e}")
+                await asyncio.sleep(SCHEDULER_ERROR_BACKOFF)
+
+    async def _step(self):
+        """Waits for the earliest action or runs it if it is due."""
+        while self._heap and self._heap[0][1] not in self._actions:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            await self._wake.wait()
+            self._wake.clear()
+            return
+        run_at, action_id = self._heap[0]
+        delay = run_at - time.time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=min(delay, SCHEDULER_MAX_SLEEP))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            return
+
+        heapq.heappop(self._heap)
+        action = self._actions.pop(action_id)
+        try:
+            await self.execute(action)
+        except Exception as e:
+            action.attempts += 1
+            if action.attempts < SCHEDULER_MAX_ATTEMPTS:
+                print(f"[ActionScheduler] {action.action} for {action.user_id} failed ({e}); retrying later.")
+                action.run_at = time.time() + SCHEDULER_RETRY_DELAY
+                self._push(action) # Back in memory first, so a failed write below doesn't lose it
+                await self.store.reschedule(action.action_id, action.run_at)
+                return
+            print(f"[ActionScheduler] Giving up on {action.action} for {action.user_id} in guild {action.guild_id}: {e}")
+        self.executed += 1
+        await self.store.remove_scheduled([action_id])
+
+class InfractionHistoryView(discord.ui.View):
+    """Newer/Older buttons over a member's infractions, fetching one page per click."""
+    def __init__(self, cog: "Moderation", guild: discord.Guild, user: discord.abc.User, author_id: int, total: int):
+        super().__init__(timeout=300.0)
+        self.cog = cog
+        self.guild = guild
+        self.user = user
+        self.author_id = author_id
+        self.total = total
+        self.cursors: list[tuple[float, int] | None] = [None] # Start cursor of each page visited so far
+        self.rows: list[tuple] = []
+        self.has_more = False
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Only the person who ran the command can turn these pages.", ephemeral=True)
+            return False
+        return True
+
+    async def load(self):
+        rows = await self.cog.infractions.page(self.guild.id, self.user.id, self.cursors[-1], HISTORY_PAGE_SIZE + 1)
+        self.has_more = len(rows) > HISTORY_PAGE_SIZE
+        self.rows = rows[:HISTORY_PAGE_SIZE]
+        self.newer_page.disabled = len(self.cursors) == 1
+        self.older_page.disabled = not self.has_more
+
+    def render(self) -> discord.Embed:
+        lines = []
+        for infraction_id, action, reason, moderator_id, duration, created_at in self.rows:
+            line = f"`#{infraction_id}` **{action.title()}** <t:{int(created_at)}:R>"
+            if moderator_id:
+                line += f" by <@{moderator_id}>"
+            if duration:
+                line += f" for {datetime.timedelta(seconds=int(duration))}"
+            if reason:
+                line += f"\n> {reason[:200]}"
+            lines.append(line)
+        page_number = len(self.cursors)
+        page_count = max(1, -(-self.total // HISTORY_PAGE_SIZE))
+        embed = self.cog._create_embed(
+            title=f"Infraction History: {self.user}",
+            description="\n".join(lines) or "No infractions recorded.",
+            color=0xd37bff,
+            fields=[("Total", str(self.total), True), ("Page", f"{page_number}/{page_count}", True)]
+        )
+        return embed
+
+    @discord.ui.button(label="◀ Newer", style=discord.ButtonStyle.secondary)
+    async def newer_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+        await self.load()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="Older ▶", style=discord.ButtonStyle.secondary)
+    async def older_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.has_more and self.rows:
+            last = self.rows[-1]
+            self.cursors.append((last[5], last[0]))
+        await self.load()
+        await interaction.response.edit_message(embed=self.render(), view=self)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+
+class PurgeJob:
+    """
+    One /mod clear run. Walks the channel history newest-first (discord.py fetches it in
+    pages of 100), bulk-deletes matching messages in batches of up to 100, and deletes
+    matches too old for bulk deletion one at a time at a paced rate. Stops after `limit`
+    matches, after PURGE_MAX_SCAN messages, or when cancelled.
+    """
+    def __init__(self, channel: discord.abc.Messageable, check: typing.Callable[[discord.Message], bool], limit: int,
+                 before=None, after=None, reason: typing.Optional[str] = None):
+        self.channel = channel
+        self.check = check
+        self.limit = limit
+        self.before = before
+        self.after = after
+        self.reason = reason
+        self.scanned = 0
+        self.matched = 0
+        self.deleted = 0
+        self.failed = 0
+        self.cancelled = False
+        self.started_at = discord.utils.utcnow()
+
+    def cancel(self):
+        self.cancelled = True
+
+    async def run(self):
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        batch: list[discord.Message] = []
+        async for message in self.channel.history(limit=PURGE_MAX_SCAN, before=self.before, after=self.after, oldest_first=False):
+            if self.cancelled:
+                break
+            self.scanned += 1
+            if not self.check(message):
+                continue
+            self.matched += 1
+            if message.created_at > cutoff:
+                batch.append(message)
+                if len(batch) == BULK_DELETE_SIZE:
+                    await self._bulk_delete(batch)
+                    batch = []
+            else:
+                # History is newest-first, so everything from here on is too old to bulk delete.
+                if batch:
+                    await self._bulk_delete(batch)
+                    batch = []
+                await self._delete_one(message)
+                await asyncio.sleep(OLD_DELETE_INTERVAL)
+            if self.matched >= self.limit:
+                break
+        if batch and not self.cancelled:
+            await self._bulk_delete(batch)
+
+    async def _bulk_delete(self, batch: list[discord.Message]):
+        try:
+            await self.channel.delete_messages(batch, reason=self.reason)
+            self.deleted += len(batch)
+        except discord.NotFound:
+            # Someone else deleted one of them first; the rest still need to go.
+            for message in batch:
+                await self._delete_one(message)
+        except discord.HTTPException as e:
+            if isinstance(e, discord.Forbidden):
+                raise
+            print(f"Bulk delete of {len(batch)} messages in {self.channel.id} failed: {e}")
+            self.failed += len(batch)
+
+    async def _delete_one(self, message: discord.Message):
+        try:
+            await message.delete()
+            self.deleted += 1
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            if isinstance(e, discord.Forbidden):
+                raise
+            self.failed += 1
+
+    def describe(self, done: bool = False) -> str:
+        if not done:
+            status = "Purging..."
+        elif self.cancelled:
+            status = "Purge cancelled."
+        else:
+            status = "Purge finished."
+        text = f"{status} Scanned {self.scanned} message(s), deleted {self.deleted}."
+        if self.failed:
+            text += f" {self.failed} could not be deleted."
+        if done and self.scanned >= PURGE_MAX_SCAN:
+            text += f" Stopped after scanning {PURGE_MAX_SCAN} messages."
+        return text
+
+class PurgeCancelView(discord.ui.View):
+    """Cancel button for a running purge."""
+    def __init__(self, job: PurgeJob, author_id: int):
+        super().__init__(timeout=None)
+        self.job = job
+        self.author_id = author_id
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id and not interaction.permissions.manage_messages:
+            await interaction.response.send_message("Only the person who started this purge can cancel it.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="Cancel", style=discord.ButtonStyle.danger)
+    async def cancel_purge(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.job.cancel()
+        button.disabled = True
+        await interaction.response.edit_message(content="Cancelling...", view=self)
+
+class MassBanConfirmView(discord.ui.View):
+    """Confirm/cancel buttons under a mass ban preview."""
+    def __init__(self, author_id: int):
+        super().__init__(timeout=120.0)
+        self.author_id = author_id
+        self.confirmed: typing.Optional[bool] = None
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Only the person who ran the command can confirm this.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="Ban All", style=discord.ButtonStyle.danger)
+    async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.confirmed = True
+        await interaction.response.edit_message(content="Banning...", embed=None, view=None)
+        self.stop()
+
+    @discord.ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.confirmed = False
+        await interaction.response.edit_message(content="Mass ban cancelled.", embed=None, view=None)
+        self.stop()
 
 class Moderation(commands.Cog):
     """
@@ -13,6 +713,105 @@ class Moderation(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.purges: dict[int, PurgeJob] = {} # {channel_id: running purge}
+        self.infractions = InfractionStore(MODERATION_DB)
+        self.escalation = EscalationEngine()
+        self._escalation_tasks: set[asyncio.Task] = set()
+        self.scheduler = ActionScheduler(bot, self.infractions, self._run_scheduled_action)
+
+    async def cog_load(self):
+        self.infractions.start()
+        await self.scheduler.start()
+        rules_by_guild: dict[int, list[EscalationRule]] = {}
+        for rule in await self.infractions.load_rules():
+            rules_by_guild.setdefault(rule.guild_id, []).append(rule)
+        for guild_id, rules in rules_by_guild.items():
+            self.escalation.set_rules(guild_id, rules)
+        max_window = self.escalation.max_window()
+        if max_window > 0:
+            for guild_id, user_id, action, created_at in await self.infractions.recent(time.time() - max_window):
+                self.escalation.observe(guild_id, user_id, action, created_at)
+
+    async def _set_escalation_rules(self, guild_id: int, rules: list[EscalationRule]):
+        """Swaps in a guild's rules and rebuilds its windows from the infractions inside the longest rule window."""
+        window = max((rule.window for rule in rules), default=0.0)
+        rows = await self.infractions.recent(time.time() - window, guild_id) if window else []
+        self.escalation.set_rules(guild_id, rules)
+        for _, user_id, action, created_at in rows:
+            self.escalation.observe(guild_id, user_id, action, created_at)
+
+    async def cog_unload(self):
+        for job in self.purges.values():
+            job.cancel()
+        self.scheduler.stop()
+        await self.infractions.close()
+
+    def _record(self, guild: discord.Guild, user_id: int, moderator: typing.Optional[discord.abc.User], action: str,
+                reason: typing.Optional[str] = None, duration: typing.Optional[datetime.timedelta] = None):
+        self.infractions.record(guild.id, user_id, moderator.id if moderator else None, action, reason, duration)
+        rule = self.escalation.observe(guild.id, user_id, action, time.time())
+        if rule is not None:
+            task = asyncio.create_task(self._apply_escalation(guild, user_id, rule))
+            self._escalation_tasks.add(task)
+            task.add_done_callback(self._escalation_tasks.discard)
+
+    async def _run_scheduled_action(self, action: ScheduledAction):
+        """Carries out a due scheduled action. Targets that are already gone are skipped quietly."""
+        guild = self.bot.get_guild(action.guild_id)
+        if guild is None:
+            return # The bot is no longer in the guild
+        reason = f"Scheduled: {action.reason}" if action.reason else "Scheduled action"
+        try:
+            if action.action == "unban":
+                await guild.unban(discord.Object(id=action.user_id), reason=reason)
+                self._record(guild, action.user_id, None, "unban", reason)
+                return
+            member = guild.get_member(action.user_id) or await guild.fetch_member(action.user_id)
+            if action.action == "timeout":
+                # Discord caps a timeout at 28 days, so long mutes are applied in chunks.
+                remaining = action.until - time.time()
+                if remaining <= 0:
+                    return
+                # Renewals run while the previous chunk still has TIMEOUT_RENEW_MARGIN left. If it is already
+                # gone by then, someone lifted it by hand, so end the chain instead of muting again.
+                # (Retries and renewals that ran late because the bot was offline can't tell, and still apply.)
+                on_time = action.attempts == 0 and time.time() < action.run_at + TIMEOUT_RENEW_MARGIN
+                if on_time and not member.is_timed_out():
+                    return
+                chunk = min(datetime.timedelta(seconds=remaining), MAX_TIMEOUT)
+                await member.timeout(chunk, reason=reason)
+                if remaining > MAX_TIMEOUT.total_seconds():
+                    await self.scheduler.schedule(guild.id, member.id, "timeout", time.time() + chunk.total_seconds() - TIMEOUT_RENEW_MARGIN,
+                                                  until=action.until, reason=action.reason)
+            elif action.action == "remove_role":
+                role = guild.get_role(action.role_id)
+                if role is not None:
+                    await member.remove_roles(role, reason=reason)
+        except (discord.NotFound, discord.Forbidden) as e:
+            print(f"Skipping scheduled {action.action} for {action.user_id} in guild {guild.id}: {e}")
+
+    async def _apply_escalation(self, guild: discord.Guild, user_id: int, rule: EscalationRule):
+        reason = f"Automatic escalation: {rule.describe()}"
+        try:
+            if rule.action == "ban":
+                # Bans work by ID, so rules triggered by a kick or temp ban still apply after the member has left.
+                duration = None
+                await guild.ban(discord.Object(id=user_id), reason=reason, delete_message_days=0)
+                await self.scheduler.cancel(guild.id, user_id, "unban") # A temp ban that escalated is now permanent
+            else:
+                member = guild.get_member(user_id) or await guild.fetch_member(user_id)
+                if rule.action == "timeout":
+                    duration = datetime.timedelta(seconds=rule.duration)
+                    await member.timeout(duration, reason=reason)
+                else:
+                    duration = None
+                    await member.kick(reason=reason)
+        except discord.NotFound:
+            return # The member already left
+        except discord.HTTPException as e:
+            print(f"Escalation rule {rule.rule_id} failed for {user_id} in guild {guild.id}: {e}")
+            return
+        self._record(guild, user_id, None, ESCALATION_RECORDED_AS[rule.action], reason, duration)
 
     def _create_embed(self, title: str, description: str, color: discord.Color, member: discord.Member = None, moderator: discord.Member = None, reason: str = None, duration: datetime.timedelta = None, fields: typing.Optional[list[tuple[str,str,bool]]] = None):
         embed = discord.Embed(title=title, description=description, color=color, timestamp=discord.utils.utcnow())
@@ -53,6 +852,7 @@ class Moderation(commands.Cog):
 
         try:
             await member.kick(reason=f"Kicked by {interaction.user.name} | Reason: {reason}")
+            self._record(interaction.guild, member.id, interaction.user, "kick", reason)
             embed = self._create_embed(
                 title="<:hammer:123456789012345678> Member Kicked", # Replace with valid emoji
                 description=f"{member.mention} has been kicked from the server.",
@@ -112,6 +912,8 @@ class Moderation(commands.Cog):
 
         try:
             await member.ban(reason=f"Banned by {interaction.user.name} | Reason: {reason}", delete_message_days=delete_message_days)
+            await self.scheduler.cancel(interaction.guild.id, member.id, "unban") # Supersedes any pending temp-ban expiry
+            self._record(interaction.guild, member.id, interaction.user, "ban", reason)
             embed = self._create_embed(
                 title="<:no_entry_sign:123456789012345678> Member Banned", # Replace with valid emoji
                 description=f"{member.mention} has been banned from the server.",
@@ -138,6 +940,123 @@ class Moderation(commands.Cog):
         except discord.HTTPException as e:
             await interaction.response.send_message(f"An error occurred while trying to ban the member: {e}", ephemeral=True)
 
+    @mod_commands_group.command(name="tempban", description="Bans a member for a limited time.")
+    @app_commands.describe(
+        member="The member to ban.",
+        duration_str="How long the ban lasts (e.g., 12h, 7d). Max 365 days.",
+        reason="The reason for banning the member."
+    )
+    @app_commands.rename(duration_str='duration')
+    @app_commands.checks.has_permissions(ban_members=True)
+    @app_commands.guild_only()
+    async def tempban_member(self, interaction: discord.Interaction, member: discord.Member, duration_str: str, reason: str = "No reason provided."):
+        if member == interaction.user:
+            await interaction.response.send_message("You cannot ban yourself.", ephemeral=True)
+            return
+        if member == interaction.guild.owner:
+            await interaction.response.send_message("You cannot ban the server owner.", ephemeral=True)
+            return
+        if member.top_role >= interaction.user.top_role and interaction.guild.owner != interaction.user:
+            await interaction.response.send_message("You cannot ban a member with a higher or equal role.", ephemeral=True)
+            return
+        try:
+            delta = parse_duration(duration_str)
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        if not datetime.timedelta(seconds=0) < delta <= MAX_TEMP_DURATION:
+            await interaction.response.send_message(f"Duration must be positive and at most {MAX_TEMP_DURATION.days} days.", ephemeral=True)
+            return
+
+        banned_until = discord.utils.utcnow() + delta
+        until_field = ("Banned Until", f"<t:{int(banned_until.timestamp())}:F> (<t:{int(banned_until.timestamp())}:R>)", False)
+        try:
+            # DM first: once banned, the member shares no server with the bot and can't be messaged.
+            dm_embed = self._create_embed(
+                title="You Have Been Temporarily Banned",
+                description=f"You have been banned from **{interaction.guild.name}**.",
+                color=discord.Color.red(),
+                reason=reason,
+                moderator=interaction.user,
+                duration=delta,
+                fields=[until_field]
+            )
+            await member.send(embed=dm_embed)
+        except discord.HTTPException:
+            print(f"Could not DM {member.name} before temp-banning.")
+        try:
+            await member.ban(reason=f"Temp-banned by {interaction.user.name} for {delta} | Reason: {reason}", delete_message_days=0)
+        except discord.Forbidden:
+            await interaction.response.send_message("I do not have permission to ban this member.", ephemeral=True)
+            return
+        except discord.HTTPException as e:
+            await interaction.response.send_message(f"An error occurred while trying to ban the member: {e}", ephemeral=True)
+            return
+        self._record(interaction.guild, member.id, interaction.user, "ban", reason, delta)
+        await self.scheduler.schedule(interaction.guild.id, member.id, "unban", banned_until.timestamp(), reason=f"Temp-ban ended ({reason})")
+        embed = self._create_embed(
+            title="<:no_entry_sign:123456789012345678> Member Temporarily Banned", # Replace with valid emoji
+            description=f"{member.mention} has been banned from the server.",
+            color=discord.Color.red(),
+            member=member,
+            moderator=interaction.user,
+            reason=reason,
+            duration=delta,
+            fields=[until_field]
+        )
+        await interaction.response.send_message(embed=embed)
+
+    @mod_commands_group.command(name="temprole", description="Gives a member a role for a limited time.")
+    @app_commands.describe(
+        member="The member to give the role to.",
+        role="The role to give.",
+        duration_str="How long the member keeps the role (e.g., 1h, 30d). Max 365 days.",
+        reason="The reason for giving the role."
+    )
+    @app_commands.rename(duration_str='duration')
+    @app_commands.checks.has_permissions(manage_roles=True)
+    @app_commands.guild_only()
+    async def temprole_member(self, interaction: discord.Interaction, member: discord.Member, role: discord.Role, duration_str: str, reason: str = "No reason provided."):
+        if role >= interaction.guild.me.top_role:
+            await interaction.response.send_message("That role is higher than or equal to my highest role.", ephemeral=True)
+            return
+        if role >= interaction.user.top_role and interaction.guild.owner != interaction.user:
+            await interaction.response.send_message("You cannot assign a role higher than or equal to your own.", ephemeral=True)
+            return
+        try:
+            delta = parse_duration(duration_str)
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        if not datetime.timedelta(seconds=0) < delta <= MAX_TEMP_DURATION:
+            await interaction.response.send_message(f"Duration must be positive and at most {MAX_TEMP_DURATION.days} days.", ephemeral=True)
+            return
+
+        try:
+            await member.add_roles(role, reason=f"Temp role by {interaction.user.name} for {delta} | Reason: {reason}")
+        except discord.Forbidden:
+            await interaction.response.send_message("I do not have permission to give this role.", ephemeral=True)
+            return
+        except discord.HTTPException as e:
+            await interaction.response.send_message(f"An error occurred while giving the role: {e}", ephemeral=True)
+            return
+        # A new temp role replaces any earlier removal scheduled for the same role.
+        await self.scheduler.cancel(interaction.guild.id, member.id, "remove_role", role.id)
+        expires_at = discord.utils.utcnow() + delta
+        await self.scheduler.schedule(interaction.guild.id, member.id, "remove_role", expires_at.timestamp(), role_id=role.id,
+                                      reason=f"Temp role ended ({reason})")
+        embed = self._create_embed(
+            title="Temporary Role Added",
+            description=f"{member.mention} has been given {role.mention}.",
+            color=role.color,
+            member=member,
+            moderator=interaction.user,
+            reason=reason,
+            duration=delta,
+            fields=[("Expires", f"<t:{int(expires_at.timestamp())}:F> (<t:{int(expires_at.timestamp())}:R>)", False)]
+        )
+        await interaction.response.send_message(embed=embed)
+
     @mod_commands_group.command(name="unban", description="Unbans a user from the server.")
     @app_commands.describe(
         user_id="The ID of the user to unban.",
@@ -163,6 +1082,8 @@ class Moderation(commands.Cog):
 
         try:
             await interaction.guild.unban(user, reason=f"Unbanned by {interaction.user.name} | Reason: {reason}")
+            await self.scheduler.cancel(interaction.guild.id, user.id, "unban")
+            self._record(interaction.guild, user.id, interaction.user, "unban", reason)
             embed = self._create_embed(
                 title="<:unlock:123456789012345678> User Unbanned", # Replace with valid emoji
                 description=f"{user.mention} ({user.id}) has been unbanned from the server.",
@@ -181,10 +1102,153 @@ class Moderation(commands.Cog):
             else:
                 await interaction.response.send_message(f"An error occurred while trying to unban the user: {e}", ephemeral=True)
 
+    def _massban_targets(self, interaction: discord.Interaction, user_ids: typing.Optional[str], joined_within: typing.Optional[datetime.timedelta],
+                         account_age: typing.Optional[datetime.timedelta], name_pattern: typing.Optional[re.Pattern]) -> list[discord.abc.Snowflake]:
+        """Explicit IDs plus cached members matching every given filter, minus anyone the invoker or bot can't ban."""
+        guild = interaction.guild
+        now = discord.utils.utcnow()
+        targets: dict[int, discord.abc.Snowflake] = {}
+        for raw_id in USER_ID_RE.findall(user_ids or ""):
+            user_id = int(raw_id)
+            targets[user_id] = guild.get_member(user_id) or discord.Object(id=user_id)
+        if joined_within or account_age or name_pattern:
+            for member in guild.members:
+                if joined_within and (member.joined_at is None or now - member.joined_at > joined_within):
+                    continue
+                if account_age and now - member.created_at > account_age:
+                    continue
+                if name_pattern and not (name_pattern.match(member.name) or name_pattern.match(member.display_name)):
+                    continue
+                targets[member.id] = member
+
+        exempt = {interaction.user.id, guild.owner_id, self.bot.user.id}
+        invoker_is_owner = guild.owner_id == interaction.user.id
+        allowed = []
+        for target in targets.values():
+            if target.id in exempt:
+                continue
+            if isinstance(target, discord.Member):
+                if target.top_role >= guild.me.top_role:
+                    continue
+                if not invoker_is_owner and target.top_role >= interaction.user.top_role:
+                    continue
+            allowed.append(target)
+        return allowed
+
+    async def _ban_many(self, guild: discord.Guild, targets: list[discord.abc.Snowflake], reason: str,
+                        delete_message_days: int) -> tuple[list[int], list[tuple[int, str]]]:
+        """Bans targets through a small pool of workers sharing one queue. Returns (banned IDs, [(ID, error)])."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for target in targets:
+            queue.put_nowait(target)
+        banned: list[int] = []
+        failed: list[tuple[int, str]] = []
+
+        async def worker():
+            while not queue.empty():
+                target = queue.get_nowait()
+                try:
+                    await guild.ban(target, reason=reason, delete_message_days=delete_message_days)
+                    banned.append(target.id)
+                except discord.NotFound:
+                    failed.append((target.id, "unknown user"))
+                except discord.Forbidden:
+                    failed.append((target.id, "missing permissions"))
+                except discord.HTTPException as e:
+                    failed.append((target.id, str(e)))
+
+        await asyncio.gather(*(worker() for _ in range(min(MASSBAN_CONCURRENCY, len(targets)))))
+        return banned, failed
+
+    @mod_commands_group.command(name="massban", description="Bans many users at once, by ID list or by filters.")
+    @app_commands.describe(
+        user_ids="User IDs or mentions, separated by spaces or commas.",
+        joined_within="Members who joined within this long (e.g. 30m, 2h).",
+        account_age="Members whose account is younger than this (e.g. 1d, 7d).",
+        name_pattern="Members whose username or nickname matches this pattern (* and ? wildcards; plain text matches anywhere).",
+        reason="The reason for the bans.",
+        delete_message_days="Number of days of messages to delete (0-7). Default is 0."
+    )
+    @app_commands.choices(delete_message_days=[
+        app_commands.Choice(name="Don't delete any", value=0),
+        app_commands.Choice(name="1 Day", value=1),
+        app_commands.Choice(name="3 Days", value=3),
+        app_commands.Choice(name="7 Days", value=7)
+    ])
+    @app_commands.checks.has_permissions(ban_members=True)
+    @app_commands.guild_only()
+    async def mass_ban(self, interaction: discord.Interaction, user_ids: typing.Optional[str] = None,
+                       joined_within: typing.Optional[str] = None, account_age: typing.Optional[str] = None,
+                       name_pattern: typing.Optional[str] = None, reason: str = "Mass ban", delete_message_days: int = 0):
+        if not (user_ids or joined_within or account_age or name_pattern):
+            await interaction.response.send_message("Provide user IDs or at least one filter.", ephemeral=True)
+            return
+        try:
+            joined_delta = parse_duration(joined_within) if joined_within else None
+            age_delta = parse_duration(account_age) if account_age else None
+            pattern = parse_name_pattern(name_pattern) if name_pattern else None
+        except ValueError as e:
+            await interaction.response.send_message(f"Invalid filter: {e}", ephemeral=True)
+            return
+
+        targets = self._massban_targets(interaction, user_ids, joined_delta, age_delta, pattern)
+        if not targets:
+            await interaction.response.send_message("No bannable users matched.", ephemeral=True)
+            return
+        if len(targets) > MASSBAN_MAX_TARGETS:
+            await interaction.response.send_message(
+                f"{len(targets)} users matched; narrow the filters to at most {MASSBAN_MAX_TARGETS}.", ephemeral=True)
+            return
+
+        preview_lines = []
+        for target in targets[:MASSBAN_PREVIEW_COUNT]:
+            if isinstance(target, discord.Member):
+                preview_lines.append(f"{target.mention} `{target.id}` created {discord.utils.format_dt(target.created_at, style='R')}")
+            else:
+                preview_lines.append(f"`{target.id}` (not in server)")
+        if len(targets) > MASSBAN_PREVIEW_COUNT:
+            preview_lines.append(f"...and {len(targets) - MASSBAN_PREVIEW_COUNT} more.")
+        preview = self._create_embed(
+            title="Mass Ban Preview",
+            description="\n".join(preview_lines),
+            color=discord.Color.red(),
+            reason=reason,
+            fields=[("Users", str(len(targets)), True), ("Messages Deleted", f"{delete_message_days} day(s) worth", True)]
+        )
+        view = MassBanConfirmView(interaction.user.id)
+        await interaction.response.send_message(embed=preview, view=view, ephemeral=True)
+        if await view.wait() or not view.confirmed:
+            if view.confirmed is None:
+                await interaction.edit_original_response(content="Mass ban timed out.", embed=None, view=None)
+            return
+
+        started = discord.utils.utcnow()
+        banned, failed = await self._ban_many(
+            interaction.guild, targets, f"Mass ban by {interaction.user.name} | Reason: {reason}", delete_message_days)
+        await self.scheduler.cancel_many(interaction.guild.id, set(banned), "unban")
+        for user_id in banned:
+            self._record(interaction.guild, user_id, interaction.user, "ban", reason)
+        fields = [("Banned", f"{len(banned)} / {len(targets)}", True),
+                  ("Time Taken", f"{(discord.utils.utcnow() - started).total_seconds():.1f}s", True)]
+        if failed:
+            failed_lines = [f"`{user_id}`: {error}" for user_id, error in failed[:10]]
+            if len(failed) > 10:
+                failed_lines.append(f"...and {len(failed) - 10} more.")
+            fields.append(("Failed", "\n".join(failed_lines)[:1024], False))
+        summary = self._create_embed(
+            title="<:no_entry_sign:123456789012345678> Mass Ban Complete", # Replace with valid emoji
+            description=f"{len(banned)} user(s) have been banned from the server.",
+            color=discord.Color.red(),
+            moderator=interaction.user,
+            reason=reason,
+            fields=fields
+        )
+        await interaction.followup.send(embed=summary)
+
     @mod_commands_group.command(name="mute", description="Mutes (times out) a member for a specified duration.")
     @app_commands.describe(
         member="The member to mute.",
-        duration_str="Duration (e.g., 10m, 1h, 1d). Max 28 days. s=seconds, m=minutes, h=hours, d=days.",
+        duration_str="Duration (e.g., 10m, 1h, 1d). Max 365 days. s=seconds, m=minutes, h=hours, d=days.",
         reason="The reason for muting the member."
     )
     @app_commands.checks.has_permissions(moderate_members=True)
@@ -206,37 +1270,30 @@ class Moderation(commands.Cog):
             await interaction.response.send_message(f"{member.mention} is already timed out.", ephemeral=True)
             return
 
-        delta = None
-        unit = duration_str[-1].lower()
         try:
-            time_value = int(duration_str[:-1])
-            if unit == 's':
-                delta = datetime.timedelta(seconds=time_value)
-            elif unit == 'm':
-                delta = datetime.timedelta(minutes=time_value)
-            elif unit == 'h':
-                delta = datetime.timedelta(hours=time_value)
-            elif unit == 'd':
-                delta = datetime.timedelta(days=time_value)
-            else:
-                await interaction.response.send_message("Invalid duration unit. Use 's', 'm', 'h', or 'd'.", ephemeral=True)
-                return
-        except ValueError:
-            await interaction.response.send_message("Invalid duration format. Example: `10m`, `1h`, `2d`.", ephemeral=True)
+            delta = parse_duration(duration_str)
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
             return
 
-        if delta is None or delta <= datetime.timedelta(seconds=0):
+        if delta <= datetime.timedelta(seconds=0):
             await interaction.response.send_message("Duration must be positive.", ephemeral=True)
             return
 
-        max_duration = datetime.timedelta(days=28)
-        if delta > max_duration:
-            await interaction.response.send_message(f"Duration cannot exceed 28 days. You provided: {delta}", ephemeral=True)
+        if delta > MAX_MUTE:
+            await interaction.response.send_message(f"Duration cannot exceed {MAX_MUTE.days} days. You provided: {delta}", ephemeral=True)
             return
 
         try:
-            await member.timeout(delta, reason=f"Muted by {interaction.user.name} | Reason: {reason}")
+            await member.timeout(min(delta, MAX_TIMEOUT), reason=f"Muted by {interaction.user.name} | Reason: {reason}")
+            self._record(interaction.guild, member.id, interaction.user, "mute", reason, delta)
             timeout_until = discord.utils.utcnow() + delta
+            if delta > MAX_TIMEOUT:
+                await self.scheduler.schedule(
+                    interaction.guild.id, member.id, "timeout",
+                    time.time() + MAX_TIMEOUT.total_seconds() - TIMEOUT_RENEW_MARGIN,
+                    until=timeout_until.timestamp(), reason=reason
+                )
             embed = self._create_embed(
                 title="<:mute:123456789012345678> Member Muted (Timed Out)", # Replace with valid emoji
                 description=f"{member.mention} has been muted.",
@@ -280,6 +1337,8 @@ class Moderation(commands.Cog):
 
         try:
             await member.timeout(None, reason=f"Unmuted by {interaction.user.name} | Reason: {reason}")
+            await self.scheduler.cancel(interaction.guild.id, member.id, "timeout")
+            self._record(interaction.guild, member.id, interaction.user, "unmute", reason)
             embed = self._create_embed(
                 title="<:speaker:123456789012345678> Member Unmuted", # Replace with valid emoji
                 description=f"{member.mention} has been unmuted.",
@@ -305,33 +1364,103 @@ class Moderation(commands.Cog):
         except discord.HTTPException as e:
             await interaction.response.send_message(f"An error occurred while trying to unmute the member: {e}", ephemeral=True)
 
-    @mod_commands_group.command(name="clear", description="Deletes a specified number of messages from a channel.")
+    @mod_commands_group.command(name="clear", description="Deletes messages from a channel, optionally filtered.")
     @app_commands.rename(amount_to_delete='amount') # Rename for clarity in slash command
     @app_commands.describe(
-        amount_to_delete="The number of messages to delete (1-100).",
-        member="Optional: Filter messages by this member."
+        amount_to_delete=f"The number of matching messages to delete (1-{PURGE_MAX_AMOUNT}).",
+        member="Optional: Filter messages by this member.",
+        contains="Optional: Only messages containing this text.",
+        links="Optional: Only messages with links.",
+        attachments="Optional: Only messages with attachments.",
+        bots="Optional: Only messages from bots.",
+        before="Optional: Only messages before this message ID/link or time ago (e.g. 2h).",
+        after="Optional: Only messages after this message ID/link or time ago (e.g. 30m)."
     )
     @app_commands.checks.has_permissions(manage_messages=True)
     @app_commands.guild_only()
-    async def clear_messages(self, interaction: discord.Interaction, amount_to_delete: app_commands.Range[int, 1, 100], member: typing.Optional[discord.Member] = None):
+    async def clear_messages(self, interaction: discord.Interaction, amount_to_delete: app_commands.Range[int, 1, PURGE_MAX_AMOUNT],
+                             member: typing.Optional[discord.Member] = None, contains: typing.Optional[str] = None,
+                             links: bool = False, attachments: bool = False, bots: bool = False,
+                             before: typing.Optional[str] = None, after: typing.Optional[str] = None):
+        channel = interaction.channel
+        if channel.id in self.purges:
+            await interaction.response.send_message("A purge is already running in this channel.", ephemeral=True)
+            return
+        try:
+            before_point = parse_history_point(before) if before else None
+            after_point = parse_history_point(after) if after else None
+        except ValueError as e:
+            await interaction.response.send_message(f"Couldn't read `before`/`after`: {e}", ephemeral=True)
+            return
         await interaction.response.defer(ephemeral=True, thinking=True) # Ephemeral defer for mod action
 
-        def check(m):
-            if member:
-                return m.author == member
+        needle = contains.casefold() if contains else None
+        def check(m: discord.Message) -> bool:
+            if member and m.author.id != member.id:
+                return False
+            if needle and needle not in m.content.casefold():
+                return False
+            if links and not LINK_RE.search(m.content):
+                return False
+            if attachments and not m.attachments:
+                return False
+            if bots and not m.author.bot:
+                return False
             return True
 
+        job = PurgeJob(channel, check, amount_to_delete, before=before_point, after=after_point,
+                       reason=f"Purge by {interaction.user.name}")
+        self.purges[channel.id] = job
+        view = PurgeCancelView(job, interaction.user.id)
+        task = asyncio.create_task(job.run())
+        progress = None
+        def token_expiring() -> bool:
+            return discord.utils.utcnow() - interaction.created_at > INTERACTION_EDIT_WINDOW
         try:
-            deleted_messages = await interaction.channel.purge(limit=amount_to_delete, check=check)
-            response_message = f"Successfully deleted {len(deleted_messages)} message(s)."
+            progress = await interaction.followup.send(job.describe(), view=view, ephemeral=True, wait=True)
+            # Report progress until the run ends or the interaction token is about to expire. A failed
+            # edit only stops the updates; the purge itself keeps going.
+            while not task.done():
+                await asyncio.wait({task}, timeout=PURGE_PROGRESS_INTERVAL)
+                if task.done() or job.cancelled:
+                    continue
+                content = job.describe()
+                if token_expiring():
+                    content += " The result will be posted in this channel."
+                try:
+                    await progress.edit(content=content, view=view)
+                except discord.HTTPException:
+                    progress = None
+                if progress is None or token_expiring():
+                    break
+            await task
+            result = job.describe(done=True)
             if member:
-                response_message += f" from {member.mention}."
-            await interaction.followup.send(response_message, ephemeral=True)
+                result += f" Filtered to {member.mention}."
         except discord.Forbidden:
-            await interaction.followup.send("I do not have permission to delete messages in this channel.", ephemeral=True)
+            result = "I do not have permission to delete messages in this channel."
         except discord.HTTPException as e:
-            await interaction.followup.send(f"An error occurred while deleting messages: {e}", ephemeral=True)
-
+            result = f"An error occurred while deleting messages: {e}"
+        finally:
+            if not task.done():
+                job.cancel()
+            self.purges.pop(channel.id, None)
+            view.stop()
+        if not token_expiring():
+            try:
+                if progress is not None:
+                    await progress.edit(content=result, view=None)
+                else:
+                    await interaction.followup.send(result, ephemeral=True)
+                return
+            except discord.HTTPException:
+                pass
+        # The followup can no longer be edited, so report in the channel instead.
+        try:
+            await channel.send(f"{interaction.user.mention} {result}",
+                               allowed_mentions=discord.AllowedMentions(users=[interaction.user]))
+        except discord.HTTPException:
+            print(f"Purge in {channel.id} ended after the interaction expired: {result}")
 
     @mod_commands_group.command(name="warn", description="Warns a member.")
     @app_commands.describe(
@@ -367,6 +1496,7 @@ class Moderation(commands.Cog):
             fields=[("Server", interaction.guild.name, False)]
         )
 
+        self._record(interaction.guild, member.id, interaction.user, "warn", reason)
         try:
             await member.send(embed=warning_embed_dm)
             dm_sent = True
@@ -379,6 +1509,86 @@ class Moderation(commands.Cog):
             await interaction.followup.send(f"(Could not send a DM to {member.mention})", ephemeral=True)
 
 
+    @mod_commands_group.command(name="history", description="Shows a member's recorded infractions.")
+    @app_commands.describe(member="The member (or user) whose history to show.")
+    @app_commands.checks.has_permissions(moderate_members=True)
+    @app_commands.guild_only()
+    async def infraction_history(self, interaction: discord.Interaction, member: discord.User):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        total = await self.infractions.count(interaction.guild.id, member.id)
+        view = InfractionHistoryView(self, interaction.guild, member, interaction.user.id, total)
+        await view.load()
+        if total <= HISTORY_PAGE_SIZE:
+            await interaction.followup.send(embed=view.render(), ephemeral=True)
+        else:
+            await interaction.followup.send(embed=view.render(), view=view, ephemeral=True)
+
+    escalation_group = app_commands.Group(name="escalation", description="Automatic punishments for repeat infractions.", parent=mod_commands_group)
+
+    @escalation_group.command(name="add", description="Adds a rule, e.g. 3 warns within 24h → 1h timeout.")
+    @app_commands.describe(
+        trigger="The infraction type to count.",
+        threshold="How many of them trigger the rule.",
+        window="Counted within this long (e.g. 24h, 7d).",
+        action="What happens when the threshold is reached.",
+        duration="Timeout length, for the timeout action (e.g. 1h, max 28d)."
+    )
+    @app_commands.choices(
+        trigger=[app_commands.Choice(name=name.title(), value=name) for name in ESCALATION_TRIGGERS],
+        action=[app_commands.Choice(name=name.title(), value=name) for name in ESCALATION_ACTIONS]
+    )
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @app_commands.guild_only()
+    async def escalation_add(self, interaction: discord.Interaction, trigger: str, threshold: app_commands.Range[int, 1, 50],
+                             window: str, action: str, duration: typing.Optional[str] = None):
+        if len(self.escalation.rules.get(interaction.guild.id, [])) >= MAX_ESCALATION_RULES:
+            await interaction.response.send_message(f"This server already has {MAX_ESCALATION_RULES} escalation rules.", ephemeral=True)
+            return
+        try:
+            window_delta = parse_duration(window)
+            duration_delta = parse_duration(duration) if duration else None
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        if window_delta <= datetime.timedelta(seconds=0):
+            await interaction.response.send_message("The window must be positive.", ephemeral=True)
+            return
+        if action == "timeout":
+            if duration_delta is None or not datetime.timedelta(seconds=0) < duration_delta <= MAX_TIMEOUT:
+                await interaction.response.send_message("Timeout rules need a duration between 1s and 28d.", ephemeral=True)
+                return
+        else:
+            duration_delta = None
+
+        rule = await self.infractions.add_rule(interaction.guild.id, trigger, threshold, window_delta.total_seconds(), action,
+                                               duration_delta.total_seconds() if duration_delta else None)
+        await self._set_escalation_rules(interaction.guild.id, self.escalation.rules.get(interaction.guild.id, []) + [rule])
+        await interaction.response.send_message(f"Added escalation rule `#{rule.rule_id}`: {rule.describe()}.", ephemeral=True)
+
+    @escalation_group.command(name="list", description="Lists this server's escalation rules.")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @app_commands.guild_only()
+    async def escalation_list(self, interaction: discord.Interaction):
+        rules = self.escalation.rules.get(interaction.guild.id, [])
+        embed = self._create_embed(
+            title="Escalation Rules",
+            description="\n".join(f"`#{rule.rule_id}` {rule.describe()}" for rule in rules) or "No escalation rules are set.",
+            color=0xd37bff
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @escalation_group.command(name="remove", description="Removes an escalation rule.")
+    @app_commands.describe(rule_id="The rule number shown by /mod escalation list.")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    @app_commands.guild_only()
+    async def escalation_remove(self, interaction: discord.Interaction, rule_id: int):
+        if not await self.infractions.remove_rule(interaction.guild.id, rule_id):
+            await interaction.response.send_message(f"There is no escalation rule `#{rule_id}` in this server.", ephemeral=True)
+            return
+        rules = [rule for rule in self.escalation.rules.get(interaction.guild.id, []) if rule.rule_id != rule_id]
+        await self._set_escalation_rules(interaction.guild.id, rules)
+        await interaction.response.send_message(f"Removed escalation rule `#{rule_id}`.", ephemeral=True)
+
     @mod_commands_group.command(name="slowmode", description="Sets the slowmode for the current channel.")
     @app_commands.describe(
         seconds="The slowmode delay in seconds (0 to disable, max 21600)."
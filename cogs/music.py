@@ -2,38 +2,473 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import pomice
+import asyncio
+import json
+import os
+import random
+import time
+from collections import OrderedDict, deque
 from urllib.parse import urlparse, parse_qs
 
+MAX_QUEUE_LENGTH = 1000 # Per guild, so hundreds of guild queues stay bounded
+PLAYLIST_BATCH_SIZE = 50 # Tracks enqueued per event-loop turn when loading a playlist
+PLAYLIST_PROGRESS_INTERVAL = 2.0 # Minimum seconds between progress embed edits
+IDLE_TIMEOUT = float(os.environ.get("MUSIC_IDLE_TIMEOUT", 300)) # Seconds with nothing playing before leaving
+EMPTY_CHANNEL_TIMEOUT = float(os.environ.get("MUSIC_EMPTY_CHANNEL_TIMEOUT", 60)) # Seconds alone in a channel before leaving
+REAPER_TICK = 5.0
+READY_TIMEOUT = float(os.environ.get("MUSIC_READY_TIMEOUT", 10)) # Seconds a command waits for Lavalink during startup
+TRACK_CACHE_MAX_ENTRIES = int(os.environ.get("MUSIC_TRACK_CACHE_MAX_ENTRIES", 2000))
+TRACK_CACHE_TTL = float(os.environ.get("MUSIC_TRACK_CACHE_TTL", 6 * 3600))
+TRACK_CACHE_NEGATIVE_TTL = float(os.environ.get("MUSIC_TRACK_CACHE_NEGATIVE_TTL", 300))
+TRACK_CACHE_FILE = os.environ.get("MUSIC_TRACK_CACHE_FILE", "data/track_cache.json") # Empty to disable persistence
+
 def get_youtube_video_id(url):
     parsed_url = urlparse(url)
     return parse_qs(parsed_url.query).get('v', [None])[0]
 
+def format_duration(milliseconds: float) -> str:
+    seconds = int(milliseconds // 1000)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes}:{seconds:02}"
+
+class QueuedTrack:
+    """
+    A queue entry. Only the fields needed for display and re-resolving are kept;
+    the Lavalink track object is attached just before the entry is due to play.
+    """
+    __slots__ = ("title", "uri", "length", "requester_id", "track")
+
+    def __init__(self, title: str, uri: str, length: float, requester_id: int, track: pomice.Track | None = None):
+        self.title = title
+        self.uri = uri
+        self.length = length
+        self.requester_id = requester_id
+        self.track = track
+
+    @classmethod
+    def from_track(cls, track: pomice.Track, requester_id: int, keep_track: bool = False) -> "QueuedTrack":
+        return cls(track.title, track.uri, track.length, requester_id, track if keep_track else None)
+
+class TrackCache:
+    """
+    LRU cache of search string/URL -> resolved Lavalink track, with a TTL, negative
+    entries for searches that found nothing, and optional JSON persistence. Entries
+    hold the encoded track and its info dict, which is all pomice needs to rebuild a
+    playable Track without asking Lavalink again.
+    """
+    def __init__(self, max_entries: int, ttl: float, negative_ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: OrderedDict[str, tuple[float, dict | None]] = OrderedDict() # {key: (expires_at, track data or None)}
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.miss_latency = 0.0 # Smoothed seconds per Lavalink lookup
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(query: str) -> str:
+        query = query.strip()
+        return query if urlparse(query).scheme in ("http", "https") else query.casefold()
+
+    @staticmethod
+    def _serialize(track: pomice.Track) -> dict:
+        return {"track_id": track.track_id, "info": track.info, "track_type": track.track_type.value}
+
+    @staticmethod
+    def _rebuild(data: dict) -> pomice.Track | None:
+        try:
+            return pomice.Track(track_id=data["track_id"], info=data["info"], track_type=pomice.TrackType(data["track_type"]))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"[TrackCache] Could not rebuild cached track: {e}")
+            return None
+
+    def get(self, key: str) -> tuple[bool, pomice.Track | None]:
+        """Returns (found, track). A found entry with no track is a cached "no results"."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.saved_seconds += self.miss_latency
+        if entry[1] is None:
+            self.negative_hits += 1
+            return True, None
+        track = self._rebuild(entry[1])
+        if track is None:
+            del self._entries[key]
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, track
+
+    def put(self, key: str, track: pomice.Track | None, latency: float):
+        self.miss_latency = latency if self.miss_latency == 0 else 0.8 * self.miss_latency + 0.2 * latency
+        if track is None:
+            self._entries[key] = (time.time() + self.negative_ttl, None)
+        else:
+            self._entries[key] = (time.time() + self.ttl, self._serialize(track))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def load(self, path: str):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[TrackCache] Could not load {path}: {e}")
+            return
+        now = time.time()
+        for key, expires_at, data in saved[-self.max_entries:]:
+            if expires_at > now:
+                self._entries[key] = (expires_at, data)
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        now = time.time()
+        rows = [[key, expires_at, data] for key, (expires_at, data) in self._entries.items() if expires_at > now]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class TimerWheel:
+    """
+    Hashed timer wheel: one bucket per tick, each key stored with its own deadline.
+    Rescheduling just records the new deadline and bucket; stale bucket entries are
+    dropped when their bucket comes round, so scheduling is O(1) for any number of keys.
+    """
+    def __init__(self, tick: float, slots: int = 128):
+        self.tick = tick
+        self.buckets: list[set[int]] = [set() for _ in range(slots)]
+        self.deadlines: dict[int, float] = {} # {key: deadline}
+        self._last_tick = int(time.monotonic() // tick)
+
+    def _slot(self, deadline: float) -> int:
+        return int(deadline // self.tick) % len(self.buckets)
+
+    def schedule(self, key: int, deadline: float):
+        self.deadlines[key] = deadline
+        self.buckets[self._slot(deadline)].add(key)
+
+    def cancel(self, key: int):
+        self.deadlines.pop(key, None)
+
+    def pop_due(self, now: float) -> list[int]:
+        """
+        Returns the keys whose deadline fell in a tick that has fully elapsed, removing
+        them from the wheel. Timers therefore fire up to one tick late, never early.
+        """
+        due = []
+        current_tick = int(now // self.tick)
+        ticks = range(self._last_tick, current_tick)
+        if len(ticks) > len(self.buckets):
+            ticks = range(current_tick - len(self.buckets), current_tick)
+        for tick in ticks:
+            bucket = self.buckets[tick % len(self.buckets)]
+            for key in list(bucket):
+                deadline = self.deadlines.get(key)
+                deadline_tick = int(deadline // self.tick) if deadline is not None else None
+                if deadline_tick is None or deadline_tick % len(self.buckets) != tick % len(self.buckets):
+                    bucket.discard(key) # Cancelled or rescheduled elsewhere
+                elif deadline_tick <= tick:
+                    bucket.discard(key)
+                    del self.deadlines[key]
+                    due.append(key)
+                # Otherwise the deadline is a later lap of the wheel; leave it.
+        self._last_tick = current_tick
+        return due
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+class GuildQueue:
+    """Upcoming tracks and playback state for one guild."""
+    __slots__ = ("entries", "current", "loop_mode", "text_channel_id", "lock", "prefetch_task", "loading_task")
+
+    def __init__(self):
+        self.entries: deque[QueuedTrack] = deque()
+        self.current: QueuedTrack | None = None
+        self.loop_mode = "off" # "off", "track" or "queue"
+        self.text_channel_id: int | None = None
+        self.lock = asyncio.Lock()
+        self.prefetch_task: asyncio.Task | None = None
+        self.loading_task: asyncio.Task | None = None
+
+    def cancel_tasks(self):
+        for task in (self.prefetch_task, self.loading_task):
+            if task and not task.done():
+                task.cancel()
+
 class MusicCog(commands.Cog):
     music_commands_group = app_commands.Group(name="music", description="Music commands for your entertainment!")
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         # DON'T do: self.pomice = bot.pomice here because bot.pomice might not be ready
+        self.queues: dict[int, GuildQueue] = {} # {guild_id: GuildQueue}
+        self.track_cache = TrackCache(TRACK_CACHE_MAX_ENTRIES, TRACK_CACHE_TTL, TRACK_CACHE_NEGATIVE_TTL)
+        self.idle_wheel = TimerWheel(REAPER_TICK)
+        self.players_reaped = 0
+        self._first_play_logged = False
+        self._reaper_task: asyncio.Task | None = None
+
+    async def cog_load(self):
+        if TRACK_CACHE_FILE:
+            await asyncio.to_thread(self.track_cache.load, TRACK_CACHE_FILE)
+        self._reaper_task = asyncio.create_task(self._run_reaper())
+
+    async def cog_unload(self):
+        if self._reaper_task:
+            self._reaper_task.cancel()
+        for queue in self.queues.values():
+            queue.cancel_tasks()
+        self.queues.clear()
+        if TRACK_CACHE_FILE:
+            try:
+                await asyncio.to_thread(self.track_cache.save, TRACK_CACHE_FILE)
+            except OSError as e:
+                print(f"[MusicCog] Could not save track cache: {e}")
 
     def get_node(self):
-        # Safe getter for the Lavalink node (pomice NodePool)
-        return getattr(self.bot, "pomice", None)
+        # Safe getter for the Lavalink node pool (see cogs/_lavalink.py)
+        pool = getattr(self.bot, "pomice", None)
+        return pool if pool is not None and pool.is_ready else None
 
-    @music_commands_group.command(name="join", description="Join your voice channel.")
-    async def join(self, interaction: discord.Interaction):
-        pomice_node = self.get_node()
-        if pomice_node is None:
-            await interaction.response.send_message("Lavalink node not ready yet, please wait.", ephemeral=True)
+    async def wait_for_node(self, interaction: discord.Interaction):
+        """
+        Returns the node pool, waiting up to READY_TIMEOUT for it during startup.
+        Defers the interaction first if it has to wait.
+        """
+        pool = getattr(self.bot, "pomice", None)
+        if pool is not None and pool.is_ready:
+            return pool
+        if not interaction.response.is_done():
+            await interaction.response.defer()
+        if pool is None or not await pool.wait_ready(READY_TIMEOUT):
+            await interaction.followup.send("Lavalink node not ready yet, please try again in a moment.", ephemeral=True)
+            return None
+        return pool
+
+    def get_queue(self, guild_id: int) -> GuildQueue:
+        queue = self.queues.get(guild_id)
+        if queue is None:
+            queue = self.queues[guild_id] = GuildQueue()
+        return queue
+
+    def drop_queue(self, guild_id: int):
+        queue = self.queues.pop(guild_id, None)
+        if queue:
+            queue.cancel_tasks()
+        self.idle_wheel.cancel(guild_id)
+
+    def touch(self, guild_id: int, timeout: float = IDLE_TIMEOUT):
+        """Records activity in a guild, pushing back its idle deadline."""
+        self.idle_wheel.schedule(guild_id, time.monotonic() + timeout)
+
+    @staticmethod
+    def _channel_is_empty(player: pomice.Player) -> bool:
+        channel = player.channel
+        return channel is not None and not any(not member.bot for member in channel.members)
+
+    @staticmethod
+    def _is_finished(player: pomice.Player, queue: GuildQueue | None) -> bool:
+        if player.is_playing:
+            return False
+        return queue is None or not (queue.entries or (queue.loading_task and not queue.loading_task.done()))
+
+    async def _run_reaper(self):
+        while True:
+            await asyncio.sleep(REAPER_TICK)
+            for guild_id in self.idle_wheel.pop_due(time.monotonic()):
+                try:
+                    await self._reap_if_idle(guild_id)
+                except Exception as e:
+                    print(f"[MusicCog] Idle check failed for guild {guild_id}: {e}")
+
+    async def _reap_if_idle(self, guild_id: int):
+        pool = getattr(self.bot, "pomice", None)
+        player = pool.get_player(guild_id) if pool is not None else None
+        if player is None:
+            self.drop_queue(guild_id)
+            return
+        queue = self.queues.get(guild_id)
+        # A paused player with listeners is still in use; leave only when nobody is listening
+        # or when playback has stopped with nothing left to play.
+        if not self._channel_is_empty(player) and not self._is_finished(player, queue):
+            self.touch(guild_id) # Still in use; check again later
+            return
+
+        channel = self.bot.get_channel(queue.text_channel_id) if queue and queue.text_channel_id else None
+        self.drop_queue(guild_id)
+        await player.destroy()
+        self.players_reaped += 1
+        if channel is not None:
+            try:
+                await channel.send("👋 Left the voice channel due to inactivity.")
+            except discord.HTTPException:
+                pass
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+        if member.bot or before.channel == after.channel:
+            return
+        pool = getattr(self.bot, "pomice", None)
+        player = pool.get_player(member.guild.id) if pool is not None else None
+        if player is None or player.channel not in (before.channel, after.channel):
+            return
+        if self._channel_is_empty(player):
+            self.touch(member.guild.id, EMPTY_CHANNEL_TIMEOUT)
+        else:
+            self.touch(member.guild.id)
+
+    def _now_playing_embed(self, entry: QueuedTrack) -> discord.Embed:
+        video_id = get_youtube_video_id(entry.uri)
+        embed = discord.Embed(
+            description=f"# 🎶 **Now Playing**\n`{entry.title}`\n🔗 [YouTube Link]({entry.uri})",
+            color=0xd37bff
+        )
+        if video_id:
+            embed.set_thumbnail(url=f"https://i3.ytimg.com/vi/{video_id}/maxresdefault.jpg")
+        embed.set_footer(text=self.bot.user.name, icon_url=self.bot.user.avatar.url)
+        return embed
+
+    async def resolve_query(self, player: pomice.Player, query: str) -> pomice.Track | pomice.Playlist | None:
+        """Resolves a search string or URL to its first track or a playlist, going through the track cache."""
+        key = self.track_cache.make_key(query)
+        found, track = self.track_cache.get(key)
+        if found:
+            return track
+        start = time.monotonic()
+        tracks = await player.get_tracks(query)
+        latency = time.monotonic() - start
+        if isinstance(tracks, pomice.Playlist):
+            # Playlists aren't cached; they're only loaded once per request anyway.
+            return tracks if tracks.tracks else None
+        track = tracks[0] if tracks else None
+        self.track_cache.put(key, track, latency)
+        return track
+
+    async def search_track(self, player: pomice.Player, query: str) -> pomice.Track | None:
+        result = await self.resolve_query(player, query)
+        if isinstance(result, pomice.Playlist):
+            return result.tracks[0]
+        return result
+
+    async def _resolve(self, player: pomice.Player, entry: QueuedTrack) -> pomice.Track | None:
+        if entry.track is None:
+            entry.track = await self.search_track(player, entry.uri)
+        return entry.track
+
+    def _schedule_prefetch(self, player: pomice.Player, queue: GuildQueue):
+        """Resolves the next entry in the background so the advance doesn't wait on Lavalink."""
+        if queue.prefetch_task and not queue.prefetch_task.done():
+            queue.prefetch_task.cancel()
+        if not queue.entries or queue.entries[0].track is not None:
+            queue.prefetch_task = None
+            return
+
+        async def prefetch(entry: QueuedTrack):
+            try:
+                await self._resolve(player, entry)
+            except pomice.exceptions.TrackLoadError as e:
+                print(f"[MusicCog] Prefetch failed for {entry.uri}: {e}")
+
+        queue.prefetch_task = asyncio.create_task(prefetch(queue.entries[0]))
+
+    async def _play_entry(self, player: pomice.Player, queue: GuildQueue, entry: QueuedTrack) -> bool:
+        track = await self._resolve(player, entry)
+        if track is None:
+            return False
+        queue.current = entry
+        await player.play(track=track)
+        self.touch(player.guild.id)
+        if not self._first_play_logged:
+            self._first_play_logged = True
+            pool = getattr(self.bot, "pomice", None)
+            if pool is not None:
+                print(f"[MusicCog] First track started {time.monotonic() - pool.started_at:.2f}s after startup.")
+        self._schedule_prefetch(player, queue)
+        return True
+
+    async def advance(self, player: pomice.Player, announce: bool = True):
+        """Starts the next track in the guild's queue, honouring the loop mode."""
+        queue = self.queues.get(player.guild.id)
+        if queue is None:
+            return
+        async with queue.lock:
+            finished = queue.current
+            queue.current = None
+            if finished is not None:
+                if queue.loop_mode == "track":
+                    queue.entries.appendleft(finished)
+                elif queue.loop_mode == "queue":
+                    finished.track = None if queue.entries else finished.track
+                    queue.entries.append(finished)
+
+            while queue.entries:
+                entry = queue.entries.popleft()
+                try:
+                    if await self._play_entry(player, queue, entry):
+                        break
+                except pomice.exceptions.TrackLoadError as e:
+                    print(f"[MusicCog] Skipping unplayable track {entry.uri}: {e}")
+            else:
+                # Queue finished; the idle timer starts now.
+                self.touch(player.guild.id)
+                return
+
+        channel = self.bot.get_channel(queue.text_channel_id) if queue.text_channel_id else None
+        if announce and channel is not None:
+            try:
+                await channel.send(embed=self._now_playing_embed(queue.current))
+            except discord.HTTPException:
+                pass
+
+    @commands.Cog.listener()
+    async def on_pomice_track_end(self, player: pomice.Player, track: pomice.Track, reason: str):
+        # "replaced" means /music play or skip already started something else.
+        if str(reason).lower() == "replaced":
             return
+        await self.advance(player)
+
+    @commands.Cog.listener()
+    async def on_pomice_track_stuck(self, player: pomice.Player, track: pomice.Track, threshold: float):
+        await player.stop()
 
+    @commands.Cog.listener()
+    async def on_pomice_track_exception(self, player: pomice.Player, track: pomice.Track, error: str):
+        print(f"[MusicCog] Track exception in guild {player.guild.id}: {error}")
+
+    @music_commands_group.command(name="join", description="Join your voice channel.")
+    async def join(self, interaction: discord.Interaction):
         if not interaction.user.voice:
             await interaction.response.send_message("You're not in a voice channel!", ephemeral=True)
             return
 
+        pomice_node = await self.wait_for_node(interaction)
+        if pomice_node is None:
+            return
+
         channel = interaction.user.voice.channel
-        vc = await channel.connect(cls=pomice.Player)
-        pomice_node.set_player(interaction.guild.id, vc)
-        await interaction.response.send_message(f"Joined {channel.name}!")
+        await pomice_node.connect(channel)
+        self.touch(interaction.guild.id)
+        if not interaction.response.is_done():
+            await interaction.response.send_message(f"Joined {channel.name}!")
+        else:
+            await interaction.followup.send(f"Joined {channel.name}!")
 
     @music_commands_group.command(name="leave", description="Leave the voice channel.")
     async def leave(self, interaction: discord.Interaction):
@@ -47,19 +482,19 @@ class MusicCog(commands.Cog):
             await interaction.response.send_message("I'm not connected to a voice channel!", ephemeral=True)
             return
 
+        self.drop_queue(interaction.guild.id)
         await player.destroy()
         await interaction.response.send_message("Disconnected!")
 
     @music_commands_group.command(name="play", description="Play a song from YouTube or a URL.")
     @app_commands.describe(search="The name or URL of the song")
     async def play(self, interaction: discord.Interaction, search: str):
-        pomice_node = self.get_node()
+        await interaction.response.defer()
+
+        pomice_node = await self.wait_for_node(interaction)
         if pomice_node is None:
-            await interaction.response.send_message("Lavalink node not ready yet, please wait.", ephemeral=True)
             return
 
-        await interaction.response.defer()
-
         player: pomice.Player = pomice_node.get_player(interaction.guild.id)
 
         if not player:
@@ -67,33 +502,237 @@ class MusicCog(commands.Cog):
                 await interaction.followup.send("You're not in a voice channel!", ephemeral=True)
                 return
             channel = interaction.user.voice.channel
-            player = await channel.connect(cls=pomice.Player)
-            pomice_node.set_player(interaction.guild.id, player)
+            player = await pomice_node.connect(channel)
 
         try:
-            tracks = await player.get_tracks(search)
-            if not tracks:
+            result = await self.resolve_query(player, search)
+            if result is None:
                 await interaction.followup.send("No tracks found.")
                 return
 
-            track = tracks[0]
-            video_id = get_youtube_video_id(track.uri)
+            queue = self.get_queue(interaction.guild.id)
+            queue.text_channel_id = interaction.channel_id
 
-            embed = discord.Embed(
-                description=f"# 🎶 **Now Playing**\n`{track.title}`\n🔗 [YouTube Link]({track.uri})",
-                color=0xd37bff
-            )
-            if video_id:
-                embed.set_thumbnail(url=f"https://i3.ytimg.com/vi/{video_id}/maxresdefault.jpg")
-            embed.set_footer(text=self.bot.user.name, icon_url=self.bot.user.avatar.url)
+            if isinstance(result, pomice.Playlist):
+                await self._start_playlist(interaction, player, queue, result)
+                return
+            track = result
+
+            if player.is_playing or queue.current is not None:
+                if len(queue.entries) >= MAX_QUEUE_LENGTH:
+                    await interaction.followup.send(f"The queue is full ({MAX_QUEUE_LENGTH} tracks).", ephemeral=True)
+                    return
+                queue.entries.append(QueuedTrack.from_track(track, interaction.user.id, keep_track=not queue.entries))
+                await interaction.followup.send(f"➕ Added `{track.title}` to the queue at position {len(queue.entries)}.")
+                return
 
-            await player.play(track=track)
+            entry = QueuedTrack.from_track(track, interaction.user.id, keep_track=True)
+            async with queue.lock:
+                await self._play_entry(player, queue, entry)
             await player.set_volume(100)
-            await interaction.followup.send(embed=embed)
+            await interaction.followup.send(embed=self._now_playing_embed(entry))
 
         except pomice.exceptions.TrackLoadError as e:
             await interaction.followup.send(f"Failed to load track: {e}")
 
+    async def _start_playlist(self, interaction: discord.Interaction, player: pomice.Player, queue: GuildQueue, playlist: pomice.Playlist):
+        """Plays the first track right away (if idle) and enqueues the rest in the background."""
+        if queue.loading_task and not queue.loading_task.done():
+            await interaction.followup.send("A playlist is still loading for this server. Please wait for it to finish.", ephemeral=True)
+            return
+
+        tracks = playlist.tracks
+        requester_id = interaction.user.id
+        first_index = 0
+        if not player.is_playing and queue.current is None:
+            entry = QueuedTrack.from_track(tracks[0], requester_id, keep_track=True)
+            async with queue.lock:
+                await self._play_entry(player, queue, entry)
+            await player.set_volume(100)
+            await interaction.followup.send(embed=self._now_playing_embed(entry))
+            first_index = 1
+
+        remaining = tracks[first_index:first_index + max(MAX_QUEUE_LENGTH - len(queue.entries), 0)]
+        skipped = len(tracks) - first_index - len(remaining)
+        progress_embed = discord.Embed(
+            description=f"📃 Loading **{playlist.name}**: 0/{len(remaining)} tracks queued...",
+            color=0xd37bff
+        )
+        progress_message = await interaction.followup.send(embed=progress_embed, wait=True)
+        queue.loading_task = asyncio.create_task(
+            self._enqueue_playlist(player, queue, playlist.name, remaining, requester_id, skipped, progress_message)
+        )
+
+    async def _enqueue_playlist(self, player: pomice.Player, queue: GuildQueue, name: str,
+                                tracks: list[pomice.Track], requester_id: int, skipped: int,
+                                progress_message: discord.WebhookMessage):
+        last_update = time.monotonic()
+        queued = 0
+        for start in range(0, len(tracks), PLAYLIST_BATCH_SIZE):
+            batch = tracks[start:start + PLAYLIST_BATCH_SIZE]
+            was_empty = not queue.entries
+            queue.entries.extend(QueuedTrack.from_track(track, requester_id) for track in batch)
+            queued += len(batch)
+            if was_empty:
+                self._schedule_prefetch(player, queue)
+            if time.monotonic() - last_update >= PLAYLIST_PROGRESS_INTERVAL:
+                last_update = time.monotonic()
+                progress_message.embeds[0].description = f"📃 Loading **{name}**: {queued}/{len(tracks)} tracks queued..."
+                try:
+                    await progress_message.edit(embed=progress_message.embeds[0])
+                except discord.HTTPException:
+                    pass
+            await asyncio.sleep(0) # Let other guilds' events run between batches
+
+        description = f"📃 Queued **{queued}** tracks from **{name}**."
+        if skipped:
+            description += f"\n{skipped} track(s) didn't fit in the queue (max {MAX_QUEUE_LENGTH})."
+        try:
+            await progress_message.edit(embed=discord.Embed(description=description, color=0xd37bff))
+        except discord.HTTPException:
+            pass
+
+        # Start playback if the queue ran dry while the playlist was loading.
+        if not player.is_playing and queue.current is None:
+            await self.advance(player)
+
+    async def _get_active_player(self, interaction: discord.Interaction) -> pomice.Player | None:
+        pomice_node = self.get_node()
+        if pomice_node is None:
+            await interaction.response.send_message("Lavalink node not ready yet, please wait.", ephemeral=True)
+            return None
+        player = pomice_node.get_player(interaction.guild.id)
+        if not player:
+            await interaction.response.send_message("I'm not connected to a voice channel!", ephemeral=True)
+            return None
+        return player
+
+    @music_commands_group.command(name="queue", description="Show the upcoming tracks.")
+    async def show_queue(self, interaction: discord.Interaction):
+        queue = self.queues.get(interaction.guild.id)
+        if queue is None or (queue.current is None and not queue.entries):
+            await interaction.response.send_message("The queue is empty.", ephemeral=True)
+            return
+
+        lines = []
+        if queue.current is not None:
+            lines.append(f"**Now:** `{queue.current.title}` ({format_duration(queue.current.length)})")
+        for position, entry in enumerate(list(queue.entries)[:15], start=1):
+            lines.append(f"`{position}.` {entry.title} ({format_duration(entry.length)}) — <@{entry.requester_id}>")
+        if len(queue.entries) > 15:
+            lines.append(f"...and {len(queue.entries) - 15} more.")
+        total = sum(entry.length for entry in queue.entries)
+        embed = discord.Embed(title="🎶 Queue", description="\n".join(lines), color=0xd37bff)
+        embed.set_footer(text=f"{len(queue.entries)} track(s) • {format_duration(total)} • Loop: {queue.loop_mode}")
+        await interaction.response.send_message(embed=embed)
+
+    @music_commands_group.command(name="skip", description="Skip the current track.")
+    async def skip(self, interaction: discord.Interaction):
+        player = await self._get_active_player(interaction)
+        if player is None:
+            return
+        queue = self.queues.get(interaction.guild.id)
+        if queue is None or queue.current is None:
+            await interaction.response.send_message("Nothing is playing.", ephemeral=True)
+            return
+        skipped = queue.current
+        if queue.loop_mode == "track":
+            # Skipping should move on even when the current track is looped.
+            queue.current = None
+        await interaction.response.send_message(f"⏭️ Skipped `{skipped.title}`.")
+        await player.stop() # The track end event advances the queue
+
+    @music_commands_group.command(name="remove", description="Remove a track from the queue.")
+    @app_commands.describe(position="The queue position of the track to remove.")
+    async def remove(self, interaction: discord.Interaction, position: app_commands.Range[int, 1, MAX_QUEUE_LENGTH]):
+        queue = self.queues.get(interaction.guild.id)
+        if queue is None or position > len(queue.entries):
+            await interaction.response.send_message("There is no track at that position.", ephemeral=True)
+            return
+        entry = queue.entries[position - 1]
+        del queue.entries[position - 1]
+        if position == 1:
+            # The prefetch was resolving the removed track; start on the new head instead.
+            player = self.get_node().get_player(interaction.guild.id) if self.get_node() else None
+            if player:
+                self._schedule_prefetch(player, queue)
+        await interaction.response.send_message(f"🗑️ Removed `{entry.title}` from the queue.")
+
+    @music_commands_group.command(name="move", description="Move a track to a different position in the queue.")
+    @app_commands.describe(from_position="The track's current position.", to_position="The position to move it to.")
+    async def move(self, interaction: discord.Interaction,
+                   from_position: app_commands.Range[int, 1, MAX_QUEUE_LENGTH],
+                   to_position: app_commands.Range[int, 1, MAX_QUEUE_LENGTH]):
+        queue = self.queues.get(interaction.guild.id)
+        if queue is None or from_position > len(queue.entries):
+            await interaction.response.send_message("There is no track at that position.", ephemeral=True)
+            return
+        entry = queue.entries[from_position - 1]
+        del queue.entries[from_position - 1]
+        new_position = min(to_position, len(queue.entries) + 1)
+        queue.entries.insert(new_position - 1, entry)
+        player = self.get_node().get_player(interaction.guild.id) if self.get_node() else None
+        if player:
+            self._schedule_prefetch(player, queue)
+        await interaction.response.send_message(f"↕️ Moved `{entry.title}` to position {new_position}.")
+
+    @music_commands_group.command(name="shuffle", description="Shuffle the queue.")
+    async def shuffle(self, interaction: discord.Interaction):
+        queue = self.queues.get(interaction.guild.id)
+        if queue is None or len(queue.entries) < 2:
+            await interaction.response.send_message("There aren't enough tracks in the queue to shuffle.", ephemeral=True)
+            return
+        entries = list(queue.entries)
+        random.shuffle(entries)
+        queue.entries = deque(entries)
+        player = self.get_node().get_player(interaction.guild.id) if self.get_node() else None
+        if player:
+            self._schedule_prefetch(player, queue)
+        await interaction.response.send_message(f"🔀 Shuffled {len(entries)} tracks.")
+
+    @music_commands_group.command(name="cachestats", description="Show track search cache statistics.")
+    async def cache_stats(self, interaction: discord.Interaction):
+        cache = self.track_cache
+        lookups = cache.hits + cache.negative_hits + cache.misses
+        hit_rate = ((cache.hits + cache.negative_hits) / lookups * 100) if lookups else 0.0
+        embed = discord.Embed(title="🎶 Track Cache", color=0xd37bff)
+        embed.add_field(name="Entries", value=f"{len(cache)} / {cache.max_entries}", inline=True)
+        embed.add_field(name="Hit Rate", value=f"{hit_rate:.1f}%", inline=True)
+        embed.add_field(name="Hits", value=f"{cache.hits} (+{cache.negative_hits} \"no results\")", inline=True)
+        embed.add_field(name="Misses", value=str(cache.misses), inline=True)
+        embed.add_field(name="Avg Lookup", value=f"{cache.miss_latency * 1000:.0f} ms", inline=True)
+        embed.add_field(name="Time Saved", value=f"{cache.saved_seconds:.1f}s", inline=True)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @music_commands_group.command(name="nodes", description="Show Lavalink node load and live players.")
+    async def node_stats(self, interaction: discord.Interaction):
+        pool = getattr(self.bot, "pomice", None)
+        if pool is None or not pool.nodes:
+            await interaction.response.send_message("No Lavalink nodes are configured yet.", ephemeral=True)
+            return
+        lines = [
+            f"{'🟢' if connected else '🔴'} **{identifier}** — {players} player(s), penalty {penalty:.1f}"
+            for identifier, connected, players, penalty in pool.stats()
+        ]
+        embed = discord.Embed(title="🎶 Lavalink Nodes", description="\n".join(lines), color=0xd37bff)
+        embed.add_field(name="Live Players", value=str(sum(players for _, _, players, _ in pool.stats())), inline=True)
+        embed.add_field(name="Voice Connections", value=str(len(self.bot.voice_clients)), inline=True)
+        embed.add_field(name="Idle Timers", value=str(len(self.idle_wheel)), inline=True)
+        embed.add_field(name="Idle Players Reaped", value=str(self.players_reaped), inline=True)
+        embed.set_footer(text=f"Players moved after node failures: {pool.migrations}")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @music_commands_group.command(name="loop", description="Set the loop mode.")
+    @app_commands.describe(mode="What to repeat.")
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="Off", value="off"),
+        app_commands.Choice(name="Current Track", value="track"),
+        app_commands.Choice(name="Whole Queue", value="queue"),
+    ])
+    async def loop(self, interaction: discord.Interaction, mode: str):
+        self.get_queue(interaction.guild.id).loop_mode = mode
+        await interaction.response.send_message(f"🔁 Loop mode set to **{mode}**.")
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(MusicCog(bot))
@@ -4,10 +4,290 @@ from discord.ext import commands
 from discord import app_commands
 import aiohttp
 from io import BytesIO
-from PIL import Image, UnidentifiedImageError
+from cogs._imaging import (
+    CONVERT_FORMATS, DEFAULT_UPLOAD_LIMIT, MAX_INPUT_BYTES, ImageJobError, ImageTooLarge, Tile,
+    combine_tiles, convert_image, tile_size,
+)
 import urllib.parse # For URL encoding location in weather
 import typing
 import datetime
+import time
+import asyncio
+import functools
+import os
+import sqlite3
+import sys
+import tempfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+SNIPES_PER_CHANNEL = 10
+SNIPE_TTL = 3600 # Seconds a deleted message stays snipeable
+SNIPE_MAX_BYTES = 8 * 1024 * 1024 # Approximate cap across all channels
+UTILITY_DB = os.environ.get("UTILITY_DB", "data/utility.db")
+AFK_ACTION_INTERVAL = 0.5 # Seconds between queued nickname edits / AFK replies
+AFK_ACTION_QUEUE_SIZE = 1000
+AFK_MENTION_WINDOW = 60 # Seconds before the same AFK notice is repeated in a channel
+EMOJI_TILE_HEIGHT = 64
+EMOJI_TILE_PADDING = 5
+WEATHER_BASE_URL = os.environ.get("WEATHER_BASE_URL", "https://wttr.in") # Point at a local stub for testing
+WEATHER_TTL = 600 # Seconds a cached report is served as fresh
+WEATHER_STALE_TTL = 3600 # Seconds a cached report may still be served while it is refreshed
+WEATHER_CACHE_MAX_ENTRIES = 256
+WEATHER_IMAGE_GRACE = 1.5 # Seconds the image gets to arrive after the text report before the text is used
+ATTACHMENT_CHUNK_SIZE = 256 * 1024
+CONVERTIBLE_CONTENT_TYPES = ("image/png", "image/jpeg", "image/webp", "image/gif")
+EMOJI_TILE_CACHE_BYTES = int(os.environ.get("EMOJI_TILE_CACHE_BYTES", 16 * 1024 * 1024))
+
+class SnipedMessage:
+    """The parts of a deleted message that the snipe embed needs, and nothing else."""
+    __slots__ = ("content", "author_name", "author_display_name", "author_avatar_url", "created_at",
+                 "attachment_name", "attachment_url", "attachment_is_image", "deleted_at")
+
+    # Per-record overhead (slotted object, datetime, float) on top of the strings themselves.
+    BASE_SIZE = 180
+
+    def __init__(self, message: discord.Message):
+        self.content = message.content
+        self.author_name = str(message.author)
+        self.author_display_name = message.author.display_name
+        self.author_avatar_url = message.author.display_avatar.url
+        self.created_at = message.created_at
+        self.attachment_name = self.attachment_url = None
+        self.attachment_is_image = False
+        if message.attachments:
+            attachment = message.attachments[0]
+            self.attachment_name = attachment.filename
+            self.attachment_url = attachment.url
+            self.attachment_is_image = bool(attachment.content_type and attachment.content_type.startswith("image/"))
+        self.deleted_at = time.monotonic()
+
+    @property
+    def size(self) -> int:
+        return self.BASE_SIZE + sum(
+            sys.getsizeof(value) for value in (self.content, self.author_name, self.author_display_name,
+                                     self.author_avatar_url, self.attachment_name, self.attachment_url) if value
+        )
+
+class SnipeStore:
+    """
+    Per-channel ring buffers of recently deleted messages, with TTL expiry and a
+    global size cap enforced by evicting the least recently used channels.
+    """
+    # Each channel's deque and its OrderedDict entry, which outweigh a few small records.
+    CHANNEL_SIZE = sys.getsizeof(deque()) + 100
+
+    def __init__(self, per_channel: int, ttl: float, max_bytes: int):
+        self.per_channel = per_channel
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._channels: OrderedDict[int, deque[SnipedMessage]] = OrderedDict() # {channel_id: newest last}
+        self.total_bytes = 0
+
+    def add(self, channel_id: int, record: SnipedMessage):
+        buffer = self._channels.get(channel_id)
+        if buffer is None:
+            buffer = self._channels[channel_id] = deque()
+            self.total_bytes += self.CHANNEL_SIZE
+        elif len(buffer) >= self.per_channel:
+            self.total_bytes -= buffer.popleft().size
+        buffer.append(record)
+        self._channels.move_to_end(channel_id)
+        self.total_bytes += record.size
+        while self.total_bytes > self.max_bytes and len(self._channels) > 1:
+            _, evicted = self._channels.popitem(last=False)
+            self.total_bytes -= self.CHANNEL_SIZE + sum(r.size for r in evicted)
+
+    def _expire(self, channel_id: int) -> deque[SnipedMessage] | None:
+        buffer = self._channels.get(channel_id)
+        if buffer is None:
+            return None
+        cutoff = time.monotonic() - self.ttl
+        while buffer and buffer[0].deleted_at < cutoff:
+            self.total_bytes -= buffer.popleft().size
+        if not buffer:
+            del self._channels[channel_id]
+            self.total_bytes -= self.CHANNEL_SIZE
+            return None
+        return buffer
+
+    def pop(self, channel_id: int, index: int = 1) -> SnipedMessage | None:
+        """Removes and returns the index-th most recent deletion (1 = newest)."""
+        buffer = self._expire(channel_id)
+        if buffer is None or not 1 <= index <= len(buffer):
+            return None
+        record = buffer[-index]
+        del buffer[-index]
+        self.total_bytes -= record.size
+        if buffer:
+            self._channels.move_to_end(channel_id)
+        else:
+            del self._channels[channel_id]
+            self.total_bytes -= self.CHANNEL_SIZE
+        return record
+
+    def count(self, channel_id: int) -> int:
+        buffer = self._expire(channel_id)
+        return len(buffer) if buffer else 0
+
+class EmojiTileCache:
+    """
+    LRU cache of resized emoji tiles keyed by emoji ID, capped by the total size of
+    their pixel data rather than by entry count.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._tiles: OrderedDict[int, Tile] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, emoji_id: int) -> Tile | None:
+        tile = self._tiles.get(emoji_id)
+        if tile is None:
+            self.misses += 1
+            return None
+        self._tiles.move_to_end(emoji_id)
+        self.hits += 1
+        return tile
+
+    def put(self, emoji_id: int, tile: Tile):
+        size = tile_size(tile)
+        if size > self.max_bytes:
+            return
+        old_tile = self._tiles.pop(emoji_id, None)
+        if old_tile is not None:
+            self.total_bytes -= tile_size(old_tile)
+        self._tiles[emoji_id] = tile
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._tiles.popitem(last=False)
+            self.total_bytes -= tile_size(evicted)
+
+    def __len__(self) -> int:
+        return len(self._tiles)
+
+class WeatherCache:
+    """
+    LRU cache of wttr.in reports keyed on a normalized location. Each entry holds the
+    image and text representations separately; they are fresh for `ttl` seconds and may
+    be served stale, while a refresh runs, until `stale_ttl`.
+    """
+    def __init__(self, max_entries: int, ttl: float, stale_ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: OrderedDict[str, dict[str, tuple[float, typing.Any]]] = OrderedDict() # {key: {kind: (fetched_at, payload)}}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(location: str) -> str:
+        return " ".join(location.casefold().replace(",", " ").split())
+
+    def get(self, key: str) -> tuple[str, typing.Any, bool] | None:
+        """Returns (kind, payload, is_fresh), preferring the image, or None if nothing usable is cached."""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        for kind in ("png", "text"):
+            if entry is None or kind not in entry:
+                continue
+            fetched_at, payload = entry[kind]
+            age = now - fetched_at
+            if age > self.stale_ttl:
+                continue
+            self._entries.move_to_end(key)
+            if age <= self.ttl:
+                self.hits += 1
+                return kind, payload, True
+            self.stale_hits += 1
+            return kind, payload, False
+        self.misses += 1
+        return None
+
+    def put(self, key: str, kind: str, payload: typing.Any):
+        self._entries.setdefault(key, {})[kind] = (time.monotonic(), payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+class AFKStore:
+    """
+    SQLite (WAL) persistence for AFK statuses. The cog keeps the authoritative
+    in-memory dict; this only loads it at startup and writes changes behind it on a
+    single worker thread, so callers never wait on disk.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="afk-store")
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS afk ("
+                "user_id INTEGER PRIMARY KEY, message TEXT, timestamp REAL NOT NULL, original_nick TEXT)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _load_sync(self) -> dict[int, dict[str, typing.Any]]:
+        rows = self._connect().execute("SELECT user_id, message, timestamp, original_nick FROM afk").fetchall()
+        return {
+            user_id: {
+                "message": message,
+                "timestamp": datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc),
+                "original_nick": original_nick,
+            }
+            for user_id, message, timestamp, original_nick in rows
+        }
+
+    def _save_sync(self, user_id: int, data: dict[str, typing.Any]):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO afk (user_id, message, timestamp, original_nick) VALUES (?, ?, ?, ?)",
+            (user_id, data["message"], data["timestamp"].timestamp(), data["original_nick"])
+        )
+        conn.commit()
+
+    def _delete_sync(self, user_id: int):
+        conn = self._connect()
+        conn.execute("DELETE FROM afk WHERE user_id = ?", (user_id,))
+        conn.commit()
+
+    @staticmethod
+    def _report_error(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"[AFKStore] Write failed: {future.exception()}")
+
+    def _submit(self, func, *args):
+        future = asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        future.add_done_callback(self._report_error)
+
+    async def load(self) -> dict[int, dict[str, typing.Any]]:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._load_sync)
+
+    def save(self, user_id: int, data: dict[str, typing.Any]):
+        self._submit(self._save_sync, user_id, data)
+
+    def delete(self, user_id: int):
+        self._submit(self._delete_sync, user_id)
+
+    def _close_sync(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def close(self):
+        # Queued behind any pending writes, so none of them can reopen the connection after it.
+        self._executor.submit(self._close_sync)
+        self._executor.shutdown(wait=True)
 
 class UtilityCog(commands.Cog):
     """
@@ -17,69 +297,120 @@ class UtilityCog(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self._session: aiohttp.ClientSession | None = None
-        self.sniped_messages: dict[int, discord.Message] = {} # {channel_id: message_object}
+        self.snipes = SnipeStore(SNIPES_PER_CHANNEL, SNIPE_TTL, SNIPE_MAX_BYTES)
+        self.emoji_tiles = EmojiTileCache(EMOJI_TILE_CACHE_BYTES)
+        self.weather_cache = WeatherCache(WEATHER_CACHE_MAX_ENTRIES, WEATHER_TTL, WEATHER_STALE_TTL)
+        self._weather_inflight: dict[str, asyncio.Task] = {} # One refresh per location at a time
+        self._weather_fetches: set[asyncio.Task] = set() # Keeps slower representations alive after a winner is used
         self.afk_users: dict[int, dict[str, typing.Any]] = {} # {user_id: {"message": str, "timestamp": datetime, "original_nick": str|None}}
+        self.afk_store = AFKStore(UTILITY_DB)
+        self._afk_actions: asyncio.Queue = asyncio.Queue(maxsize=AFK_ACTION_QUEUE_SIZE)
+        self._afk_worker_task: asyncio.Task | None = None
+        self._afk_notices: dict[tuple[int, int], float] = {} # {(channel_id, afk_user_id): last notice time}
 
-    async def _get_session(self) -> aiohttp.ClientSession:
-        if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
-        return self._session
+    async def cog_load(self):
+        self.afk_users = await self.afk_store.load()
+        self._afk_worker_task = asyncio.create_task(self._run_afk_actions())
 
     async def cog_unload(self):
-        if self._session:
-            await self._session.close()
+        if self._afk_worker_task:
+            self._afk_worker_task.cancel()
+        await asyncio.to_thread(self.afk_store.close)
+
+    def _queue_afk_action(self, action: typing.Callable[[], typing.Awaitable[None]]):
+        try:
+            self._afk_actions.put_nowait(action)
+        except asyncio.QueueFull:
+            print("[UtilityCog] AFK action queue is full; dropping an action.")
+
+    async def _run_afk_actions(self):
+        """Performs queued nickname edits and AFK replies one at a time, paced to stay clear of rate limits."""
+        while True:
+            action = await self._afk_actions.get()
+            try:
+                await action()
+            except Exception as e:
+                print(f"[UtilityCog] AFK action failed: {e}")
+            await asyncio.sleep(AFK_ACTION_INTERVAL)
+
+    async def _welcome_back(self, message: discord.Message, afk_data: dict[str, typing.Any]):
+        welcome_back_message = f"Welcome back, {message.author.mention}! Your AFK status has been removed."
+        try:
+            if afk_data.get("original_nick") and message.author.display_name.startswith("[AFK]"):
+                await message.author.edit(nick=afk_data["original_nick"])
+                welcome_back_message += " Your nickname has been restored."
+        except discord.Forbidden:
+            welcome_back_message += " (I couldn't restore your nickname due to permissions.)"
+        except discord.HTTPException as e:
+             print(f"Error restoring nickname for {message.author.name}: {e}")
+
+        try:
+            await message.channel.send(welcome_back_message, delete_after=10)
+        except discord.Forbidden:
+            pass
+
+    async def _send_afk_notice(self, message: discord.Message, lines: list[str]):
+        try:
+            await message.reply("\n".join(lines), delete_after=15)
+        except discord.Forbidden:
+            pass
+
+    def _should_notify(self, channel_id: int, user_id: int) -> bool:
+        now = time.monotonic()
+        if len(self._afk_notices) > 5000:
+            cutoff = now - AFK_MENTION_WINDOW
+            self._afk_notices = {key: sent for key, sent in self._afk_notices.items() if sent > cutoff}
+        last_sent = self._afk_notices.get((channel_id, user_id))
+        if last_sent is not None and now - last_sent < AFK_MENTION_WINDOW:
+            return False
+        self._afk_notices[(channel_id, user_id)] = now
+        return True
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Borrowed from the bot-wide HTTP service; it is closed by main.py, not by this cog.
+        return self.bot.http_service.session
 
     @commands.Cog.listener()
     async def on_message_delete(self, message: discord.Message):
         if message.author.bot or not message.guild: # Ignore bots and DMs for snipe
             return
-        self.sniped_messages[message.channel.id] = message
+        self.snipes.add(message.channel.id, SnipedMessage(message))
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.author.bot or not message.guild:
             return
 
+        # Keep this path cheap: state changes are in memory, API calls and disk writes are queued.
         if message.author.id in self.afk_users:
             afk_data = self.afk_users.pop(message.author.id)
-            welcome_back_message = f"Welcome back, {message.author.mention}! Your AFK status has been removed."
-            try:
-                if afk_data.get("original_nick") and message.author.display_name.startswith("[AFK]"):
-                    await message.author.edit(nick=afk_data["original_nick"])
-                    welcome_back_message += " Your nickname has been restored."
-            except discord.Forbidden:
-                welcome_back_message += " (I couldn't restore your nickname due to permissions.)"
-            except discord.HTTPException as e:
-                 print(f"Error restoring nickname for {message.author.name}: {e}")
-
-            try:
-                await message.channel.send(welcome_back_message, delete_after=10)
-            except discord.Forbidden:
-                pass
+            self.afk_store.delete(message.author.id)
+            self._queue_afk_action(functools.partial(self._welcome_back, message, afk_data))
 
         if message.mentions:
+            notices = []
             for mentioned_user in message.mentions:
-                if mentioned_user.id in self.afk_users:
-                    afk_data = self.afk_users[mentioned_user.id]
-                    afk_since = discord.utils.format_dt(afk_data["timestamp"], style='R')
-                    afk_message = afk_data["message"]
-                    try:
-                        await message.reply(
-                            f"{mentioned_user.display_name} is AFK ({afk_since}): {afk_message}",
-                            delete_after=15
-                        )
-                    except discord.Forbidden:
-                        pass
+                mentioned_afk = self.afk_users.get(mentioned_user.id)
+                if mentioned_afk is None or not self._should_notify(message.channel.id, mentioned_user.id):
+                    continue
+                afk_since = discord.utils.format_dt(mentioned_afk["timestamp"], style='R')
+                notices.append(f"{mentioned_user.display_name} is AFK ({afk_since}): {mentioned_afk['message']}")
+            if notices:
+                self._queue_afk_action(functools.partial(self._send_afk_notice, message, notices))
 
     # --- Snipe Command ---
-    @utility_commands_group.command(name="snipe", description="Shows the last deleted message in this channel.")
+    @utility_commands_group.command(name="snipe", description="Shows a recently deleted message in this channel.")
+    @app_commands.describe(index="Which deletion to show: 1 is the most recent (default).")
     @app_commands.guild_only()
-    async def snipe_message(self, interaction: discord.Interaction):
-        sniped_msg = self.sniped_messages.get(interaction.channel.id)
+    async def snipe_message(self, interaction: discord.Interaction, index: app_commands.Range[int, 1, SNIPES_PER_CHANNEL] = 1):
+        sniped_msg = self.snipes.pop(interaction.channel.id, index)
 
         if not sniped_msg:
-            await interaction.response.send_message("There's nothing to snipe in this channel!", ephemeral=True)
+            available = self.snipes.count(interaction.channel.id)
+            if available:
+                await interaction.response.send_message(f"There are only {available} deleted message(s) to snipe here.", ephemeral=True)
+            else:
+                await interaction.response.send_message("There's nothing to snipe in this channel!", ephemeral=True)
             return
 
         embed = discord.Embed(
@@ -87,17 +418,15 @@ class UtilityCog(commands.Cog):
             color=0xd37bff,
             timestamp=sniped_msg.created_at
         )
-        embed.set_author(name=str(sniped_msg.author), icon_url=sniped_msg.author.display_avatar.url)
-        embed.set_footer(text=f"Sniped message from {sniped_msg.author.display_name}")
+        embed.set_author(name=sniped_msg.author_name, icon_url=sniped_msg.author_avatar_url)
+        embed.set_footer(text=f"Sniped message from {sniped_msg.author_display_name}")
 
-        if sniped_msg.attachments:
-            first_attachment = sniped_msg.attachments[0]
-            if first_attachment.content_type and first_attachment.content_type.startswith("image/"):
-                embed.set_image(url=first_attachment.url)
+        if sniped_msg.attachment_url:
+            if sniped_msg.attachment_is_image:
+                embed.set_image(url=sniped_msg.attachment_url)
             else:
-                embed.add_field(name="Attachment", value=f"[{first_attachment.filename}]({first_attachment.url})", inline=False)
-        
-        self.sniped_messages.pop(interaction.channel.id, None)
+                embed.add_field(name="Attachment", value=f"[{sniped_msg.attachment_name}]({sniped_msg.attachment_url})", inline=False)
+
         await interaction.response.send_message(embed=embed)
 
     # --- AFK Group ---
@@ -139,6 +468,7 @@ class UtilityCog(commands.Cog):
             "timestamp": discord.utils.utcnow(),
             "original_nick": original_nick
         }
+        self.afk_store.save(interaction.user.id, self.afk_users[interaction.user.id])
 
     @afk_group.command(name="remove", description="Removes your AFK status.")
     @app_commands.guild_only()
@@ -148,6 +478,7 @@ class UtilityCog(commands.Cog):
             return
 
         afk_data = self.afk_users.pop(interaction.user.id)
+        self.afk_store.delete(interaction.user.id)
         response_msg = "Your AFK status has been removed."
         try:
             if afk_data.get("original_nick") and interaction.user.display_name.startswith("[AFK]"):
@@ -160,31 +491,70 @@ class UtilityCog(commands.Cog):
             response_msg += f" (Error restoring nickname: {e})"
         await interaction.response.send_message(response_msg, ephemeral=True)
 
-    # --- PNG to Static GIF Command ---
-    @utility_commands_group.command(name="togif", description="Converts an uploaded PNG image to a static GIF image.")
-    @app_commands.describe(image_file="The PNG file to convert.")
-    async def png_to_static_gif(self, interaction: discord.Interaction, image_file: discord.Attachment):
-        await interaction.response.defer(thinking=True)
-        if not image_file.content_type or not image_file.content_type.startswith("image/png"):
-            await interaction.followup.send("Please upload a valid PNG file.", ephemeral=True)
+    # --- Image Conversion Commands ---
+    async def _download_attachment(self, attachment: discord.Attachment) -> str:
+        """Streams an attachment to a temporary file, enforcing the size limit as it arrives. Returns the path."""
+        session = await self._get_session()
+        fd, path = tempfile.mkstemp(prefix="convert-", suffix=os.path.splitext(attachment.filename)[1])
+        try:
+            with open(fd, "wb") as temp_file:
+                async with session.get(attachment.url, timeout=self.bot.http_service.timeout("attachment")) as resp:
+                    if resp.status != 200:
+                        raise ImageJobError(f"Couldn't download the attachment (Status: {resp.status}).")
+                    received = 0
+                    async for chunk in resp.content.iter_chunked(ATTACHMENT_CHUNK_SIZE):
+                        received += len(chunk)
+                        if received > MAX_INPUT_BYTES:
+                            raise ImageTooLarge(f"Image is larger than {MAX_INPUT_BYTES // (1024 * 1024)} MB.")
+                        await asyncio.to_thread(temp_file.write, chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path
+
+    async def _convert_attachment(self, interaction: discord.Interaction, image_file: discord.Attachment, target_format: str):
+        if not image_file.content_type or not image_file.content_type.startswith(CONVERTIBLE_CONTENT_TYPES):
+            await interaction.followup.send("Please upload a PNG, JPEG, WebP or GIF image.", ephemeral=True)
             return
+        if image_file.size > MAX_INPUT_BYTES:
+            await interaction.followup.send(f"Images larger than {MAX_INPUT_BYTES // (1024 * 1024)} MB can't be converted.", ephemeral=True)
+            return
+        upload_limit = interaction.guild.filesize_limit if interaction.guild else DEFAULT_UPLOAD_LIMIT
+        path = None
         try:
-            png_bytes = await image_file.read()
-            with Image.open(BytesIO(png_bytes)) as img:
-                if img.mode in ['RGBA', 'LA']: pass 
-                output_buffer = BytesIO()
-                img.save(output_buffer, format="GIF", save_all=False) 
-                output_buffer.seek(0)
-                discord_file = discord.File(fp=output_buffer, filename=f"{image_file.filename.rsplit('.', 1)[0]}.gif")
-                await interaction.followup.send("Here is your converted static GIF:", file=discord_file)
-        except UnidentifiedImageError:
-            await interaction.followup.send("Could not identify the image. Please ensure it's a valid PNG.", ephemeral=True)
+            path = await self._download_attachment(image_file)
+            image_bytes = await self.bot.image_service.run(convert_image, path, target_format, upload_limit)
+            extension = "jpg" if target_format == "jpeg" else target_format
+            discord_file = discord.File(fp=BytesIO(image_bytes), filename=f"{image_file.filename.rsplit('.', 1)[0]}.{extension}")
+            await interaction.followup.send(f"Here is your converted {target_format.upper()} image:", file=discord_file)
+        except ImageJobError as e:
+            await interaction.followup.send(f"Could not convert the image: {e}", ephemeral=True)
+        except asyncio.TimeoutError:
+            await interaction.followup.send("The conversion took too long and was cancelled.", ephemeral=True)
         except Exception as e:
-            print(f"Error in png_to_static_gif: {e}")
+            print(f"Error converting image: {e}")
             await interaction.followup.send(f"An error occurred during conversion: {e}", ephemeral=True)
+        finally:
+            if path is not None:
+                await asyncio.to_thread(os.remove, path)
+
+    @utility_commands_group.command(name="convert", description="Converts an uploaded image between PNG, JPEG, WebP and GIF.")
+    @app_commands.describe(image_file="The image to convert.", target_format="The format to convert to.")
+    @app_commands.choices(target_format=[
+        app_commands.Choice(name=name.upper(), value=name) for name in CONVERT_FORMATS
+    ])
+    async def convert_image_command(self, interaction: discord.Interaction, image_file: discord.Attachment, target_format: str):
+        await interaction.response.defer(thinking=True)
+        await self._convert_attachment(interaction, image_file, target_format)
+
+    @utility_commands_group.command(name="togif", description="Converts an uploaded image to a GIF.")
+    @app_commands.describe(image_file="The PNG, JPEG, WebP or GIF file to convert.")
+    async def png_to_static_gif(self, interaction: discord.Interaction, image_file: discord.Attachment):
+        await interaction.response.defer(thinking=True)
+        await self._convert_attachment(interaction, image_file, "gif")
 
     # --- Combine Emojis Command ---
-    @utility_commands_group.command(name="combineemojis", description="Combines 2 or 3 custom server emojis side-by-side.")
+    @utility_commands_group.command(name="combineemojis", description="Combines 2 or 3 custom server emojis (animated ones too) side-by-side.")
     @app_commands.describe(
         emoji1_str="The first custom emoji (name, ID, or full tag like <:name:id>).",
         emoji2_str="The second custom emoji (name, ID, or full tag).",
@@ -214,84 +584,147 @@ class UtilityCog(commands.Cog):
         if len(processed_emojis) < 2:
             await interaction.followup.send("Please provide at least two valid custom emojis to combine.", ephemeral=True)
             return
-        images = []
+        # Only emojis without a cached tile are downloaded, each once, all at the same time.
+        cached = {emoji_obj.id: self.emoji_tiles.get(emoji_obj.id) for emoji_obj in processed_emojis}
+        missing = {emoji_obj.id: emoji_obj for emoji_obj in processed_emojis if cached[emoji_obj.id] is None}
         session = await self._get_session()
         try:
-            for emoji_obj in processed_emojis:
-                async with session.get(str(emoji_obj.url)) as resp:
-                    if resp.status == 200:
-                        image_bytes = await resp.read()
-                        images.append(Image.open(BytesIO(image_bytes)).convert("RGBA"))
-                    else:
-                        await interaction.followup.send(f"Failed to download image for emoji: {emoji_obj.name} (Status: {resp.status})", ephemeral=True)
-                        return
+            results = await asyncio.gather(*(self._download_emoji(session, emoji_obj) for emoji_obj in missing.values()))
         except Exception as e:
             print(f"Error downloading emoji images: {e}")
             await interaction.followup.send(f"Error downloading emoji images: {e}", ephemeral=True)
             return
-        if not images:
-            await interaction.followup.send("No emoji images could be processed.", ephemeral=True)
+        downloads = {}
+        for emoji_obj, (status, image_bytes) in zip(missing.values(), results):
+            if image_bytes is None:
+                await interaction.followup.send(f"Failed to download image for emoji: {emoji_obj.name} (Status: {status})", ephemeral=True)
+                return
+            downloads[emoji_obj.id] = image_bytes
+
+        items = [cached[emoji_obj.id] or downloads[emoji_obj.id] for emoji_obj in processed_emojis]
+        upload_limit = interaction.guild.filesize_limit if interaction.guild else DEFAULT_UPLOAD_LIMIT
+        try:
+            image_bytes, extension, new_tiles = await self.bot.image_service.run(
+                combine_tiles, items, EMOJI_TILE_HEIGHT, EMOJI_TILE_PADDING, upload_limit
+            )
+        except ImageJobError as e:
+            await interaction.followup.send(f"Could not combine the emojis: {e}", ephemeral=True)
+            return
+        except asyncio.TimeoutError:
+            await interaction.followup.send("Combining the emojis took too long and was cancelled.", ephemeral=True)
             return
-        target_height = 64
-        resized_images = []
-        total_width = 0
-        padding = 5 
-        for img in images:
-            aspect_ratio = img.width / img.height
-            new_width = int(target_height * aspect_ratio)
-            if new_width == 0: new_width = 1 
-            resized_img = img.resize((new_width, target_height), Image.Resampling.LANCZOS)
-            resized_images.append(resized_img)
-            total_width += new_width
-        total_width += padding * (len(resized_images) - 1)
-        if total_width <= 0: total_width = target_height 
-        combined_image = Image.new("RGBA", (total_width, target_height), (0, 0, 0, 0))
-        current_x = 0
-        for img in resized_images:
-            combined_image.paste(img, (current_x, 0), img) 
-            current_x += img.width + padding
-        output_buffer = BytesIO()
-        combined_image.save(output_buffer, format="PNG") 
-        output_buffer.seek(0)
-        discord_file = discord.File(fp=output_buffer, filename="combined_emojis.png")
+        for emoji_obj, tile in zip(processed_emojis, new_tiles):
+            if tile is not None:
+                self.emoji_tiles.put(emoji_obj.id, tile)
+        discord_file = discord.File(fp=BytesIO(image_bytes), filename=f"combined_emojis.{extension}")
         await interaction.followup.send("Here are your combined emojis:", file=discord_file)
 
+    async def _download_emoji(self, session: aiohttp.ClientSession, emoji_obj: discord.Emoji) -> tuple[int, bytes | None]:
+        async with session.get(str(emoji_obj.url), timeout=self.bot.http_service.timeout("emoji")) as resp:
+            if resp.status != 200:
+                return resp.status, None
+            return resp.status, await resp.read()
+
     # --- Weather Command ---
+    async def _fetch_weather_png(self, location: str) -> bytes | None:
+        session = await self._get_session()
+        url = f"{WEATHER_BASE_URL}/{urllib.parse.quote_plus(location)}_0pq_transparency=200.png"
+        async with session.get(url, timeout=self.bot.http_service.timeout("weather")) as resp:
+            if resp.status != 200:
+                print(f"wttr.in PNG request for '{location}' failed with status: {resp.status}")
+                return None
+            if not resp.content_type or not resp.content_type.startswith('image/'):
+                print(f"wttr.in PNG request for '{location}' returned non-image content type: {resp.content_type}")
+                return None
+            return await resp.read()
+
+    async def _fetch_weather_text(self, location: str) -> str | None:
+        session = await self._get_session()
+        url = f"{WEATHER_BASE_URL}/{urllib.parse.quote_plus(location)}?format=3"
+        async with session.get(url, timeout=self.bot.http_service.timeout("weather")) as resp:
+            if resp.status != 200:
+                print(f"wttr.in text request for '{location}' failed with status: {resp.status}")
+                return None
+            weather_data = await resp.text()
+            if "Unknown location" in weather_data or "Sorry, we are run out of queries" in weather_data:
+                return None
+            return weather_data
+
+    async def _fetch_and_cache(self, key: str, kind: str, fetch: typing.Awaitable) -> tuple[str, typing.Any]:
+        try:
+            payload = await fetch
+        except Exception as e:
+            print(f"Error fetching weather ({kind}) for '{key}': {e}")
+            return kind, None
+        if payload is not None:
+            self.weather_cache.put(key, kind, payload)
+        return kind, payload
+
+    async def _fetch_weather(self, key: str, location: str) -> tuple[str, typing.Any] | None:
+        """
+        Requests the image and text reports concurrently and returns the first useful one,
+        giving the image a short grace period if the text arrives first. Both are cached
+        as they arrive, including any that finishes after a winner was returned.
+        """
+        tasks = {
+            asyncio.create_task(self._fetch_and_cache(key, "png", self._fetch_weather_png(location))),
+            asyncio.create_task(self._fetch_and_cache(key, "text", self._fetch_weather_text(location))),
+        }
+        for task in tasks:
+            self._weather_fetches.add(task)
+            task.add_done_callback(self._weather_fetches.discard)
+        winner = None
+        pending = tasks
+        while pending and (winner is None or winner[0] != "png"):
+            timeout = WEATHER_IMAGE_GRACE if winner is not None else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                kind, payload = task.result()
+                if payload is not None and (winner is None or kind == "png"):
+                    winner = (kind, payload)
+        return winner
+
+    def _refresh_weather(self, key: str, location: str) -> asyncio.Task:
+        task = self._weather_inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_weather(key, location))
+            self._weather_inflight[key] = task
+            task.add_done_callback(lambda _: self._weather_inflight.pop(key, None))
+        return task
+
+    async def _get_weather_report(self, location: str) -> tuple[str, typing.Any] | None:
+        key = self.weather_cache.make_key(location)
+        cached = self.weather_cache.get(key)
+        if cached is not None:
+            kind, payload, fresh = cached
+            if not fresh:
+                self._refresh_weather(key, location) # Answer now from the stale copy; refresh in the background
+            return kind, payload
+        # Shielded so one caller giving up doesn't cancel a fetch other callers are waiting on.
+        return await asyncio.shield(self._refresh_weather(key, location))
+
     @utility_commands_group.command(name="weather", description="Gets the weather for a location (using wttr.in).")
     @app_commands.describe(location="The city or location to get weather for (e.g., London or New York).")
     async def get_weather(self, interaction: discord.Interaction, location: str):
         await interaction.response.defer(thinking=True)
-        session = await self._get_session()
-        encoded_location = urllib.parse.quote_plus(location)
-        weather_url_png = f"https://wttr.in/{encoded_location}_0pq_transparency=200.png"
-        weather_url_text = f"https://wttr.in/{encoded_location}?format=3"
         try:
-            async with session.get(weather_url_png) as resp:
-                if resp.status == 200:
-                    if resp.content_type and resp.content_type.startswith('image/'):
-                        image_bytes = await resp.read()
-                        discord_file = discord.File(BytesIO(image_bytes), filename=f"{encoded_location}_weather.png")
-                        await interaction.followup.send(f"Weather for **{location}**:", file=discord_file)
-                        return
-                    else: 
-                        print(f"wttr.in PNG request for '{location}' returned non-image content type: {resp.content_type}")
-                else:
-                    print(f"wttr.in PNG request for '{location}' failed with status: {resp.status}")
-            async with session.get(weather_url_text) as resp_text:
-                if resp_text.status == 200:
-                    weather_data = await resp_text.text()
-                    if "Unknown location" in weather_data or "Sorry, we are run out of queries" in weather_data:
-                         await interaction.followup.send(f"Could not find weather information for **{location}**, or the service is temporarily unavailable.", ephemeral=True)
-                    else:
-                        embed = discord.Embed(title=f"Weather for {location}", description=f"```\n{weather_data}\n```", color=discord.Color.blue())
-                        await interaction.followup.send(embed=embed)
-                else:
-                    await interaction.followup.send(f"Failed to retrieve weather information for **{location}** using text fallback (Status: {resp_text.status}).", ephemeral=True)
-        except aiohttp.ClientConnectorError:
-            await interaction.followup.send("Could not connect to the weather service. Please try again later.", ephemeral=True)
+            report = await self._get_weather_report(location)
         except Exception as e:
             print(f"Error in get_weather: {e}")
             await interaction.followup.send(f"An unexpected error occurred while fetching weather: {e}", ephemeral=True)
+            return
+        if report is None:
+            await interaction.followup.send(f"Could not find weather information for **{location}**, or the service is temporarily unavailable.", ephemeral=True)
+            return
+        kind, payload = report
+        if kind == "png":
+            discord_file = discord.File(BytesIO(payload), filename=f"{urllib.parse.quote_plus(location)}_weather.png")
+            await interaction.followup.send(f"Weather for **{location}**:", file=discord_file)
+        else:
+            embed = discord.Embed(title=f"Weather for {location}", description=f"```\n{payload}\n```", color=discord.Color.blue())
+            await interaction.followup.send(embed=embed)
 
     # --- Start Activity Command ---
     @utility_commands_group.command(name="startactivity", description="Starts a Discord activity in a voice channel.")
@@ -5,6 +5,9 @@ import pomice
 import os
 from dotenv import load_dotenv 
 import asyncio
+from cogs._http import HTTPService
+from cogs._imaging import ImageService
+from cogs._lavalink import LavalinkPool, load_node_configs
 
 
 load_dotenv() 
@@ -13,40 +16,42 @@ BOT_TOKEN = os.environ.get("DISCORD_TOKEN")
 COGS_DIR = "cogs"
 BOT_OWNER_ID = 895722260726440007
 
-intents = discord.Intents.default()
-intents.guilds = True
-intents.members = True
-
-bot = commands.Bot(
-    command_prefix=commands.when_mentioned_or("!"),
-    intents=intents,
-    activity=discord.CustomActivity(name='hello?'),
-    owner_id=BOT_OWNER_ID,
-)
-
-async def init_lavalink_node():
-    await bot.wait_until_ready()  # Wait until the bot is ready
-    if not hasattr(bot, "pomice"):
-        bot.pomice = await pomice.NodePool().create_node(
-            bot=bot,
-            host="lavalinkv3.devxcode.in",
-            port=443,
-            password="DevamOP",
-            identifier="MAIN",
-            secure=True,
-        )
-        print("[init_lavalink_node] Lavalink node initialized.")
-
-@bot.event
-async def on_ready():
-    print(f'Logged in as {bot.user} (ID: {bot.user.id})')
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} slash commands")
-    except Exception as e:
-        print(f"Failed to sync slash commands: {e}")
+def create_bot() -> commands.Bot:
+    intents = discord.Intents.default()
+    intents.guilds = True
+    intents.members = True
+
+    bot = commands.Bot(
+        command_prefix=commands.when_mentioned_or("!"),
+        intents=intents,
+        activity=discord.CustomActivity(name='hello?'),
+        owner_id=BOT_OWNER_ID,
+    )
+
+    @bot.event
+    async def setup_hook():
+        # Runs after login, so bot.user is known. The node tasks start here, but pomice
+        # only opens the Lavalink websockets once the gateway is ready.
+        init_lavalink_node(bot)
+
+    @bot.event
+    async def on_ready():
+        print(f'Logged in as {bot.user} (ID: {bot.user.id})')
+        try:
+            synced = await bot.tree.sync()
+            print(f"Synced {len(synced)} slash commands")
+        except Exception as e:
+            print(f"Failed to sync slash commands: {e}")
+
+    return bot
+
+def init_lavalink_node(bot: commands.Bot):
+    # Nodes come from LAVALINK_NODES (JSON list); see cogs/_lavalink.py for the format.
+    # Connecting happens in the background; music commands wait on bot.pomice.wait_ready().
+    bot.pomice.start(load_node_configs())
+    print("[init_lavalink_node] Lavalink node connection started.")
 
-async def load_cogs():
+async def load_cogs(bot: commands.Bot):
     if not os.path.exists(COGS_DIR):
         os.makedirs(COGS_DIR)
         print(f"Created directory {COGS_DIR}")
@@ -62,15 +67,25 @@ async def load_cogs():
                 print(f"Failed to load cog {cog_name}: {e}")
 
 async def main():
+    # Built here rather than at import time: image workers are spawned processes that
+    # re-import this module, and they must not construct a second bot.
+    bot = create_bot()
     async with bot:
-        # Load cogs first
-        await load_cogs()
+        # Shared HTTP session for all cogs; it outlives cog reloads and is closed on shutdown.
+        bot.http_service = HTTPService()
+        await bot.http_service.start()
+        # Worker pool for Pillow jobs, so image commands don't stall the event loop.
+        bot.image_service = ImageService()
+        await bot.image_service.start()
+        bot.pomice = LavalinkPool(bot)
 
-        # Start lavalink node initialization task without awaiting here
-        bot.loop.create_task(init_lavalink_node())
+        # Load cogs first
+        await load_cogs(bot)
 
         if BOT_TOKEN == "YOUR_BOT_TOKEN":
             print("ERROR: Replace BOT_TOKEN with your actual token.")
+            await bot.image_service.close()
+            await bot.http_service.close()
             return
 
         try:
@@ -79,6 +94,10 @@ async def main():
             print("Login failed: Invalid token.")
         except Exception as e:
             print(f"Bot error: {e}")
+        finally:
+            await bot.pomice.close()
+            await bot.image_service.close()
+            await bot.http_service.close()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,124 @@
+# tools/ai_stream_stub.py
+# Local stand-in for the AI endpoint that streams its reply slowly, for checking the
+# /ask streaming path without the real upstream.
+#   python tools/ai_stream_stub.py serve [--port 8089]   then set AI_API_URLS=http://127.0.0.1:8089/
+#   python tools/ai_stream_stub.py check                 relays one stream through AICog._stream_response
+#                                                        with a fake interaction and checks the edit batching
+# The SSE reply splits a multi-byte character across chunks and ends its last event
+# without the closing blank line, as some servers do.
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AI_HISTORY_DB", ":memory:")
+
+WORDS = [f"word{i} " for i in range(60)] + ["café ", "done."]
+PIECE_DELAY = 0.08 # Seconds between streamed pieces; about 5 s for the whole reply
+
+async def stream_reply(request: web.Request) -> web.StreamResponse:
+    await request.read()
+    as_text = request.query.get("format") == "text"
+    response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8" if as_text else "text/event-stream"})
+    await response.prepare(request)
+    for index, word in enumerate(WORDS):
+        await asyncio.sleep(PIECE_DELAY)
+        if as_text:
+            payload = word.encode("utf-8")
+        else:
+            payload = f"data: {word}".encode("utf-8") + (b"" if index == len(WORDS) - 1 else b"\n\n")
+        if "é" in word:
+            # Cut inside the two-byte "é" so the decoder has to carry it over.
+            cut = payload.index("é".encode("utf-8")) + 1
+            await response.write(payload[:cut])
+            await asyncio.sleep(PIECE_DELAY)
+            payload = payload[cut:]
+        await response.write(payload)
+    await response.write_eof()
+    return response
+
+def make_app() -> web.Application:
+    app = web.Application()
+    app.router.add_post("/", stream_reply)
+    return app
+
+class FakeMessage:
+    def __init__(self, log: list):
+        self.log = log
+
+    async def edit(self, **kwargs):
+        self.log.append((time.monotonic(), "edit", kwargs.get("content")))
+        return self
+
+class FakeFollowup:
+    def __init__(self, log: list):
+        self.log = log
+
+    async def send(self, content=None, **kwargs):
+        self.log.append((time.monotonic(), "send", content))
+        return FakeMessage(self.log)
+
+class FakeInteraction:
+    def __init__(self):
+        self.log: list[tuple[float, str, str | None]] = []
+        self.followup = FakeFollowup(self.log)
+        self.user = type("User", (), {"id": 1})()
+
+async def check_stream(session: aiohttp.ClientSession, url: str, label: str) -> list[str]:
+    from cogs.ai_cog import AI_EMOJI, STREAM_EDIT_INTERVAL, AICog
+
+    interaction = FakeInteraction()
+    started = time.monotonic()
+    async with session.post(url, json={"messages": []}) as response:
+        text = await AICog._stream_response(AICog.__new__(AICog), interaction, response)
+    elapsed = time.monotonic() - started
+
+    problems = []
+    expected = "".join(WORDS)
+    if text != expected:
+        problems.append(f"{label}: relayed text differs (ends with {text[-20:]!r})")
+    if not interaction.log[-1][2].startswith(AI_EMOJI + expected[:50]) or "▌" in interaction.log[-1][2]:
+        problems.append(f"{label}: final edit is not the finished reply")
+    edits = [at for at, kind, _ in interaction.log[1:-1] if kind == "edit"]
+    gaps = [later - earlier for earlier, later in zip([interaction.log[0][0]] + edits, edits)]
+    if any(gap < STREAM_EDIT_INTERVAL - 0.05 for gap in gaps):
+        problems.append(f"{label}: edits closer together than {STREAM_EDIT_INTERVAL}s")
+    if len(edits) > elapsed / STREAM_EDIT_INTERVAL + 1:
+        problems.append(f"{label}: {len(edits)} edits in {elapsed:.1f}s")
+    print(f"{label:<6} {len(WORDS)} pieces in {elapsed:.1f}s -> 1 followup, {len(edits)} progress edits, "
+          f"min gap {min(gaps, default=0):.2f}s, final length {len(text or '')}")
+    return problems
+
+async def check():
+    runner = web.AppRunner(make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    problems = []
+    async with aiohttp.ClientSession() as session:
+        problems += await check_stream(session, f"http://127.0.0.1:{port}/", "sse")
+        problems += await check_stream(session, f"http://127.0.0.1:{port}/?format=text", "text")
+    await runner.cleanup()
+    if problems:
+        print("FAILED:\n  " + "\n  ".join(problems))
+        sys.exit(1)
+    print("Streaming checks passed.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Slow-streaming stand-in for the AI endpoint.")
+    parser.add_argument("mode", choices=("serve", "check"))
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+    if args.mode == "serve":
+        web.run_app(make_app(), host="127.0.0.1", port=args.port)
+    else:
+        asyncio.run(check())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# tools/check_ai_upstream.py
+# Offline check of the AI cog's UpstreamClient against local stub endpoints.
+# Run from the repository root: python tools/check_ai_upstream.py
+# Each scenario counts how many requests the stubs actually received, so a retry or
+# hedge that would repeat a POST the upstream may have processed shows up as a failure.
+import asyncio
+import os
+import socket
+import sys
+import time
+from collections import Counter
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("AI_HISTORY_DB", ":memory:")
+
+from cogs import ai_cog
+from cogs._http import HTTPService
+
+received: Counter = Counter()
+
+async def handle(request: web.Request) -> web.Response:
+    name = request.match_info["name"]
+    received[name] += 1
+    await request.read()
+    if name == "ok":
+        return web.Response(text="hello")
+    if name == "slow":
+        await asyncio.sleep(0.5) # Request already sent; the reply is just slow
+        return web.Response(text="slow hello")
+    if name == "overloaded":
+        return web.Response(status=429)
+    if name == "broken":
+        return web.Response(status=503)
+    return web.Response(status=404)
+
+async def stalled_handshake(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # Accepts TCP but never answers the TLS handshake, so the client is stuck connecting.
+    received["stalled"] += 1
+    await reader.read()
+    writer.close()
+
+def closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def run_scenario(http: HTTPService, name: str, urls: list[str], prefer: str | None = None, prepare=None):
+    """
+    Posts once through a fresh client. `prefer` makes that URL the near-certain first pick;
+    `prepare(endpoint)` can seed each endpoint's statistics first.
+    """
+    received.clear()
+    client = ai_cog.UpstreamClient(http.session, urls)
+    for endpoint in client.endpoints:
+        endpoint.ewma = 0.001 if endpoint.url == prefer else 100.0
+        if prepare is not None:
+            prepare(endpoint)
+    outcome = None
+    started = time.monotonic()
+    try:
+        async with client.post(json={"messages": []}) as response:
+            outcome = response.status
+    except Exception as e:
+        outcome = type(e).__name__
+    client.elapsed = time.monotonic() - started
+    print(f"{name:<44} -> {str(outcome):<24} received={dict(received)} retries={client.retries} hedges={client.hedges} "
+          f"({client.elapsed:.2f}s)")
+    return outcome, dict(received), client
+
+async def main():
+    ai_cog.AI_RETRY_BASE_DELAY = 0.01
+    ai_cog.AI_HEDGE_DELAY = 0.2
+
+    app = web.Application()
+    app.router.add_post("/{name}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    stall_server = await asyncio.start_server(stalled_handshake, "127.0.0.1", 0)
+    stall_port = stall_server.sockets[0].getsockname()[1]
+
+    base = f"http://127.0.0.1:{port}"
+    refused = f"http://127.0.0.1:{closed_port()}/"
+    stalled = f"https://127.0.0.1:{stall_port}/"
+
+    http = HTTPService()
+    await http.start()
+    failures = []
+
+    def check(label: str, condition: bool):
+        if not condition:
+            failures.append(label)
+
+    outcome, counts, client = await run_scenario(http, "refused connection fails over", [refused, f"{base}/ok"], prefer=refused)
+    check("refused: reply", outcome == 200)
+    check("refused: sent once", counts == {"ok": 1})
+    check("refused: the new connection's connect time was recorded", len(client.endpoints[1].connect_times) == 1)
+
+    outcome, counts, client = await run_scenario(http, "429 is retried on another endpoint", [f"{base}/overloaded", f"{base}/ok"], prefer=f"{base}/overloaded")
+    check("429: reply", outcome == 200)
+    check("429: retried", counts == {"overloaded": 1, "ok": 1})
+
+    outcome, counts, client = await run_scenario(http, "503 after sending is not repeated", [f"{base}/broken", f"{base}/ok"], prefer=f"{base}/broken")
+    check("503: passed through", outcome == 503)
+    check("503: sent once", counts == {"broken": 1})
+
+    outcome, counts, client = await run_scenario(http, "slow reply after sending is not hedged", [f"{base}/slow", f"{base}/ok"], prefer=f"{base}/slow")
+    check("slow: reply", outcome == 200)
+    check("slow: no hedge", client.hedges == 0 and counts == {"slow": 1})
+
+    outcome, counts, client = await run_scenario(http, "stalled connect is hedged", [stalled, f"{base}/ok"], prefer=stalled)
+    check("stalled: reply", outcome == 200)
+    check("stalled: hedge won", client.hedges == 1 and client.hedge_wins == 1 and counts.get("ok") == 1)
+
+    def slow_replies_fast_connects(endpoint: ai_cog.Endpoint):
+        endpoint.latencies.extend([2.0] * 20)
+        endpoint.connect_times.extend([0.02] * 20)
+
+    ai_cog.AI_HEDGE_DELAY = 10.0
+    outcome, counts, client = await run_scenario(http, "stalled connect hedged at the connect p95", [stalled, f"{base}/ok"],
+                                                 prefer=stalled, prepare=slow_replies_fast_connects)
+    check("connect p95: reply", outcome == 200)
+    check("connect p95: hedged without waiting out the 2 s reply p95", client.hedges == 1 and client.elapsed < 0.5)
+    ai_cog.AI_HEDGE_DELAY = 0.2
+
+    outcome, counts, client = await run_scenario(http, "every endpoint refusing raises", [refused])
+    check("all refused: error", outcome == "ClientConnectorError")
+
+    await http.close()
+    stall_server.close()
+    await runner.cleanup()
+
+    if failures:
+        print("FAILED:", ", ".join(failures))
+        sys.exit(1)
+    print("All upstream scenarios passed.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+# tools/emoji_benchmark.py
+# Time and memory of combining three 60-frame animated emojis with combine_tiles.
+# Run from the repository root: python tools/emoji_benchmark.py [--size 128] [--frames 60]
+# The inputs are generated GIFs with transparency and different frame delays, so the output
+# timeline has many change points. Each case runs in a fresh process that decodes the inputs
+# into tiles and then encodes them; its peak resident memory is reported above that of a
+# process that only decodes, since Pillow's pixel buffers are invisible to tracemalloc.
+# "GIF, frames as a list" composites every frame up front, for comparison with the generator
+# _encode_animation hands to the GIF writer.
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs import _imaging
+
+FRAME_DELAYS = (40, 60, 90) # ms per frame for each of the three inputs
+DECODE_ONLY = "decode only (reference)"
+
+def make_emoji(size: int, frames: int, delay: int, seed: int) -> bytes:
+    images = []
+    for index in range(frames):
+        img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        angle = index * 360 / frames
+        draw.pieslice((4, 4, size - 4, size - 4), angle, angle + 270,
+                      fill=((seed * 80 + index * 4) % 256, (index * 9) % 256, 200, 255))
+        draw.ellipse((size // 3, size // 3, size * 2 // 3, size * 2 // 3), fill=(255, 255, 255, 255 - index * 2))
+        images.append(img)
+    output = BytesIO()
+    images[0].save(output, format="GIF", save_all=True, append_images=images[1:], duration=delay, loop=0, disposal=2)
+    return output.getvalue()
+
+def peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def gif_from_list(tiles, timeline, target_height: int, padding: int) -> bytes:
+    frames = [_imaging._composite(tiles, indices, target_height, padding) for indices, _ in timeline]
+    output = BytesIO()
+    frames[0].save(output, format="GIF", save_all=True, append_images=frames[1:],
+                   duration=[duration for _, duration in timeline], loop=0, disposal=2, optimize=True)
+    return output.getvalue()
+
+def run_case(case: str, emojis: list[bytes], limit: int, results):
+    tiles = [_imaging.make_tile(data) for data in emojis]
+    timeline = _imaging._frame_timeline(tiles)
+    started = time.perf_counter()
+    output, extension = b"", "-"
+    if case == "GIF, frames as a list":
+        output, extension = gif_from_list(tiles, timeline, 64, 5), "gif"
+    elif case != DECODE_ONLY:
+        output, extension, _ = _imaging.combine_tiles(tiles, max_bytes=limit)
+    results.put((case, time.perf_counter() - started, peak_rss_kb() / 1024, len(output), extension, len(timeline)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Animated emoji combine benchmark.")
+    parser.add_argument("--size", type=int, default=128, help="Side of each input emoji in pixels.")
+    parser.add_argument("--frames", type=int, default=60)
+    args = parser.parse_args()
+
+    emojis = [make_emoji(args.size, args.frames, delay, seed) for seed, delay in enumerate(FRAME_DELAYS)]
+    started = time.perf_counter()
+    tiles = [_imaging.make_tile(data) for data in emojis]
+    decode_time = time.perf_counter() - started
+    gif_size = len(_imaging.combine_tiles(tiles)[0])
+    print(f"3 x {args.frames}-frame {args.size}px GIFs ({', '.join(f'{d} ms' for d in FRAME_DELAYS)} per frame), "
+          f"{sum(map(len, emojis)) / 1024:.0f} KB in, decoded to {sum(map(_imaging.tile_size, tiles)) / 2**20:.1f} MB "
+          f"of tiles in {decode_time:.2f}s:")
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    reference = None
+    cases = ((DECODE_ONLY, _imaging.DEFAULT_UPLOAD_LIMIT), ("GIF, frames as a list", _imaging.DEFAULT_UPLOAD_LIMIT),
+             ("combine_tiles, GIF", _imaging.DEFAULT_UPLOAD_LIMIT), ("combine_tiles, WebP fallback", gif_size - 1))
+    for case, limit in cases:
+        process = context.Process(target=run_case, args=(case, emojis, limit, results))
+        process.start()
+        name, elapsed, peak_mb, size, extension, frames = results.get()
+        process.join()
+        if reference is None:
+            reference = peak_mb
+            print(f"  {name:<30} peak RSS {peak_mb:5.1f} MB")
+            continue
+        print(f"  {name:<30} {elapsed:5.2f}s  peak RSS +{peak_mb - reference:4.1f} MB  -> "
+              f"{size / 1024:4.0f} KB {extension}, {frames} frames")
+
+if __name__ == "__main__":
+    main()
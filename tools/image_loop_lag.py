@@ -0,0 +1,124 @@
+# tools/image_loop_lag.py
+# Event-loop lag during a burst of large image conversions, before and after ImageService.
+# Run from the repository root: python tools/image_loop_lag.py [--jobs 8] [--side 3000]
+# "Before" runs convert_image inline on the event loop, as /util convert and combineemojis
+# did before the image service existed; "after" runs the same jobs through ImageService
+# with worker processes and with the thread fallback. A ticker task asks to wake every
+# 10 ms and records how late it actually wakes, which is what heartbeats and every other
+# command wait for. A last run kills four worker processes mid-burst and checks that every
+# job still finishes on the thread fallback.
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs import _imaging
+
+TICK = 0.01
+
+def make_source(directory: str, side: int) -> str:
+    path = os.path.join(directory, "source.png")
+    # Noise keeps the encoders honest; a flat image compresses to nothing.
+    Image.effect_noise((side, side), 64).convert("RGB").save(path)
+    return path
+
+async def measure_lag(burst) -> tuple[float, list[float]]:
+    """Runs `burst()` while a ticker records how late each 10 ms wake-up is, in ms."""
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + TICK
+            await asyncio.sleep(TICK)
+            lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0.1) # Let the ticker settle
+    started = time.perf_counter()
+    await burst()
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticking
+    return elapsed, lags
+
+def report(label: str, elapsed: float, lags: list[float]):
+    ordered = sorted(lags)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"  {label:<32} {elapsed:6.2f}s  lag p50 {statistics.median(lags):7.1f} ms  p99 {p99:7.1f} ms  "
+          f"max {max(lags):7.1f} ms  ({len(lags)} ticks)")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag during image conversions.")
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--side", type=int, default=3000, help="Side of the square source PNG in pixels.")
+    parser.add_argument("--format", default="gif", choices=_imaging.CONVERT_FORMATS)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = make_source(directory, args.side)
+        print(f"{args.jobs} conversions of a {args.side}x{args.side} PNG "
+              f"({os.path.getsize(path) / 2**20:.1f} MB) to {args.format}:")
+
+        async def inline_burst():
+            for _ in range(args.jobs):
+                _imaging.convert_image(path, args.format)
+                await asyncio.sleep(0) # Commands would get a turn between jobs, no more
+
+        report("before: on the event loop", *await measure_lag(inline_burst))
+
+        for mode in ("processes", "threads"):
+            service = _imaging.ImageService(max_queued=args.jobs)
+            if mode == "processes":
+                await service.start()
+            else:
+                service._use_threads()
+
+            async def service_burst():
+                await asyncio.gather(*(service.run(_imaging.convert_image, path, args.format, timeout=300)
+                                       for _ in range(args.jobs)))
+
+            report(f"after: ImageService, {service.mode}", *await measure_lag(service_burst))
+            await service.close()
+
+        # Several workers, so several jobs hit the broken pool at once whatever the CPU count.
+        service = _imaging.ImageService(workers=4, max_queued=args.jobs)
+        await service.start()
+        fallback_pools = []
+        use_threads = service._use_threads
+        def tracked_use_threads():
+            use_threads()
+            fallback_pools.append(service._executor)
+        service._use_threads = tracked_use_threads
+
+        jobs = [asyncio.ensure_future(service.run(_imaging.convert_image, path, args.format, timeout=300))
+                for _ in range(args.jobs)]
+        await asyncio.sleep(0.5)
+        for process in list(service._executor._processes.values()):
+            process.kill()
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        await service.close()
+        failures = []
+
+        def check(label: str, condition: bool):
+            print(f"{'ok  ' if condition else 'FAIL'} {label}")
+            if not condition:
+                failures.append(label)
+
+        failed = [result for result in results if isinstance(result, BaseException)]
+        check(f"workers killed mid-burst: {len(results) - len(failed)}/{len(results)} jobs finished", not failed)
+        pools = len({id(pool) for pool in fallback_pools})
+        check(f"{len(fallback_pools)} jobs hit the broken pool and all moved to one thread pool ({pools})", pools == 1)
+        if failures:
+            print("FAILED:", ", ".join(failures))
+            sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
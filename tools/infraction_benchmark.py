@@ -0,0 +1,111 @@
+# tools/infraction_benchmark.py
+# Insert throughput and /mod history lookup latency of the moderation InfractionStore.
+# Run from the repository root: python tools/infraction_benchmark.py [--rows N] [--lookups N]
+# Rows go through record() and the batched writer task, the way commands log them, into a
+# fresh WAL database in a temporary directory. For comparison, a smaller run commits one row
+# per transaction, as a store without batching would. Lookups time history pages for random
+# members and every page of one repeat offender's long history, following the cursors.
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs import moderation
+
+GUILDS = 20
+MEMBERS_PER_GUILD = 2000
+OFFENDER = (1, 42) # (guild_id, user_id) with a long history
+OFFENDER_SHARE = 0.02
+ACTIONS = ("warn", "mute", "kick", "ban", "unmute", "unban")
+
+def make_row(rng: random.Random) -> tuple:
+    if rng.random() < OFFENDER_SHARE:
+        guild_id, user_id = OFFENDER
+    else:
+        guild_id, user_id = rng.randint(1, GUILDS), 1000 + rng.randrange(MEMBERS_PER_GUILD)
+    return guild_id, user_id, 7, rng.choice(ACTIONS), "benchmark"
+
+def percentile(samples: list[float], share: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+async def bench_batched(path: str, rows: int) -> moderation.InfractionStore:
+    store = moderation.InfractionStore(path)
+    store.start()
+    rng = random.Random(42)
+    record_time = 0.0
+    started = time.perf_counter()
+    for index in range(rows):
+        guild_id, user_id, moderator_id, action, reason = make_row(rng)
+        call_started = time.perf_counter()
+        store.record(guild_id, user_id, moderator_id, action, reason)
+        record_time += time.perf_counter() - call_started
+        if index % moderation.INFRACTION_BATCH_SIZE == 0:
+            await asyncio.sleep(0) # Commands arrive between event-loop turns, not in one burst
+    while store.written < rows:
+        await store.flush()
+    elapsed = time.perf_counter() - started
+    print(f"  batched writer:       {rows:>8,} rows in {elapsed:6.2f}s  {rows / elapsed:>9,.0f} rows/s  "
+          f"(record() {record_time / rows * 1e6:.1f} µs per call)")
+    return store
+
+async def bench_unbatched(path: str, rows: int):
+    store = moderation.InfractionStore(path)
+    rng = random.Random(7)
+    started = time.perf_counter()
+    for _ in range(rows):
+        guild_id, user_id, moderator_id, action, reason = make_row(rng)
+        await store._run(store._insert_sync, [(guild_id, user_id, moderator_id, action, reason, None, time.time())])
+    elapsed = time.perf_counter() - started
+    print(f"  one row per commit:   {rows:>8,} rows in {elapsed:6.2f}s  {rows / elapsed:>9,.0f} rows/s")
+    await store.close()
+
+async def bench_lookups(store: moderation.InfractionStore, lookups: int):
+    rng = random.Random(99)
+    first_pages = []
+    for _ in range(lookups):
+        guild_id, user_id = rng.randint(1, GUILDS), 1000 + rng.randrange(MEMBERS_PER_GUILD)
+        started = time.perf_counter()
+        await store.page(guild_id, user_id)
+        first_pages.append((time.perf_counter() - started) * 1000)
+
+    offender_pages = []
+    cursor = None
+    while True:
+        started = time.perf_counter()
+        rows = await store.page(*OFFENDER, cursor=cursor)
+        offender_pages.append((time.perf_counter() - started) * 1000)
+        if len(rows) < moderation.HISTORY_PAGE_SIZE:
+            break
+        cursor = (rows[-1][5], rows[-1][0])
+    history = await store.count(*OFFENDER)
+
+    for label, samples in ((f"first page, {lookups:,} random members", first_pages),
+                           (f"all {len(offender_pages):,} pages of a {history:,}-row history", offender_pages)):
+        print(f"  {label:<42} p50 {statistics.median(samples):6.2f} ms  p99 {percentile(samples, 0.99):6.2f} ms  "
+              f"max {max(samples):6.2f} ms")
+    print(f"  last page of that history vs the first: {offender_pages[-1]:.2f} ms vs {offender_pages[0]:.2f} ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Infraction store benchmark.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--unbatched-rows", type=int, default=5_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print("Inserts:")
+        await bench_unbatched(os.path.join(directory, "unbatched.db"), args.unbatched_rows)
+        store = await bench_batched(os.path.join(directory, "infractions.db"), args.rows)
+        print(f"History lookups ({args.rows:,} rows):")
+        await bench_lookups(store, args.lookups)
+        await store.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,245 @@
+# tools/mock_lavalink.py
+# Mock Lavalink v4 nodes for checking LavalinkPool routing and failover offline.
+# Run from the repository root: python tools/mock_lavalink.py
+# The nodes are real websocket/REST servers that pomice connects to; only the Discord side
+# (bot, guilds, voice channels) is faked. The check starts two nodes with different load,
+# plays a track on the less loaded one, kills it, and expects the player to come back on
+# the other node at about the position it had reached. A third node is down at startup and
+# comes up later; it must connect without leaving a gateway listener behind per failed attempt.
+import asyncio
+import itertools
+import json
+import os
+import socket
+import sys
+import time
+
+import pomice
+from aiohttp import WSMsgType, web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cogs import _lavalink
+
+PLAYER_UPDATE_INTERVAL = 0.5
+TRACK_LENGTH = 180_000
+
+class MockLavalink:
+    """One Lavalink node: GET /version, the v4 websocket, and the session player endpoints."""
+    _session_ids = itertools.count(1)
+
+    def __init__(self, identifier: str, players: int = 0, cpu_load: float = 0.0, port: int = 0):
+        self.identifier = identifier
+        self.stats = {"players": players, "playingPlayers": players, "uptime": 1,
+                      "memory": {"used": 1, "free": 1, "allocated": 2, "reservable": 4},
+                      "cpu": {"cores": 4, "systemLoad": cpu_load, "lavalinkLoad": cpu_load}}
+        self.requests: list[tuple[str, str, dict]] = []
+        self.playing: dict[str, tuple[int, float]] = {} # guild ID -> (start position, wall time it started)
+        self._sockets: set[web.WebSocketResponse] = set()
+        self._runner: web.AppRunner | None = None
+        self.port = port
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/version", self._version)
+        app.router.add_get("/v4/websocket", self._websocket)
+        app.router.add_route("*", "/v4/sessions/{session}/players/{guild}", self._player)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def kill(self):
+        """Drops every websocket and stops listening, like a crashed node."""
+        for ws in list(self._sockets):
+            await ws.close(code=1011, message=b"node crashed")
+        await self._runner.cleanup()
+
+    @property
+    def config(self) -> dict:
+        return {"identifier": self.identifier, "host": "127.0.0.1", "port": self.port, "password": "mock", "secure": False}
+
+    async def _version(self, request: web.Request) -> web.Response:
+        return web.Response(text="4.0.0")
+
+    async def _websocket(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sockets.add(ws)
+        await ws.send_str(json.dumps({"op": "ready", "resumed": False, "sessionId": f"session-{next(self._session_ids)}"}))
+        await ws.send_str(json.dumps({"op": "stats", **self.stats}))
+        updates = asyncio.create_task(self._send_player_updates(ws))
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            updates.cancel()
+            self._sockets.discard(ws)
+        return ws
+
+    async def _send_player_updates(self, ws: web.WebSocketResponse):
+        while True:
+            await asyncio.sleep(PLAYER_UPDATE_INTERVAL)
+            now = time.time()
+            for guild_id, (start, started_at) in self.playing.items():
+                position = start + int((now - started_at) * 1000)
+                await ws.send_str(json.dumps({"op": "playerUpdate", "guildId": guild_id,
+                                              "state": {"time": int(now * 1000), "position": position, "connected": True}}))
+
+    async def _player(self, request: web.Request) -> web.Response:
+        guild_id = request.match_info["guild"]
+        data = await request.json() if request.can_read_body else {}
+        self.requests.append((request.method, guild_id, data))
+        if request.method == "DELETE":
+            self.playing.pop(guild_id, None)
+            return web.Response(status=204)
+        if "encodedTrack" in data:
+            self.playing[guild_id] = (int(data.get("position") or 0), time.time())
+        return web.json_response({"guildId": guild_id})
+
+class FakeUser:
+    id = 1234
+
+class FakeConnectionState:
+    """The part of discord.py's state that VoiceProtocol.cleanup() touches."""
+    def __init__(self, bot: "FakeBot"):
+        self.bot = bot
+
+    def _remove_voice_client(self, guild_id: int):
+        self.bot.guilds[guild_id].voice_client = None
+
+class FakeBot:
+    def __init__(self):
+        self.user = FakeUser()
+        self.guilds: dict[int, "FakeGuild"] = {}
+        self.listeners: list = []
+        self._connection = FakeConnectionState(self)
+
+    async def wait_until_ready(self):
+        pass
+
+    def add_listener(self, func, name):
+        self.listeners.append(func)
+
+    def remove_listener(self, func, name):
+        self.listeners.remove(func)
+
+    def get_guild(self, guild_id: int):
+        return self.guilds.get(guild_id)
+
+class FakeGuild:
+    def __init__(self, bot: FakeBot, guild_id: int):
+        self.id = guild_id
+        self.voice_client = None
+        self.channels: dict[int, "FakeVoiceChannel"] = {}
+        bot.guilds[guild_id] = self
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    async def change_voice_state(self, *, channel, self_deaf: bool = False, self_mute: bool = False):
+        pass
+
+class FakeVoiceChannel:
+    def __init__(self, bot: FakeBot, guild: FakeGuild, channel_id: int):
+        self.bot = bot
+        self.guild = guild
+        self.id = channel_id
+        self.members = []
+        guild.channels[channel_id] = self
+
+    def _get_voice_client_key(self):
+        return self.guild.id, "guild_id"
+
+    async def connect(self, *, cls, timeout: float = 60.0, reconnect: bool = True, self_deaf: bool = False):
+        player = cls(self.bot, self)
+        await player.connect(timeout=timeout, reconnect=reconnect, self_deaf=self_deaf)
+        self.guild.voice_client = player
+        return player
+
+def make_track() -> pomice.Track:
+    return pomice.Track(track_id="mock-track", track_type=pomice.TrackType.YOUTUBE,
+                        info={"title": "Mock Track", "author": "Mock", "length": TRACK_LENGTH, "identifier": "mock",
+                              "uri": "https://example.invalid/mock", "isSeekable": True})
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def main():
+    _lavalink.HEALTH_CHECK_INTERVAL = 0.5
+    busy = MockLavalink("MOCK-BUSY", players=40, cpu_load=0.9)
+    idle = MockLavalink("MOCK-IDLE", players=1, cpu_load=0.05)
+    late = MockLavalink("MOCK-LATE", players=80, cpu_load=0.95, port=free_port())
+    await busy.start()
+    await idle.start()
+
+    bot = FakeBot()
+    pool = _lavalink.LavalinkPool(bot)
+    pool.start([busy.config, idle.config, late.config])
+    failures = []
+
+    def check(label: str, condition: bool):
+        print(f"{'ok  ' if condition else 'FAIL'} {label}")
+        if not condition:
+            failures.append(label)
+
+    check("a node is ready", await pool.wait_ready(timeout=5))
+    await asyncio.sleep(0.5) # Let the second node and both stats payloads arrive
+    check("both running nodes connected", sum(node.is_connected for node in pool.nodes) == 2)
+    check("new players go to the less loaded node", pool.node_names[pool.best_node()] == "MOCK-IDLE")
+
+    guild = FakeGuild(bot, 100)
+    channel = FakeVoiceChannel(bot, guild, 200)
+    player = await pool.connect(channel)
+    await player.play(make_track())
+    # A second guild that leaves voice on its own must not be brought back.
+    other_guild = FakeGuild(bot, 101)
+    other_player = await pool.connect(FakeVoiceChannel(bot, other_guild, 201))
+    await asyncio.sleep(1.0)
+    await other_player.destroy()
+
+    await asyncio.sleep(1.0)
+    position_at_kill = player.position
+    killed_at = time.monotonic()
+    await idle.kill()
+
+    moved = None
+    while time.monotonic() - killed_at < 5:
+        await asyncio.sleep(0.1)
+        moved = pool.get_player(guild.id)
+        if moved is not None and pool.node_names[moved.node] == "MOCK-BUSY":
+            break
+    took = time.monotonic() - killed_at
+    check(f"player moved to the surviving node ({took:.1f}s)", moved is not None and pool.node_names[moved.node] == "MOCK-BUSY")
+    resumes = [data for method, guild_id, data in busy.requests if guild_id == str(guild.id) and "encodedTrack" in data]
+    resumed_at = int(resumes[0]["position"]) if resumes else None
+    check(f"playback resumed near {position_at_kill:.0f} ms (at {resumed_at} ms)",
+          resumed_at is not None and abs(resumed_at - position_at_kill) <= 1000 * _lavalink.HEALTH_CHECK_INTERVAL + 500)
+    check("a player that left voice is not brought back", pool.get_player(other_guild.id) is None)
+    check("one migration counted", pool.migrations == 1)
+
+    await late.start()
+    started = time.monotonic()
+    while time.monotonic() - started < 10 and "MOCK-LATE" not in pool.node_names.values():
+        await asyncio.sleep(0.1)
+    check(f"a node that was down at startup connects once it is up ({time.monotonic() - started:.1f}s)",
+          "MOCK-LATE" in pool.node_names.values())
+    check(f"one gateway listener per node after retries ({len(bot.listeners)})", len(bot.listeners) == 3)
+
+    await pool.close()
+    await busy.kill()
+    await late.kill()
+    for node in pool.nodes:
+        if node._session is not None:
+            await node._session.close()
+    if failures:
+        print("FAILED:", ", ".join(failures))
+        sys.exit(1)
+    print("Failover checks passed.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+# tools/snipe_benchmark.py
+# Memory held by snipes after 100k message deletions, before and after the SnipeStore.
+# Run from the repository root: python tools/snipe_benchmark.py [--deletions N] [--channels N]
+# "Before" is the original cog: a dict keeping the whole discord.Message of the latest
+# deletion in every channel. "After" is SnipeStore with the default limits, and with the
+# byte cap lifted to show the cost per record. Messages are real discord.Message objects
+# built from gateway-shaped payloads, and retained memory is measured with tracemalloc.
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+import discord
+from discord.state import ConnectionState
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("UTILITY_DB", ":memory:")
+
+from cogs import utility
+
+GUILD_ID = 1
+USERS = 5000
+ATTACHMENT_SHARE = 0.1
+
+def make_state() -> ConnectionState:
+    intents = discord.Intents.default()
+    intents.members = True
+    return ConnectionState(dispatch=lambda *args, **kwargs: None, handlers={}, hooks={}, http=None, intents=intents)
+
+def make_guild(state: ConnectionState) -> discord.Guild:
+    return discord.Guild(data={"id": GUILD_ID, "name": "Benchmark", "owner_id": 1, "roles": [], "emojis": [],
+                               "features": [], "member_count": USERS}, state=state)
+
+def make_channel(state: ConnectionState, guild: discord.Guild, channel_id: int) -> discord.TextChannel:
+    return discord.TextChannel(state=state, guild=guild, data={"id": channel_id, "type": 0, "name": f"channel-{channel_id}",
+                                                               "position": 0, "guild_id": GUILD_ID})
+
+def message_payload(message_id: int, channel_id: int, rng: random.Random) -> dict:
+    user_id = 10_000 + rng.randrange(USERS)
+    payload = {
+        "id": message_id, "channel_id": channel_id, "guild_id": GUILD_ID, "type": 0,
+        "content": " ".join(rng.choice(("hello", "anyone", "here", "deleted", "oops", "lol", "message", "the"))
+                            for _ in range(rng.randint(3, 25))),
+        "author": {"id": user_id, "username": f"user{user_id}", "discriminator": "0", "global_name": f"User {user_id}",
+                   "avatar": f"{user_id:032x}"},
+        "member": {"roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "nick": None, "deaf": False, "mute": False},
+        "timestamp": "2026-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False, "mention_everyone": False,
+        "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False,
+    }
+    if rng.random() < ATTACHMENT_SHARE:
+        payload["attachments"].append({
+            "id": message_id + 1, "filename": "image.png", "size": 123456, "content_type": "image/png",
+            "url": f"https://cdn.discordapp.com/attachments/{channel_id}/{message_id}/image.png",
+            "proxy_url": f"https://media.discordapp.net/attachments/{channel_id}/{message_id}/image.png",
+            "width": 800, "height": 600,
+        })
+    return payload
+
+def run(label: str, deletions: int, channels: int, keep) -> int:
+    """Feeds `deletions` deleted messages to `keep(channel_id, message)` and returns retained bytes."""
+    rng = random.Random(42)
+    state = make_state()
+    guild = make_guild(state)
+    channel_objects = {}
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for message_id in range(1, deletions + 1):
+        channel_id = 1_000_000 + rng.randrange(channels)
+        channel = channel_objects.get(channel_id)
+        if channel is None:
+            channel = channel_objects[channel_id] = make_channel(state, guild, channel_id)
+        message = discord.Message(state=state, channel=channel, data=message_payload(message_id * 2, channel_id, rng))
+        keep(channel_id, message)
+    # The channel objects stand in for discord.py's own channel cache; don't count them.
+    channel_objects.clear()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    print(f"{label:<44} {retained / 1024 / 1024:8.1f} MB  ({retained / deletions:6.0f} B per deletion)")
+    return retained
+
+def main():
+    parser = argparse.ArgumentParser(description="Snipe memory benchmark.")
+    parser.add_argument("--deletions", type=int, default=100_000)
+    parser.add_argument("--channels", type=int, nargs="*", default=[1_000, 100_000])
+    args = parser.parse_args()
+
+    for channels in args.channels:
+        print(f"{args.deletions:,} deletions across {channels:,} channels:")
+        holders = []
+
+        before: dict[int, discord.Message] = {}
+        holders.append(before)
+        run("  before: latest discord.Message per channel", args.deletions, channels,
+            lambda channel_id, message: before.__setitem__(channel_id, message))
+
+        store = utility.SnipeStore(utility.SNIPES_PER_CHANNEL, utility.SNIPE_TTL, utility.SNIPE_MAX_BYTES)
+        holders.append(store)
+        run(f"  after: SnipeStore ({utility.SNIPES_PER_CHANNEL}/channel, "
+            f"{utility.SNIPE_MAX_BYTES // (1024 * 1024)} MB cap)", args.deletions, channels,
+            lambda channel_id, message: store.add(channel_id, utility.SnipedMessage(message)))
+
+        uncapped = utility.SnipeStore(utility.SNIPES_PER_CHANNEL, utility.SNIPE_TTL, 1 << 40)
+        holders.append(uncapped)
+        run(f"  after: SnipeStore ({utility.SNIPES_PER_CHANNEL}/channel, no cap)", args.deletions, channels,
+            lambda channel_id, message: uncapped.add(channel_id, utility.SnipedMessage(message)))
+        del holders
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# tools/wttr_stub.py
+# Local stand-in for wttr.in, for checking /util weather's cache and image/text race offline.
+#   python tools/wttr_stub.py serve [--port 8090]   then set WEATHER_BASE_URL=http://127.0.0.1:8090
+#   python tools/wttr_stub.py check                 runs the cog's weather lookup against the stub
+# How the stub answers depends on the location: "slowimage" sends its image after 3 s,
+# "noimage" fails the image request, "unknown" is not a known place, and anything else
+# answers the image in 0.2 s and the text in 0.1 s.
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import urllib.parse
+from collections import Counter
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64 # Only the content type is checked
+PNG_SUFFIX = "_0pq_transparency=200.png"
+
+requests_seen: Counter = Counter() # {(location, "png" | "text"): count}
+
+async def weather(request: web.Request) -> web.Response:
+    path = request.match_info["path"]
+    kind = "png" if path.endswith(PNG_SUFFIX) else "text"
+    location = urllib.parse.unquote_plus(path.removesuffix(PNG_SUFFIX)).casefold()
+    requests_seen[(location, kind)] += 1
+    if location == "unknown":
+        if kind == "png":
+            return web.Response(status=404)
+        return web.Response(text="Unknown location; please try ~42.3,-71.1")
+    if kind == "png":
+        if location == "noimage":
+            return web.Response(status=503)
+        await asyncio.sleep(3.0 if location == "slowimage" else 0.2)
+        return web.Response(body=PNG_BYTES, content_type="image/png")
+    await asyncio.sleep(0.1)
+    return web.Response(text=f"{location}: ☀️ +21°C")
+
+def make_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/{path}", weather)
+    return app
+
+class FakeBot:
+    def __init__(self, http_service):
+        self.http_service = http_service
+
+async def check(port: int):
+    # The cog reads its settings at import time.
+    os.environ["WEATHER_BASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["UTILITY_DB"] = os.path.join(tempfile.mkdtemp(), "utility.db")
+    from cogs import utility
+    from cogs._http import HTTPService
+
+    http = HTTPService()
+    await http.start()
+    cog = utility.UtilityCog(FakeBot(http))
+    failures = []
+
+    def check(label: str, condition: bool):
+        print(f"{'ok  ' if condition else 'FAIL'} {label}")
+        if not condition:
+            failures.append(label)
+
+    async def timed(location: str):
+        started = time.monotonic()
+        report = await cog._get_weather_report(location)
+        return report, time.monotonic() - started
+
+    started = time.monotonic()
+    reports = await asyncio.gather(*(cog._get_weather_report(name) for name in ("London", "london", " LONDON ", "London,", "london")))
+    elapsed = time.monotonic() - started
+    check(f"5 concurrent lookups share one fetch of each kind ({elapsed:.2f}s)",
+          requests_seen[("london", "png")] == 1 and requests_seen[("london", "text")] == 1)
+    check("the image wins when it arrives within the grace period", all(report[0] == "png" for report in reports))
+
+    report, elapsed = await timed("london")
+    check(f"a repeat lookup is served from the cache ({elapsed * 1000:.1f} ms)",
+          report[0] == "png" and requests_seen[("london", "png")] == 1 and elapsed < 0.05)
+
+    report, elapsed = await timed("slowimage")
+    check(f"a slow image falls back to the text after the grace period ({elapsed:.2f}s)",
+          report[0] == "text" and elapsed < 3.0)
+    await asyncio.sleep(3.0 - elapsed + 0.3)
+    report, _ = await timed("slowimage")
+    check("the slow image is cached once it arrives", report[0] == "png")
+
+    report, _ = await timed("noimage")
+    check("a failed image request still answers with text", report is not None and report[0] == "text")
+    report, _ = await timed("unknown")
+    check("an unknown location answers nothing", report is None)
+
+    cog.weather_cache.ttl = 0.2
+    await asyncio.sleep(0.3)
+    before = requests_seen[("london", "text")]
+    report, elapsed = await timed("London")
+    check(f"a stale entry answers at once ({elapsed * 1000:.1f} ms)", report is not None and elapsed < 0.05)
+    await asyncio.sleep(0.5)
+    check("and is refreshed in the background", requests_seen[("london", "text")] == before + 1)
+
+    await cog.cog_unload()
+    await http.close()
+    if failures:
+        print("FAILED:", ", ".join(failures))
+        sys.exit(1)
+    print("Weather checks passed.")
+
+async def run_check():
+    runner = web.AppRunner(make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        await check(site._server.sockets[0].getsockname()[1])
+    finally:
+        await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for wttr.in.")
+    parser.add_argument("mode", choices=("serve", "check"))
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    if args.mode == "serve":
+        web.run_app(make_app(), host="127.0.0.1", port=args.port)
+    else:
+        asyncio.run(run_check())
+
+if __name__ == "__main__":
+    main()